@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List
+
+from app.core.security import get_current_active_user, get_current_active_superuser
+from app.db.session import get_db
+from app.models.models import User, Alert, AlertEvent
+from app.schemas.schemas import Alert as AlertSchema, AlertCreate, AlertEvent as AlertEventSchema
+from app.services.alerts import AlertConditionError, parse_condition, run_alert_cycle
+
+router = APIRouter()
+
+@router.get("/", response_model=List[AlertSchema])
+async def read_alerts(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取当前用户的价格提醒
+    """
+    return db.query(Alert).filter(Alert.user_id == current_user.id).order_by(Alert.id).all()
+
+@router.post("/", response_model=AlertSchema)
+async def create_alert(
+    alert_in: AlertCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    创建价格提醒，例如 "RSI(14) crosses below 30"
+    """
+    try:
+        condition = parse_condition(alert_in.condition)
+    except AlertConditionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    alert = Alert(
+        user_id=current_user.id,
+        symbol=alert_in.symbol.strip().upper(),
+        condition=condition.key,
+        is_active=True
+    )
+    db.add(alert)
+    db.commit()
+    db.refresh(alert)
+    return alert
+
+@router.delete("/{alert_id}", response_model=dict)
+async def delete_alert(
+    alert_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    删除价格提醒
+    """
+    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.user_id == current_user.id).first()
+    if not alert:
+        raise HTTPException(status_code=404, detail="提醒未找到")
+    db.delete(alert)
+    db.commit()
+    return {"id": alert_id, "deleted": True}
+
+@router.get("/events", response_model=List[AlertEventSchema])
+async def read_alert_events(
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取当前用户最近的提醒触发记录
+    """
+    return (
+        db.query(AlertEvent)
+        .join(Alert, Alert.id == AlertEvent.alert_id)
+        .filter(Alert.user_id == current_user.id)
+        .order_by(AlertEvent.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+@router.post("/evaluate", response_model=dict)
+async def evaluate_alerts(
+    current_user: User = Depends(get_current_active_superuser),
+    db: Session = Depends(get_db)
+):
+    """
+    立即执行一轮提醒检查（仅管理员）
+    """
+    triggered = await run_in_threadpool(run_alert_cycle, db)
+    return {"triggered": len(triggered)}
@@ -1,121 +1,165 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
-import pandas as pd
-import numpy as np
-import talib
 from datetime import datetime, timedelta
 
+from app.core.config import settings
 from app.core.security import get_current_active_user
+from app.core.admission import ANALYTICS, admission
 from app.db.session import get_db
 from app.models.models import User
-from app.schemas.schemas import TechnicalAnalysisRequest
-from app.data_sources.stock_data import get_stock_historical_data
+from app.schemas.schemas import TechnicalAnalysisRequest, CorrelationRequest
+from app.data_sources.stock_data import get_stock_bars
+from app.core.cache import cache_get, cache_set, make_key
+from app.core.compute import run_cpu
+from app.core.http_cache import conditional_json_async, make_etag
+from app.core.market_hours import calendar_days_for_bars
+from app.core.responses import FastJSONResponse
 
 router = APIRouter()
 
-@router.post("/technical", response_model=Dict[str, Any])
+# 各指标的预热K线数：在此之前的输出为NaN或尚未收敛
+INDICATOR_WARMUP = {
+    "MA": 60,            # 最长周期 MA60
+    "RSI": 14 + 1,       # diff 占用一根
+    "MACD": 26 * 3 + 9,  # EMA依赖全部历史，取3倍慢线周期使初值影响可以忽略
+    "BBANDS": 20,
+    "STOCH": 14 + 3 + 3,
+}
+
+DEFAULT_ANALYSIS_DAYS = 365
+
+def analysis_range(request: TechnicalAnalysisRequest):
+    """
+    请求的输出日期范围，未指定开始日期时默认为结束日期前一年
+    """
+    end = request.end_date.date() if request.end_date else None
+    if request.start_date:
+        start = request.start_date.date()
+    else:
+        start = (end or datetime.utcnow().date()) - timedelta(days=DEFAULT_ANALYSIS_DAYS)
+    if end is not None and start > end:
+        raise HTTPException(status_code=400, detail="开始日期不能晚于结束日期")
+    return start, end
+
+def warmup_bars(indicators: List[str]) -> int:
+    return max((INDICATOR_WARMUP.get(indicator, 0) for indicator in indicators), default=0)
+
+@router.post("/technical", response_model=Dict[str, Any], dependencies=[Depends(admission("technical", ANALYTICS))])
 async def technical_analysis(
     request: TechnicalAnalysisRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
-    进行技术指标分析
+    进行技术指标分析，支持ETag条件请求
+
+    只获取请求范围加上指标预热所需的历史数据，并只返回请求范围内的结果
     """
-    # 获取历史数据
-    historical_data = get_stock_historical_data(request.symbol, period="1y", interval="1d")
-    if not historical_data:
+    from app.services.downsample import validate_downsample
+    from app.services.technical import INDICATOR_INPUTS, compute_indicators
+    start, end = analysis_range(request)
+    try:
+        validate_downsample(request.max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fetch_start = start - timedelta(days=calendar_days_for_bars(warmup_bars(request.indicators)))
+    bars = await run_in_threadpool(
+        get_stock_bars,
+        request.symbol,
+        interval="1d",
+        start=fetch_start.isoformat(),
+        end=(end + timedelta(days=1)).isoformat() if end else None
+    )
+    if not bars:
         raise HTTPException(status_code=404, detail="历史数据未找到")
     
-    # 转换为DataFrame
-    df = pd.DataFrame(historical_data)
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
+    # 数据未变化时直接返回304，跳过指标计算
+    etag = make_etag(
+        "technical", request.symbol, ",".join(request.indicators), start, end, request.max_points,
+        len(bars["ts"]), bars["ts"][-1], float(bars["close"][-1]), float(bars["adjusted_close"][0])
+    )
     
-    # 计算技术指标
-    result = {
-        "symbol": request.symbol,
-        "indicators": {}
-    }
-    
-    for indicator in request.indicators:
-        if indicator == "MA":
-            result["indicators"]["MA"] = calculate_ma(df)
-        elif indicator == "RSI":
-            result["indicators"]["RSI"] = calculate_rsi(df)
-        elif indicator == "MACD":
-            result["indicators"]["MACD"] = calculate_macd(df)
-        elif indicator == "BBANDS":
-            result["indicators"]["BBANDS"] = calculate_bbands(df)
-        elif indicator == "STOCH":
-            result["indicators"]["STOCH"] = calculate_stoch(df)
-    
-    return result
+    async def compute():
+        # 结果按 (股票, 指标, 日期范围, 分辨率, 数据版本) 缓存
+        key = make_key("technical", etag)
+        result = await run_in_threadpool(cache_get, key)
+        if result is None:
+            # 指标计算在计算进程池中执行，K线通过共享内存传入
+            result = await run_cpu(
+                "technical", compute_indicators, {field: bars[field] for field in INDICATOR_INPUTS},
+                request.indicators, start, end, request.max_points
+            )
+            await run_in_threadpool(cache_set, key, result, settings.HISTORY_CACHE_TTL)
+        return {"symbol": request.symbol, **result}
+    return await conditional_json_async(http_request, etag, compute)
+
+# 指标计算由配置的后端完成（INDICATOR_BACKEND），各后端结果在数值上一致
+
+def get_backend():
+    from app.indicators.registry import get_backend
+    return get_backend()
+
+def _column(df, name):
+    return df[name].to_numpy(dtype="float64")
 
 def calculate_ma(df):
     """计算移动平均线"""
-    result = {}
-    for period in [5, 10, 20, 60]:
-        ma = df['close'].rolling(window=period).mean()
-        result[f"MA{period}"] = ma.tolist()
-    return result
+    return get_backend().ma(_column(df, "close"))
 
 def calculate_rsi(df, period=14):
     """计算RSI"""
-    delta = df['close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    
-    avg_gain = gain.rolling(window=period).mean()
-    avg_loss = loss.rolling(window=period).mean()
-    
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    
-    return {"RSI": rsi.tolist()}
+    return get_backend().rsi(_column(df, "close"), period)
 
 def calculate_macd(df, fast_period=12, slow_period=26, signal_period=9):
     """计算MACD"""
-    exp1 = df['close'].ewm(span=fast_period, adjust=False).mean()
-    exp2 = df['close'].ewm(span=slow_period, adjust=False).mean()
-    macd = exp1 - exp2
-    signal = macd.ewm(span=signal_period, adjust=False).mean()
-    hist = macd - signal
-    
-    return {
-        "MACD": macd.tolist(),
-        "MACD_signal": signal.tolist(),
-        "MACD_hist": hist.tolist()
-    }
+    return get_backend().macd(_column(df, "close"), fast_period, slow_period, signal_period)
 
 def calculate_bbands(df, period=20, nbdevup=2, nbdevdn=2):
     """计算布林带"""
-    ma = df['close'].rolling(window=period).mean()
-    std = df['close'].rolling(window=period).std()
-    upper = ma + nbdevup * std
-    lower = ma - nbdevdn * std
-    
-    return {
-        "BBANDS_upper": upper.tolist(),
-        "BBANDS_middle": ma.tolist(),
-        "BBANDS_lower": lower.tolist()
-    }
+    return get_backend().bbands(_column(df, "close"), period, nbdevup, nbdevdn)
 
 def calculate_stoch(df, fastk_period=14, slowk_period=3, slowd_period=3):
     """计算随机指标"""
-    highest_high = df['high'].rolling(window=fastk_period).max()
-    lowest_low = df['low'].rolling(window=fastk_period).min()
-    fastk = 100 * ((df['close'] - lowest_low) / (highest_high - lowest_low))
-    slowk = fastk.rolling(window=slowk_period).mean()
-    slowd = slowk.rolling(window=slowd_period).mean()
+    return get_backend().stoch(
+        _column(df, "high"), _column(df, "low"), _column(df, "close"),
+        fastk_period, slowk_period, slowd_period
+    )
+
+@router.post("/correlation", response_model=Dict[str, Any], dependencies=[Depends(admission("correlation", ANALYTICS))])
+async def correlation_analysis(
+    request: CorrelationRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    计算一组股票或一个板块的收益率相关系数矩阵、相对基准的Beta和相对强弱排名
+    """
+    if not request.symbols and not request.sector:
+        raise HTTPException(status_code=400, detail="请指定股票列表或板块")
+    if request.window < 2 or request.window > settings.CORRELATION_MAX_WINDOW:
+        raise HTTPException(status_code=400, detail=f"窗口长度必须在 2 到 {settings.CORRELATION_MAX_WINDOW} 之间")
     
-    return {
-        "STOCH_K": slowk.tolist(),
-        "STOCH_D": slowd.tolist()
-    }
+    from app.services.correlation import cached_correlation, correlation_job, load_correlation_inputs, store_correlation
+    key, result = await run_in_threadpool(
+        cached_correlation, db, request.symbols, request.sector, request.window, request.benchmark
+    )
+    if result is None:
+        symbols, arrays = await run_in_threadpool(
+            load_correlation_inputs, db, request.symbols, request.sector, request.window, request.benchmark
+        )
+        if not symbols:
+            raise HTTPException(status_code=404, detail="没有足够的历史数据")
+        result = await run_cpu("correlation", correlation_job, arrays, symbols, request.window, request.benchmark)
+        await run_in_threadpool(store_correlation, key, result)
+    if not result["symbols"]:
+        raise HTTPException(status_code=404, detail="没有足够的历史数据")
+    # 相关系数矩阵为NumPy数组，直接序列化
+    return FastJSONResponse(result)
 
-@router.post("/backtest", response_model=Dict[str, Any])
+@router.post("/backtest", response_model=Dict[str, Any], dependencies=[Depends(admission("backtest", ANALYTICS))])
 async def backtest_strategy(
     strategy_params: Dict[str, Any] = Body(...),
     current_user: User = Depends(get_current_active_user),
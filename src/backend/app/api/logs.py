@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+
+from app.core.security import get_current_active_superuser
+from app.db.session import get_db
+from app.models.models import User, SystemLog
+
+router = APIRouter()
+
+@router.get("/", response_model=List[dict])
+async def list_system_logs(
+    level: Optional[str] = None,
+    route: Optional[str] = None,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_superuser),
+    db: Session = Depends(get_db)
+):
+    """
+    查询系统日志，按时间倒序（仅管理员）
+    """
+    query = db.query(SystemLog)
+    if level:
+        query = query.filter(SystemLog.level == level.upper())
+    if route:
+        query = query.filter(SystemLog.route == route)
+    if user_id is not None:
+        query = query.filter(SystemLog.user_id == user_id)
+    if since:
+        query = query.filter(SystemLog.timestamp >= since)
+    logs = query.order_by(SystemLog.id.desc()).limit(min(max(limit, 1), 1000)).all()
+    return [
+        {
+            "id": log.id,
+            "level": log.level,
+            "message": log.message,
+            "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+            "source": log.source,
+            "user_id": log.user_id,
+            "route": log.route,
+            "status_code": log.status_code,
+            "latency_ms": log.latency_ms
+        }
+        for log in logs
+    ]
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.security import get_current_active_superuser
+from app.core.profiling import load_profile
+from app.models.models import User
+
+router = APIRouter()
+
+@router.get("/{profile_id}", response_model=dict)
+async def get_profile(
+    profile_id: str,
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    获取请求剖析摘要（仅管理员）
+    """
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="剖析结果未找到")
+    return profile
+
+@router.get("/{profile_id}/folded", response_class=PlainTextResponse)
+async def get_profile_folded(
+    profile_id: str,
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    下载折叠栈格式的剖析结果，可用 flamegraph.pl 或 speedscope 生成火焰图（仅管理员）
+    """
+    folded = load_profile(profile_id, folded=True)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="剖析结果未找到")
+    return PlainTextResponse(folded)
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-import yfinance as yf
-import pandas as pd
+import json
+from bisect import bisect_right
 from datetime import datetime, timedelta
 
-from app.core.security import get_current_active_user
+from app.core.security import get_current_active_user, get_current_active_superuser
+from app.core.admission import ANALYTICS, admission
 from app.db.session import get_db
 from app.models.models import User, Stock, StockPrice
 from app.schemas.schemas import Stock as StockSchema, StockFilterRequest
-from app.data_sources.stock_data import get_stock_info, get_stock_historical_data, search_stocks
+from app.core.http_cache import conditional_json, make_etag, public_cache_control
+from app.core.pagination import NEXT_CURSOR_HEADER, cursor_param, encode_cursor, page_size, wants_ndjson
+from app.core.responses import FastJSONResponse, NDJSONResponse
+from app.core.compute import run_cpu
+from app.data_sources.stock_data import BAR_COLUMNS, bar_dates, bars_to_records, get_stock_bars, get_stock_info, search_stocks
+from app.data_sources.stock_data import get_market_movers as fetch_market_movers
+from app.data_sources.stock_data import get_sector_performance as fetch_sector_performance
+from app.services.universe import run_universe_sync
 
 router = APIRouter()
 
-@router.get("/search", response_model=List[dict])
+@router.get("/search", response_model=List[dict], dependencies=[Depends(admission("search"))])
 async def search_stock(
     query: str,
     current_user: User = Depends(get_current_active_user),
@@ -25,7 +34,22 @@ async def search_stock(
     results = search_stocks(query)
     return results
 
-@router.get("/{symbol}", response_model=dict)
+@router.post("/universe/sync", response_model=dict)
+async def sync_stock_universe(
+    current_user: User = Depends(get_current_active_superuser),
+    db: Session = Depends(get_db)
+):
+    """
+    立即从配置的数据源同步证券列表（仅管理员）
+    """
+    try:
+        return await run_in_threadpool(run_universe_sync, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"获取证券列表失败: {str(e)}")
+
+@router.get("/{symbol}", response_model=dict, dependencies=[Depends(admission("stock"))])
 async def get_stock(
     symbol: str,
     current_user: User = Depends(get_current_active_user),
@@ -34,168 +58,178 @@ async def get_stock(
     """
     获取股票信息
     """
-    stock_info = get_stock_info(symbol)
+    # 缓存未命中时读取数据库或请求上游，放到线程池中避免阻塞事件循环
+    stock_info = await run_in_threadpool(get_stock_info, symbol)
     if not stock_info:
         raise HTTPException(status_code=404, detail="股票未找到")
     
     return stock_info
 
-@router.get("/{symbol}/historical", response_model=List[dict])
+@router.get("/{symbol}/historical", response_model=List[dict], dependencies=[Depends(admission("historical"))])
 async def get_stock_historical(
+    request: Request,
     symbol: str,
     period: str = "1y",
     interval: str = "1d",
+    adjusted: bool = True,
+    max_points: Optional[int] = None,
+    downsample: str = "ohlc",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    format: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
-    获取股票历史数据
+    获取股票历史数据，支持ETag条件请求
+
+    adjusted=false 时返回原始成交价格，adjusted_close 仍为复权收盘价。
+    max_points 为图表的点数上限（通常取图表宽度的像素数），K线超过该数量时降采样：
+    downsample=ohlc 把相邻K线聚合为一根（蜡烛图），downsample=lttb 保留折线形状的关键点（折线图）。
+    指定 limit 时按日期分页，下一页游标在响应头 X-Next-Cursor 中；format=ndjson 时以NDJSON流式返回
     """
-    historical_data = get_stock_historical_data(symbol, period, interval)
-    if not historical_data:
+    import numpy as np
+    from app.services.downsample import validate_downsample
+    from app.services.resample import is_intraday
+    ndjson = wants_ndjson(request, format)
+    after = cursor_param(cursor, "date")
+    try:
+        validate_downsample(max_points, downsample)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # 缓存未命中时下载K线并查询公司行为，放到线程池中避免阻塞事件循环
+    bars = await run_in_threadpool(
+        get_stock_bars, symbol, period, interval, adjusted=adjusted, max_points=max_points, downsample=downsample
+    )
+    if not bars:
         raise HTTPException(status_code=404, detail="历史数据未找到")
     
-    return historical_data
+    # 数据版本由最后一根K线决定；新的拆股或分红会改变第一根K线的复权价格
+    intraday = is_intraday(interval)
+    dates = bar_dates(bars, intraday)
+    etag = make_etag(
+        "historical", symbol, period, interval, adjusted, max_points, downsample, len(dates),
+        dates[-1], float(bars["close"][-1]), float(bars["adjusted_close"][0]), cursor, limit, ndjson
+    )
+    headers = {}
+    page = slice(None)
+    if after is not None or limit:
+        # 日期字符串格式固定（YYYY-MM-DD 或 YYYY-MM-DD HH:MM），按字符串比较即按时间比较
+        start = int(np.searchsorted(dates, str(after["date"]), side="right")) if after else 0
+        end = start + page_size(limit) if limit else len(dates)
+        if end < len(dates):
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(date=str(dates[end - 1]))
+        page = slice(start, end)
+    # 只在需要响应体时（非304）把当前页转换为列表
+    return conditional_json(
+        request, etag,
+        lambda: bars_to_records({field: bars[field][page] for field in BAR_COLUMNS if field in bars}, intraday),
+        headers=headers, ndjson=ndjson
+    )
 
-@router.post("/filter", response_model=List[dict])
+@router.post("/filter", response_model=List[dict], dependencies=[Depends(admission("filter", ANALYTICS))])
 async def filter_stocks(
     filter_params: StockFilterRequest,
+    request: Request,
+    format: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
-    筛选股票
+    筛选股票：固定筛选字段和自定义表达式编译为同一个选股计划，在全市场K线矩阵上向量化求值
+
+    结果按股票代码排序，最多返回 limit 行（为 null 时不限）；还有更多结果时响应头 X-Next-Cursor
+    为下一页的 cursor。format=ndjson 时逐行流式返回，适合导出全市场结果
     """
-    # 这里应该实现股票筛选逻辑
-    # 由于筛选逻辑较复杂，这里简化为返回一些示例数据
+    from app.services.market_data import load_universe
+    from app.services.screener import ScreenerExpressionError, build_filter_screen, screen_job
+    ndjson = wants_ndjson(request, format)
+    after = cursor_param(filter_params.cursor, "symbol")
+    try:
+        screen = build_filter_screen(filter_params)
+    except ScreenerExpressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # 示例数据
-    filtered_stocks = [
-        {
-            "symbol": "AAPL",
-            "name": "Apple Inc.",
-            "current_price": 175.23,
-            "change_percent": 1.25,
-            "volume": 65432100,
-            "market_cap": 2850000000000
-        },
-        {
-            "symbol": "MSFT",
-            "name": "Microsoft Corporation",
-            "current_price": 325.45,
-            "change_percent": 0.75,
-            "volume": 23456700,
-            "market_cap": 2420000000000
-        },
-        {
-            "symbol": "GOOGL",
-            "name": "Alphabet Inc.",
-            "current_price": 142.89,
-            "change_percent": 1.05,
-            "volume": 18765400,
-            "market_cap": 1850000000000
-        }
-    ]
+    universe = await run_in_threadpool(
+        load_universe,
+        db,
+        sector=filter_params.sector,
+        industry=filter_params.industry,
+        country=filter_params.market,
+        lookback_bars=max(screen.lookback if screen else 1, 2)
+    )
+    if len(universe) == 0:
+        return NDJSONResponse(iter([])) if ndjson else []
+    
+    import numpy as np
+    if screen is not None:
+        # 在计算进程池中求值，K线矩阵通过共享内存传入
+        arrays = {**universe.fields, "market_cap": universe.meta["market_cap"]}
+        mask = await run_cpu("screen", screen_job, arrays, screen)
+    else:
+        mask = np.ones(len(universe), dtype=bool)
+    selected = np.flatnonzero(mask & ~np.isnan(universe.fields["close"][:, -1]))
+    if after is not None:
+        # 股票按代码排序读取；游标中的股票可能已被删除，因此二分查找位置而不是精确匹配
+        selected = selected[selected >= bisect_right(universe.symbols, after["symbol"])]
+    headers = {}
+    if filter_params.limit is not None and len(selected) > filter_params.limit:
+        selected = selected[:max(filter_params.limit, 0)]
+        if len(selected):
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(symbol=universe.symbols[selected[-1]])
+    if ndjson:
+        return NDJSONResponse(iter_screen_rows(universe, selected), headers=headers)
+    # 结果可能有上千行，直接返回响应以跳过 response_model 的逐项校验
+    return FastJSONResponse(list(iter_screen_rows(universe, selected)), headers=headers)
+
+def iter_screen_rows(universe, selected):
+    """
+    按需把选中的股票（universe 中的行号）转换为输出行；float32 价格按十进制还原后输出
+    """
+    import numpy as np
+    from app.services.bar_matrix import exact_float64, to_float64
+    close = universe.fields["close"]
+    last = exact_float64(close[selected, -1])
+    prev = exact_float64(close[selected, -2]) if close.shape[1] > 1 else last
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_percent = (last / prev - 1) * 100
+    volume = to_float64("volume", universe.fields["volume"][selected, -1], close[selected, -1])
+    market_cap = universe.meta["market_cap"]
     
-    return filtered_stocks
+    for j, i in enumerate(selected):
+        yield {
+            "symbol": universe.symbols[i],
+            "name": universe.meta["name"][i],
+            "current_price": float(last[j]),
+            "change_percent": None if np.isnan(change_percent[j]) else round(float(change_percent[j]), 4),
+            "volume": None if np.isnan(volume[j]) else float(volume[j]),
+            "market_cap": None if np.isnan(market_cap[i]) else float(market_cap[i])
+        }
 
 @router.get("/market/movers", response_model=dict)
 async def get_market_movers(
-    market: str = "US",
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    market: str = "US"
 ):
     """
     获取市场涨跌幅排行
+
+    与用户无关的公共数据：不需要认证，返回可被代理共享缓存的响应头
     """
-    # 这里应该实现获取市场涨跌幅排行的逻辑
-    # 由于逻辑较复杂，这里简化为返回一些示例数据
-    
-    # 示例数据
-    market_movers = {
-        "gainers": [
-            {
-                "symbol": "XYZ",
-                "name": "XYZ Company",
-                "change_percent": 8.75,
-                "current_price": 45.67
-            },
-            {
-                "symbol": "ABC",
-                "name": "ABC Corporation",
-                "change_percent": 7.25,
-                "current_price": 32.45
-            },
-            {
-                "symbol": "DEF",
-                "name": "DEF Industries",
-                "change_percent": 6.50,
-                "current_price": 78.90
-            }
-        ],
-        "losers": [
-            {
-                "symbol": "UVW",
-                "name": "UVW Inc.",
-                "change_percent": -5.80,
-                "current_price": 12.34
-            },
-            {
-                "symbol": "RST",
-                "name": "RST Technologies",
-                "change_percent": -4.75,
-                "current_price": 56.78
-            },
-            {
-                "symbol": "MNO",
-                "name": "MNO Group",
-                "change_percent": -4.20,
-                "current_price": 23.45
-            }
-        ]
-    }
-    
-    return market_movers
+    market_movers = fetch_market_movers(market)
+    etag = make_etag("movers", market, json.dumps(market_movers, sort_keys=True))
+    return conditional_json(request, etag, lambda: market_movers, public_cache_control())
 
 @router.get("/market/sectors", response_model=List[dict])
 async def get_sector_performance(
-    period: str = "1d",
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    period: str = "1d"
 ):
     """
     获取板块表现
+
+    与用户无关的公共数据：不需要认证，返回可被代理共享缓存的响应头
     """
-    # 这里应该实现获取板块表现的逻辑
-    # 由于逻辑较复杂，这里简化为返回一些示例数据
-    
-    # 示例数据
-    sectors = [
-        {
-            "name": "科技",
-            "change_percent": 1.45,
-            "ytd_change_percent": 15.75
-        },
-        {
-            "name": "医疗健康",
-            "change_percent": 0.32,
-            "ytd_change_percent": 8.25
-        },
-        {
-            "name": "金融",
-            "change_percent": -0.21,
-            "ytd_change_percent": 5.50
-        },
-        {
-            "name": "能源",
-            "change_percent": -0.67,
-            "ytd_change_percent": -3.25
-        },
-        {
-            "name": "消费品",
-            "change_percent": 0.89,
-            "ytd_change_percent": 7.80
-        }
-    ]
-    
-    return sectors
+    sectors = fetch_sector_performance(period)
+    etag = make_etag("sectors", period, json.dumps(sectors, sort_keys=True))
+    return conditional_json(request, etag, lambda: sectors, public_cache_control())
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.core.security import get_current_active_user, get_current_active_superuser, get_password_hash
-from app.db.session import get_db
+from app.core.pagination import NEXT_CURSOR_HEADER, cursor_param, encode_cursor, page_size, wants_ndjson
+from app.core.responses import NDJSONResponse
+from app.db.session import SessionLocal, get_db
 from app.models.models import User, UserSetting
 from app.schemas.schemas import User as UserSchema, UserCreate, UserUpdate
 
@@ -38,17 +40,53 @@ async def update_user_me(
     db.refresh(current_user)
     return current_user
 
+USER_EXPORT_BATCH = 500
+
+def iter_users(batch_size: int = USER_EXPORT_BATCH):
+    """
+    按 id 分批读取全部用户（keyset），每批使用独立的会话，内存占用与用户总数无关
+    """
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            users = db.query(User).filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+        for user in users:
+            yield UserSchema.from_orm(user).dict()
+        if len(users) < batch_size:
+            return
+        last_id = users[-1].id
+
 @router.get("/", response_model=List[UserSchema])
 async def read_users(
-    skip: int = 0,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
+    skip: int = 0,
+    format: Optional[str] = None,
     current_user: User = Depends(get_current_active_superuser),
     db: Session = Depends(get_db)
 ):
     """
-    获取所有用户（仅管理员）
+    获取所有用户（仅管理员），按 id 排序
+
+    使用游标分页：响应头 X-Next-Cursor 为下一页的 cursor 参数，没有该响应头表示已是最后一页
+    （skip 仅为兼容保留）。format=ndjson 时不分页，以NDJSON流式返回全部用户
     """
-    users = db.query(User).offset(skip).limit(limit).all()
+    if wants_ndjson(request, format):
+        return NDJSONResponse(iter_users())
+    after = cursor_param(cursor, "id")
+    limit = page_size(limit)
+    query = db.query(User).order_by(User.id)
+    if after is not None:
+        query = query.filter(User.id > after["id"])
+    elif skip:
+        query = query.offset(skip)
+    # 多取一行判断是否还有下一页
+    users = query.limit(limit + 1).all()
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(id=users[-1].id)
     return users
 
 @router.post("/", response_model=UserSchema)
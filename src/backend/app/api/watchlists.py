@@ -0,0 +1,214 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List
+
+from app.core.security import get_current_active_user
+from app.core.admission import admission
+from app.db.session import get_db
+from app.models.models import User, Stock, UserWatchlist, WatchlistStock
+from app.schemas.schemas import Watchlist as WatchlistSchema, WatchlistCreate, WatchlistUpdate, WatchlistSymbols
+from app.data_sources.stock_data import get_stock_info, get_stock_quotes
+from app.services.universe import universe_synced
+
+router = APIRouter()
+
+def _get_user_watchlist(db: Session, watchlist_id: int, user: User) -> UserWatchlist:
+    watchlist = db.query(UserWatchlist).filter(
+        UserWatchlist.id == watchlist_id,
+        UserWatchlist.user_id == user.id
+    ).first()
+    if not watchlist:
+        raise HTTPException(status_code=404, detail="自选股列表未找到")
+    return watchlist
+
+def _resolve_stocks(db: Session, symbols: List[str]) -> List[Stock]:
+    """
+    把用户输入的代码解析为 stocks 表中的股票，一次查询取出已有股票
+
+    stocks 是所有用户共用的证券列表，不能按用户输入创建记录：已同步证券列表时只接受表中的股票；
+    尚未同步时，表中没有的股票需经数据源确认存在，并以数据源返回的信息创建。无法识别的代码返回 400
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    existing = {s.symbol: s for s in db.query(Stock).filter(Stock.symbol.in_(symbols)).all()}
+    # 交易所为空字符串的是旧版本按用户输入创建的占位记录，与不存在的股票同样处理
+    missing = [symbol for symbol in symbols if symbol not in existing or existing[symbol].exchange == ""]
+    if missing:
+        infos = {} if universe_synced(db) else {symbol: get_stock_info(symbol) for symbol in missing}
+        unknown = [symbol for symbol in missing if not (infos.get(symbol) or {}).get("exchange")]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知的股票代码: {', '.join(unknown)}")
+        for symbol in missing:
+            info = infos[symbol]
+            stock = existing.get(symbol) or Stock(symbol=symbol)
+            stock.name = info.get("name") or symbol
+            stock.exchange = info["exchange"]
+            stock.sector = info.get("sector")
+            stock.industry = info.get("industry")
+            stock.market_cap = info.get("market_cap")
+            existing[symbol] = stock
+        db.add_all([existing[symbol] for symbol in missing])
+        db.flush()
+    return [existing[symbol] for symbol in symbols]
+
+def _add_symbols(db: Session, watchlist: UserWatchlist, symbols: List[str]):
+    """
+    批量添加成员；可能请求数据源确认股票代码，应在线程池中调用
+    """
+    stocks = _resolve_stocks(db, symbols)
+    current = {
+        stock_id for (stock_id,) in db.query(WatchlistStock.stock_id)
+        .filter(WatchlistStock.watchlist_id == watchlist.id)
+    }
+    db.add_all([
+        WatchlistStock(watchlist_id=watchlist.id, stock_id=stock.id)
+        for stock in stocks if stock.id not in current
+    ])
+
+def _watchlist_symbols(db: Session, watchlist_ids: List[int]):
+    """
+    一次联表查询取出多个列表的成员股票
+    """
+    rows = (
+        db.query(WatchlistStock.watchlist_id, Stock.symbol, Stock.name, Stock.exchange, WatchlistStock.added_at)
+        .join(Stock, Stock.id == WatchlistStock.stock_id)
+        .filter(WatchlistStock.watchlist_id.in_(watchlist_ids))
+        .order_by(WatchlistStock.added_at, WatchlistStock.id)
+        .all()
+    )
+    result = {watchlist_id: [] for watchlist_id in watchlist_ids}
+    for row in rows:
+        result[row.watchlist_id].append(row)
+    return result
+
+def _to_schema(watchlist: UserWatchlist, members) -> dict:
+    return {
+        "id": watchlist.id,
+        "user_id": watchlist.user_id,
+        "name": watchlist.name,
+        "created_at": watchlist.created_at,
+        "symbols": [member.symbol for member in members]
+    }
+
+@router.get("/", response_model=List[WatchlistSchema])
+async def read_watchlists(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取当前用户的自选股列表
+    """
+    watchlists = db.query(UserWatchlist).filter(UserWatchlist.user_id == current_user.id).order_by(UserWatchlist.id).all()
+    members = _watchlist_symbols(db, [w.id for w in watchlists])
+    return [_to_schema(w, members[w.id]) for w in watchlists]
+
+@router.post("/", response_model=WatchlistSchema)
+async def create_watchlist(
+    watchlist_in: WatchlistCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    创建自选股列表
+    """
+    watchlist = UserWatchlist(user_id=current_user.id, name=watchlist_in.name)
+    db.add(watchlist)
+    db.flush()
+    if watchlist_in.symbols:
+        await run_in_threadpool(_add_symbols, db, watchlist, watchlist_in.symbols)
+    db.commit()
+    db.refresh(watchlist)
+    return _to_schema(watchlist, _watchlist_symbols(db, [watchlist.id])[watchlist.id])
+
+@router.put("/{watchlist_id}", response_model=WatchlistSchema)
+async def update_watchlist(
+    watchlist_id: int,
+    watchlist_in: WatchlistUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    重命名自选股列表
+    """
+    watchlist = _get_user_watchlist(db, watchlist_id, current_user)
+    watchlist.name = watchlist_in.name
+    db.commit()
+    db.refresh(watchlist)
+    return _to_schema(watchlist, _watchlist_symbols(db, [watchlist.id])[watchlist.id])
+
+@router.delete("/{watchlist_id}", response_model=dict)
+async def delete_watchlist(
+    watchlist_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    删除自选股列表
+    """
+    watchlist = _get_user_watchlist(db, watchlist_id, current_user)
+    db.delete(watchlist)
+    db.commit()
+    return {"id": watchlist_id, "deleted": True}
+
+@router.post("/{watchlist_id}/stocks", response_model=WatchlistSchema)
+async def add_watchlist_stocks(
+    watchlist_id: int,
+    symbols_in: WatchlistSymbols,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    批量添加自选股
+    """
+    watchlist = _get_user_watchlist(db, watchlist_id, current_user)
+    await run_in_threadpool(_add_symbols, db, watchlist, symbols_in.symbols)
+    db.commit()
+    return _to_schema(watchlist, _watchlist_symbols(db, [watchlist.id])[watchlist.id])
+
+@router.delete("/{watchlist_id}/stocks/{symbol}", response_model=WatchlistSchema)
+async def remove_watchlist_stock(
+    watchlist_id: int,
+    symbol: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    移除自选股
+    """
+    watchlist = _get_user_watchlist(db, watchlist_id, current_user)
+    stock_ids = db.query(Stock.id).filter(Stock.symbol == symbol.upper())
+    db.query(WatchlistStock).filter(
+        WatchlistStock.watchlist_id == watchlist.id,
+        WatchlistStock.stock_id.in_(stock_ids.scalar_subquery())
+    ).delete(synchronize_session=False)
+    db.commit()
+    return _to_schema(watchlist, _watchlist_symbols(db, [watchlist.id])[watchlist.id])
+
+@router.get("/{watchlist_id}/quotes", response_model=dict, dependencies=[Depends(admission("watchlist_quotes"))])
+async def read_watchlist_with_quotes(
+    watchlist_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取自选股列表及全部成员的最新报价（一次联表查询 + 一次批量报价）
+    """
+    watchlist = _get_user_watchlist(db, watchlist_id, current_user)
+    members = _watchlist_symbols(db, [watchlist.id])[watchlist.id]
+    # 上游请求是阻塞调用，放到线程池中避免阻塞事件循环
+    quotes = await run_in_threadpool(get_stock_quotes, [member.symbol for member in members])
+    return {
+        "id": watchlist.id,
+        "name": watchlist.name,
+        "created_at": watchlist.created_at,
+        "stocks": [
+            {
+                "symbol": member.symbol,
+                "name": member.name,
+                "exchange": member.exchange,
+                "added_at": member.added_at,
+                "quote": quotes.get(member.symbol)
+            }
+            for member in members
+        ]
+    }
@@ -0,0 +1,183 @@
+"""
+准入控制：在请求进入处理函数前限制并发和单个用户的请求速率，过载时快速返回 429/503 而不是让所有请求一起变慢
+
+- 每个用户（JWT 的 sub）每类请求一个令牌桶，令牌不足返回 429；令牌桶保存在共享缓存后端中，所有worker共用
+- 耗时的分析类接口各自限制并发数
+- 所有受控请求共享一个总并发上限，排队时交互类请求（报价、行情）优先于分析类请求；
+  队列已满或排队超时返回 503
+并发上限按整个实例配置，平均分给各worker进程（每个worker至少 1 个名额）；排队上限按每个worker计算
+"""
+import math
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import cache_backend, get_cache
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.security import get_current_active_user
+from app.models.models import User
+
+logger = logging.getLogger(__name__)
+
+admission_requests_total = Counter(
+    "admission_requests_total", "准入控制结果", ("route", "outcome")
+)
+admission_queue_wait = Histogram(
+    "admission_queue_wait_seconds", "等待并发名额的时间", ("priority",)
+)
+
+# 请求类别: 排队优先级（越小越优先）
+INTERACTIVE = "interactive"
+ANALYTICS = "analytics"
+PRIORITIES = {INTERACTIVE: 0, ANALYTICS: 1}
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+class PriorityLimiter:
+    """
+    带优先级队列的并发限制：名额释放时交给优先级最高（其次最早）的等待者
+    """
+    def __init__(self, capacity: int, max_queue: int):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._waiters = []  # (优先级, 序号, future)
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int, timeout: float):
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            return
+        if self.waiting >= self.max_queue:
+            raise AdmissionRejected(503, settings.ADMISSION_RETRY_AFTER, "queue_full")
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected(503, settings.ADMISSION_RETRY_AFTER, "queue_timeout")
+        except asyncio.CancelledError:
+            # 已被分配名额后才取消（例如客户端断开），把名额交给下一个等待者
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                self.waiting -= 1
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # 名额直接转交，active 不变
+                self.waiting -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+
+def _worker_share(limit: int) -> int:
+    """
+    实例级的并发上限分到每个worker的份额；进程内缓存只运行单个worker（见 app.main）
+    """
+    from app.core.worker import default_worker_count
+    workers = 1 if cache_backend() == "memory" else default_worker_count()
+    return max(math.ceil(limit / workers), 1)
+
+class AdmissionController:
+    def __init__(self):
+        self.shared = PriorityLimiter(_worker_share(settings.ADMISSION_MAX_CONCURRENCY), settings.ADMISSION_MAX_QUEUE)
+        self.routes: Dict[str, PriorityLimiter] = {}
+
+    def route_limiter(self, route: str) -> PriorityLimiter:
+        limiter = self.routes.get(route)
+        if limiter is None:
+            limiter = self.routes[route] = PriorityLimiter(
+                _worker_share(settings.ANALYTICS_ROUTE_CONCURRENCY), settings.ADMISSION_MAX_QUEUE
+            )
+        return limiter
+
+    def check_quota(self, subject: str, kind: str):
+        """
+        从共享缓存中该用户该类请求的令牌桶取一个令牌，令牌不足时抛出 AdmissionRejected；缓存后端出错时放行
+        """
+        if kind == ANALYTICS:
+            rate, burst = settings.ANALYTICS_RATE, settings.ANALYTICS_BURST
+        else:
+            rate, burst = settings.INTERACTIVE_RATE, settings.INTERACTIVE_BURST
+        try:
+            # 补充速率为 0 时视为几乎不再补充
+            wait = get_cache().take_token(f"quota:{kind}:{subject}", max(rate, 1e-6), burst)
+        except Exception as e:
+            logger.warning(f"读取请求配额失败: {str(e)}")
+            return
+        if wait:
+            raise AdmissionRejected(429, wait, "throttled")
+
+    async def acquire(self, route: str, kind: str) -> Optional[PriorityLimiter]:
+        """
+        依次获取本路由和全局的并发名额，返回已获取的路由限制器（交互类请求为 None）
+        """
+        priority = PRIORITIES[kind]
+        deadline = time.monotonic() + settings.ADMISSION_QUEUE_TIMEOUT
+        started = time.perf_counter()
+        route_limiter = self.route_limiter(route) if kind == ANALYTICS else None
+        if route_limiter is not None:
+            await route_limiter.acquire(priority, settings.ADMISSION_QUEUE_TIMEOUT)
+        try:
+            await self.shared.acquire(priority, max(deadline - time.monotonic(), 0.001))
+        except BaseException:
+            if route_limiter is not None:
+                route_limiter.release()
+            raise
+        admission_queue_wait.observe(time.perf_counter() - started, priority=kind)
+        return route_limiter
+
+    def release(self, route_limiter: Optional[PriorityLimiter]):
+        self.shared.release()
+        if route_limiter is not None:
+            route_limiter.release()
+
+controller = AdmissionController()
+
+def admission(route: str, kind: str = INTERACTIVE):
+    """
+    生成路由依赖：先检查用户配额，再按优先级等待并发名额，请求处理完后释放
+    """
+    async def admit(current_user: User = Depends(get_current_active_user)):
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        try:
+            if cache_backend() == "memory":
+                controller.check_quota(current_user.username, kind)
+            else:
+                # 共享缓存后端（SQLite/Redis）的读写是阻塞调用，放到线程池中执行
+                await run_in_threadpool(controller.check_quota, current_user.username, kind)
+            route_limiter = await controller.acquire(route, kind)
+        except AdmissionRejected as e:
+            admission_requests_total.inc(route=route, outcome=e.reason)
+            detail = "请求过于频繁，请稍后重试" if e.status_code == 429 else "服务繁忙，请稍后重试"
+            raise HTTPException(
+                status_code=e.status_code, detail=detail,
+                headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))}
+            )
+        admission_requests_total.inc(route=route, outcome="admitted")
+        try:
+            yield
+        finally:
+            controller.release(route_limiter)
+    return admit
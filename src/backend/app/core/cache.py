@@ -0,0 +1,336 @@
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.metrics import cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+def _gcra(tat: float, now: float, rate: float, burst: float) -> Tuple[float, float]:
+    """
+    令牌桶的 GCRA 形式：只保存一个时间点 tat（桶重新装满的时间），返回 (需要等待的秒数, 取令牌后的 tat)
+    """
+    interval = 1 / rate
+    tat = max(tat, now) + interval
+    wait = tat - now - burst * interval
+    return (wait, tat) if wait > 0 else (0.0, tat)
+
+# Redis 中原子地执行 GCRA，tat 以数字保存，桶装满后键自动过期
+_TAKE_TOKEN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or ARGV[1]), now) + interval
+local wait = tat - now - tonumber(ARGV[3]) * interval
+if wait > 0 then
+    return tostring(wait)
+end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+return '0'
+"""
+
+class BaseCache:
+    """
+    缓存后端接口
+    """
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """仅当键不存在时写入，返回是否写入成功（可用作跨进程锁）"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def take_token(self, key: str, rate: float, burst: float) -> float:
+        """
+        从键对应的令牌桶（容量 burst，每秒补充 rate 个）原子地取一个令牌；成功返回 0，否则返回需要等待的秒数
+        """
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None):
+        for key, value in mapping.items():
+            self.set(key, value, ttl)
+
+class MemoryCache(BaseCache):
+    """
+    进程内LRU缓存，仅在单进程内共享
+    """
+    def __init__(self, max_entries: int = 10000):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def _expires_at(self, ttl):
+        ttl = settings.CACHE_DEFAULT_TTL if ttl is None else ttl
+        return time.time() + ttl if ttl > 0 else None
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, self._expires_at(ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] is None or item[1] >= time.time()):
+                return False
+            self._data[key] = (value, self._expires_at(ttl))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def take_token(self, key, rate, burst):
+        with self._lock:
+            now = time.time()
+            item = self._data.get(key)
+            wait, tat = _gcra(item[0] if item is not None and item[1] >= now else now, now, rate, burst)
+            if not wait:
+                self._data[key] = (tat, tat)
+                self._data.move_to_end(key)
+                while len(self._data) > self._max_entries:
+                    self._data.popitem(last=False)
+            return wait
+
+class SqliteCache(BaseCache):
+    """
+    基于SQLite文件的共享缓存，同一主机上的多个worker进程共用
+    """
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expires_at(self, ttl):
+        ttl = settings.CACHE_DEFAULT_TTL if ttl is None else ttl
+        return time.time() + ttl if ttl > 0 else None
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+            "AND (expires_at IS NULL OR expires_at >= ?)",
+            (*keys, time.time())
+        ).fetchall()
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, mapping, ttl=None):
+        expires_at = self._expires_at(ttl)
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires_at) for key, value in mapping.items()]
+        )
+
+    def add(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE key = ? AND expires_at < ?", (key, time.time()))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(ttl))
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def take_token(self, key, rate, burst):
+        conn = self._conn()
+        # 写事务串行化各worker对同一个桶的读-改-写
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            wait, tat = _gcra(pickle.loads(row[0]) if row else now, now, rate, burst)
+            if not wait:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, pickle.dumps(tat, pickle.HIGHEST_PROTOCOL), tat)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+class RedisCache(BaseCache):
+    """
+    Redis缓存，可跨主机共享
+    """
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._take_token = self._client.register_script(_TAKE_TOKEN_SCRIPT)
+
+    def _ttl(self, ttl):
+        ttl = settings.CACHE_DEFAULT_TTL if ttl is None else ttl
+        return ttl if ttl > 0 else None
+
+    def get(self, key):
+        value = self._client.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget(keys)
+        return {key: pickle.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=self._ttl(ttl))
+
+    def set_many(self, mapping, ttl=None):
+        pipe = self._client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=self._ttl(ttl))
+        pipe.execute()
+
+    def add(self, key, value, ttl=None):
+        return bool(self._client.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=self._ttl(ttl), nx=True))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def take_token(self, key, rate, burst):
+        return float(self._take_token(keys=[key], args=[time.time(), 1 / rate, burst]))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def cache_backend() -> str:
+    """
+    实际使用的缓存后端：未配置时按worker数选择，进程内缓存无法在多个worker之间共享预热、同步等协调锁
+    """
+    if settings.CACHE_BACKEND:
+        return settings.CACHE_BACKEND.lower()
+    from app.core.worker import default_worker_count
+    return "sqlite" if default_worker_count() > 1 else "memory"
+
+def get_cache() -> BaseCache:
+    """
+    获取当前配置的缓存后端（按进程延迟创建）
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = cache_backend()
+                if backend == "redis":
+                    _cache = RedisCache(settings.CACHE_URL or "redis://localhost:6379/0")
+                elif backend == "sqlite":
+                    _cache = SqliteCache(settings.CACHE_URL or os.path.join(settings.DATA_DIR, "cache.db"))
+                else:
+                    _cache = MemoryCache()
+                logger.info(f"缓存后端: {type(_cache).__name__}")
+    return _cache
+
+def make_key(prefix: str, *args, **kwargs) -> str:
+    """
+    根据函数参数生成缓存键
+    """
+    parts = [prefix] + [str(arg) for arg in args]
+    parts += [f"{k}={v}" for k, v in sorted(kwargs.items())]
+    return ":".join(parts)
+
+def cache_get(key: str) -> Optional[Any]:
+    """
+    读取缓存，缓存后端出错时视为未命中
+    """
+    try:
+        return get_cache().get(key)
+    except Exception as e:
+        logger.warning(f"读取缓存失败: {str(e)}")
+        return None
+
+def cache_set(key: str, value: Any, ttl: Optional[int] = None):
+    """
+    写入缓存，缓存后端出错时只记录日志
+    """
+    try:
+        get_cache().set(key, value, ttl)
+    except Exception as e:
+        logger.warning(f"写入缓存失败: {str(e)}")
+
+def cached(prefix: str, ttl: Union[int, Callable[..., Optional[int]], None] = None):
+    """
+    缓存函数返回值的装饰器，空结果（出错时的返回值）不缓存
+
+    ttl 可以是以函数参数调用、返回过期秒数的函数，例如按K线周期决定缓存时长
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(prefix, *args, **kwargs)
+            value = cache_get(key)
+            if value is not None:
+                cache_requests_total.inc(cache=prefix, result="hit")
+                return value
+            cache_requests_total.inc(cache=prefix, result="miss")
+            value = func(*args, **kwargs)
+            if value:
+                cache_set(key, value, ttl(*args, **kwargs) if callable(ttl) else ttl)
+            return value
+        return wrapper
+    return decorator
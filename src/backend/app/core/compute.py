@@ -0,0 +1,188 @@
+"""
+CPU密集计算的进程池
+
+指标计算、选股和相关性分析在独立进程中执行，不占用事件循环所在进程的GIL。
+输入的NumPy数组放入一块共享内存，子进程直接映射使用，只有很小的描述信息需要序列化
+"""
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.profiling import call_sampled, collect_profile, merge_profile, profile_section, profiling_active
+
+logger = logging.getLogger(__name__)
+
+compute_tasks_total = Counter(
+    "compute_tasks_total", "CPU密集任务数", ("task", "mode", "outcome")
+)
+compute_task_duration = Histogram(
+    "compute_task_duration_seconds", "CPU密集任务耗时（含排队和数据传输）", ("task", "mode")
+)
+
+# 描述信息: 共享内存名称和 {键: (偏移, 形状, dtype)}
+Layout = Tuple[str, Dict[str, Tuple[int, Tuple[int, ...], str]]]
+
+_ALIGN = 64
+
+def _pack(arrays: Dict[str, Any]):
+    """
+    把多个数组复制到同一块共享内存，返回共享内存对象和描述信息
+    """
+    import numpy as np
+    layout = {}
+    offset = 0
+    for key, array in arrays.items():
+        array = np.asarray(array)
+        layout[key] = (offset, array.shape, array.dtype.str)
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for key, array in arrays.items():
+        start, shape, dtype = layout[key]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = array
+    return shm, (shm.name, layout)
+
+def _invoke(func: Callable, layout: Layout, args: tuple, kwargs: dict, profile_interval: Optional[float] = None):
+    """
+    在子进程中执行：映射共享内存为只读数组后调用任务函数
+
+    指定 profile_interval 时在子进程中采样，返回 (结果, 栈, 代码段)
+    """
+    import numpy as np
+    name, fields = layout
+    # 子进程由本进程池启动，与父进程共用同一个 resource_tracker（按名称去重登记），
+    # 共享内存由父进程在任务结束后统一 unlink
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = {}
+    try:
+        for key, (offset, shape, dtype) in fields.items():
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            arrays[key].flags.writeable = False
+        if profile_interval:
+            return collect_profile(profile_interval, func, arrays, *args, **kwargs)
+        return func(arrays, *args, **kwargs)
+    finally:
+        arrays = None
+        try:
+            shm.close()
+        except BufferError:
+            # 结果仍引用着共享内存（例如直接返回了输入的切片），映射随进程退出释放
+            pass
+
+def _warm_up():
+    # 预先导入指标计算相关模块，避免第一个请求承担导入耗时
+    from app.indicators.registry import get_backend
+    get_backend()
+    return True
+
+class ComputePool:
+    """
+    进程池的生命周期管理：首次使用时启动，子进程异常退出后自动重建
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 使用spawn：父进程中有事件循环、线程和数据库连接，fork不安全
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"计算进程池已启动，进程数: {self.workers}")
+            return self._executor
+
+    def start(self):
+        if self.enabled:
+            self.executor().submit(_warm_up)
+
+    def reset(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+compute_pool = ComputePool(settings.COMPUTE_WORKERS)
+
+async def run_cpu(task: str, func: Callable, arrays: Dict[str, Any], *args,
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    执行 func(arrays, *args, **kwargs)，func 必须是模块级函数
+
+    数据量较小（不超过 COMPUTE_INLINE_MAX_CELLS 个元素）或未启用进程池时在线程池中执行，
+    避免进程间通信的开销超过计算本身；超时返回504，排队中的任务会被取消。
+    剖析中记录为 compute.<task> 代码段（含排队和结果传回），进程池模式另记录输入写入共享内存的 compute.<task>.pack；
+    任务函数内的代码段和调用栈（线程池中直接采样，进程池中由子进程采样后传回）合并到当前请求的剖析中
+    """
+    import numpy as np
+    timeout = settings.COMPUTE_TIMEOUT if timeout is None else timeout
+    cells = sum(np.asarray(a).size for a in arrays.values())
+    mode = "process" if compute_pool.enabled and cells > settings.COMPUTE_INLINE_MAX_CELLS else "thread"
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with profile_section(f"compute.{task}"):
+            if mode == "thread":
+                result = await asyncio.wait_for(run_in_threadpool(call_sampled, func, arrays, *args, **kwargs), timeout)
+            else:
+                result = await _run_in_process(task, func, arrays, args, kwargs, timeout)
+        outcome = "ok"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        logger.warning(f"计算任务 {task} 超过 {timeout} 秒未完成")
+        raise HTTPException(status_code=504, detail="计算超时，请缩小分析范围后重试")
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        compute_tasks_total.inc(task=task, mode=mode, outcome=outcome)
+        compute_task_duration.observe(time.perf_counter() - started, task=task, mode=mode)
+
+async def _run_in_process(task, func, arrays, args, kwargs, timeout):
+    with profile_section(f"compute.{task}.pack"):
+        shm, layout = _pack(arrays)
+    executor = compute_pool.executor()
+    profile_interval = settings.PROFILE_INTERVAL_MS / 1000 if profiling_active() else None
+    try:
+        future = executor.submit(_invoke, func, layout, args, kwargs, profile_interval)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # 超时或客户端断开：排队中的任务直接取消；已在执行的任务无法中断，结果被丢弃
+            future.cancel()
+            raise
+        except BrokenProcessPool:
+            logger.error("计算进程异常退出，重建进程池")
+            compute_pool.reset(executor)
+            raise HTTPException(status_code=503, detail="计算服务暂时不可用，请稍后重试")
+        if profile_interval:
+            result, stacks, sections = result
+            merge_profile(stacks, sections, f"compute-process:{task}")
+        return result
+    finally:
+        # 子进程在任务结束前一直映射着共享内存；在 Linux 上删除名称不影响已有的映射
+        shm.close()
+        shm.unlink()
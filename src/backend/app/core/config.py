@@ -3,10 +3,32 @@ import secrets
 from typing import Any, Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, BaseSettings, validator
 
+def _load_secret_key() -> str:
+    """
+    获取JWT密钥：未配置时生成一个并保存到数据目录，保证多个worker进程使用同一密钥
+    """
+    secret_key = os.getenv("SECRET_KEY")
+    if secret_key:
+        return secret_key
+    
+    key_file = os.path.join(os.getenv("DATA_DIR", "/app/data"), ".secret_key")
+    try:
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_urlsafe(32))
+    except FileExistsError:
+        pass
+    except OSError:
+        # 数据目录不可写时退化为进程内随机密钥
+        return secrets.token_urlsafe(32)
+    
+    with open(key_file) as f:
+        return f.read().strip()
+
 class Settings(BaseSettings):
     # 基本配置
     API_V1_STR: str = "/api"
-    SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
+    SECRET_KEY: str = _load_secret_key()
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7天
     
     # 数据目录
@@ -18,10 +40,90 @@ class Settings(BaseSettings):
         "DATABASE_URL", f"sqlite:///{DATA_DIR}/app.db"
     )
     
-    # 美股数据API配置
+    # 部署配置
+    DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 表示按可用CPU核数
+    
+    # 缓存配置
+    # memory, sqlite, redis；未设置时多worker使用 sqlite（worker间共享锁和缓存），单worker使用 memory
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "")
+    CACHE_URL: str = os.getenv("CACHE_URL", "")  # redis://... 或 sqlite缓存文件路径
+    CACHE_DEFAULT_TTL: int = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+    CACHE_WARMUP_SYMBOLS: str = os.getenv("CACHE_WARMUP_SYMBOLS", "AAPL,MSFT,GOOGL,AMZN,META")
+    
+    # 指标配置：多worker部署时各进程把指标写入该目录，由/metrics合并输出
+    METRICS_MULTIPROC_DIR: str = os.getenv("METRICS_MULTIPROC_DIR", "")
+    
+    # 请求剖析配置：开启后带 X-Profile 请求头的请求会被采样剖析
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")  # 非空时 X-Profile 的值必须与之相同
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 无请求头时的随机剖析比例
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+    PROFILES_DIR: str = os.getenv("PROFILES_DIR", f"{DATA_DIR}/profiles")
+    
+    # 响应压缩与HTTP缓存配置
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # 字节
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    MARKET_OPEN_MAX_AGE: int = int(os.getenv("MARKET_OPEN_MAX_AGE", "60"))  # 交易时段内行情数据缓存秒数
+    MARKET_CLOSED_MAX_AGE: int = int(os.getenv("MARKET_CLOSED_MAX_AGE", "3600"))  # 休市期间缓存秒数上限
+    PUBLIC_MAX_AGE: int = int(os.getenv("PUBLIC_MAX_AGE", "15"))  # 涨跌榜、板块等公共数据
+    PUBLIC_STALE_WHILE_REVALIDATE: int = int(os.getenv("PUBLIC_STALE_WHILE_REVALIDATE", "30"))
+    PUBLIC_STALE_IF_ERROR: int = int(os.getenv("PUBLIC_STALE_IF_ERROR", "300"))
+    
+    # 美股数据API配置：MARKET_DATA_PROVIDER 为 yfinance，或 yahoo_http（直接请求 MARKET_DATA_URL 上的 Yahoo 接口）
+    MARKET_DATA_PROVIDER: str = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+    MARKET_DATA_URL: str = os.getenv("MARKET_DATA_URL", "https://query2.finance.yahoo.com")
+    UPSTREAM_TIMEOUT: int = int(os.getenv("UPSTREAM_TIMEOUT", "10"))  # 秒
+    QUOTE_BATCH_SIZE: int = int(os.getenv("QUOTE_BATCH_SIZE", "200"))  # 单次批量报价请求的股票数
+    QUOTE_CACHE_TTL: int = int(os.getenv("QUOTE_CACHE_TTL", "60"))
+    # 日内K线只获取该周期，更粗的日内周期由其聚合得到（上游1m数据只保留7天，5m保留60天）
+    INTRADAY_BASE_INTERVAL: str = os.getenv("INTRADAY_BASE_INTERVAL", "5m")
+    INTRADAY_CACHE_TTL: int = int(os.getenv("INTRADAY_CACHE_TTL", "60"))
+    HISTORY_CACHE_TTL: int = int(os.getenv("HISTORY_CACHE_TTL", "300"))
+    # CPU密集计算的进程池，0表示在线程池中执行
+    COMPUTE_WORKERS: int = int(os.getenv("COMPUTE_WORKERS", "2"))
+    COMPUTE_TIMEOUT: float = float(os.getenv("COMPUTE_TIMEOUT", "30"))
+    COMPUTE_INLINE_MAX_CELLS: int = int(os.getenv("COMPUTE_INLINE_MAX_CELLS", "50000"))  # 数据量较小时不值得跨进程
+    INDICATOR_BACKEND: str = os.getenv("INDICATOR_BACKEND", "numpy")  # pandas, numpy, numba, talib
+    CORRELATION_MAX_WINDOW: int = int(os.getenv("CORRELATION_MAX_WINDOW", "756"))  # 约3年
+    # 证券列表同步：数据源为 "nasdaqtrader" 或本地 CSV/JSON 文件路径；间隔为秒，0 表示不在后台自动同步
+    UNIVERSE_SOURCE: str = os.getenv("UNIVERSE_SOURCE", "nasdaqtrader")
+    UNIVERSE_SYNC_INTERVAL: int = int(os.getenv("UNIVERSE_SYNC_INTERVAL", "86400"))
+    UNIVERSE_CACHE_SIZE: int = int(os.getenv("UNIVERSE_CACHE_SIZE", "4"))  # 缓存的K线矩阵数，0表示不缓存
+    # K线矩阵的价格存储类型：float64 或 float32（内存减半，价格保留约7位有效数字）
+    BAR_PRICE_DTYPE: str = os.getenv("BAR_PRICE_DTYPE", "float64")
+    # 预热快照：每隔 SNAPSHOT_INTERVAL 秒（0表示不写入）保存热点数据，启动时恢复不超过 SNAPSHOT_MAX_AGE 秒的快照
+    SNAPSHOT_PATH: str = os.getenv("SNAPSHOT_PATH", "")  # 默认为 DATA_DIR/warm_start.snapshot
+    SNAPSHOT_INTERVAL: int = int(os.getenv("SNAPSHOT_INTERVAL", "300"))
+    SNAPSHOT_MAX_AGE: int = int(os.getenv("SNAPSHOT_MAX_AGE", "86400"))
+    SNAPSHOT_MAX_SYMBOLS: int = int(os.getenv("SNAPSHOT_MAX_SYMBOLS", "200"))
     ALPHA_VANTAGE_API_KEY: str = os.getenv("ALPHA_VANTAGE_API_KEY", "")
     FINNHUB_API_KEY: str = os.getenv("FINNHUB_API_KEY", "")
     
+    # 日志：队列满时丢弃新记录；不低于 SYSTEM_LOG_LEVEL 的记录批量写入 system_logs（为空则不写）
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    SYSTEM_LOG_LEVEL: str = os.getenv("SYSTEM_LOG_LEVEL", "WARNING")
+    SYSTEM_LOG_BATCH_SIZE: int = int(os.getenv("SYSTEM_LOG_BATCH_SIZE", "200"))
+    SYSTEM_LOG_FLUSH_INTERVAL: float = float(os.getenv("SYSTEM_LOG_FLUSH_INTERVAL", "2"))
+    SLOW_REQUEST_THRESHOLD: float = float(os.getenv("SLOW_REQUEST_THRESHOLD", "1"))  # 秒
+    
+    # 准入控制：总并发和排队上限、排队超时（秒）、分析类接口的单路由并发，以及每个用户的令牌桶（每秒补充数/容量）。
+    # 并发上限为整个实例的值，平均分给各worker；排队上限按每个worker计算；令牌桶保存在共享缓存后端中
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+    ADMISSION_RETRY_AFTER: float = float(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+    ANALYTICS_ROUTE_CONCURRENCY: int = int(os.getenv("ANALYTICS_ROUTE_CONCURRENCY", "4"))
+    ANALYTICS_RATE: float = float(os.getenv("ANALYTICS_RATE", "0.5"))
+    ANALYTICS_BURST: float = float(os.getenv("ANALYTICS_BURST", "10"))
+    INTERACTIVE_RATE: float = float(os.getenv("INTERACTIVE_RATE", "10"))
+    INTERACTIVE_BURST: float = float(os.getenv("INTERACTIVE_BURST", "50"))
+    
+    # 价格提醒检查间隔（秒），0 表示不在后台自动检查
+    ALERT_CHECK_INTERVAL: int = int(os.getenv("ALERT_CHECK_INTERVAL", "300"))
+    
     # 登录密码
     LOGIN_PASSWORD: str = os.getenv("LOGIN_PASSWORD", "admin")
     
@@ -36,6 +138,12 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
 
+    @validator("BAR_PRICE_DTYPE")
+    def check_bar_price_dtype(cls, v: str) -> str:
+        if v not in ("float64", "float32"):
+            raise ValueError(f"BAR_PRICE_DTYPE 只能是 float64 或 float32: {v}")
+        return v
+
     # 系统配置
     PROJECT_NAME: str = "US Stock Scanner"
     
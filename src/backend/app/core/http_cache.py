@@ -0,0 +1,86 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.core.market_hours import seconds_until_open
+from app.core.responses import FastJSONResponse, NDJSONResponse
+
+def make_etag(*parts: Any) -> str:
+    """
+    根据数据版本（例如股票代码、请求参数、最后一根K线时间）生成ETag
+
+    使用弱ETag：同一数据经过不同压缩方式后字节不同，但语义相同
+    """
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    检查 If-None-Match 是否与当前ETag匹配
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def market_data_cache_control(private: bool = True) -> str:
+    """
+    行情数据的 Cache-Control：交易时段内短时间缓存；休市期间数据不会变化，可缓存到下次开盘
+    """
+    scope = "private" if private else "public"
+    until_open = seconds_until_open()
+    if until_open == 0:
+        max_age = settings.MARKET_OPEN_MAX_AGE
+    else:
+        max_age = min(until_open, settings.MARKET_CLOSED_MAX_AGE)
+    return f"{scope}, max-age={max_age}"
+
+def public_cache_control() -> str:
+    """
+    与用户无关的公共数据：允许代理共享缓存，过期后可在后台刷新期间继续返回旧数据
+    """
+    return (
+        f"public, max-age={settings.PUBLIC_MAX_AGE}, "
+        f"stale-while-revalidate={settings.PUBLIC_STALE_WHILE_REVALIDATE}, "
+        f"stale-if-error={settings.PUBLIC_STALE_IF_ERROR}"
+    )
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def conditional_json(request: Request, etag: str, content_factory, cache_control: Optional[str] = None,
+                     headers: Optional[Dict[str, str]] = None, ndjson: bool = False) -> Response:
+    """
+    ETag匹配时直接返回304，跳过计算和序列化；否则调用 content_factory 生成响应内容
+
+    ndjson 为 True 时 content_factory 返回行的可迭代对象，以NDJSON流式返回
+    """
+    cache_control = cache_control or market_data_cache_control()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    if ndjson:
+        return NDJSONResponse(content_factory(), headers=headers)
+    return FastJSONResponse(content_factory(), headers=headers)
+
+async def conditional_json_async(request: Request, etag: str, content_factory,
+                                 cache_control: Optional[str] = None) -> Response:
+    """
+    与 conditional_json 相同，content_factory 返回可等待对象（例如在计算进程池中执行的任务）
+    """
+    cache_control = cache_control or market_data_cache_control()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
+    return FastJSONResponse(await content_factory(), headers={"ETag": etag, "Cache-Control": cache_control})
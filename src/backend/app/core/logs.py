@@ -0,0 +1,217 @@
+"""
+异步日志：业务代码（包括事件循环线程）只把日志记录放入内存队列，由后台线程写文件、控制台和数据库
+
+- 队列满时丢弃新记录并计数，日志突增（例如上游数据源故障）不会阻塞请求
+- system_logs 表按条数或时间间隔批量写入，每条记录带上所在请求的路由、用户和已耗时
+"""
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import traceback
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+log_records_dropped_total = Counter(
+    "log_records_dropped_total", "日志队列已满而丢弃的记录数", ("level",)
+)
+system_log_writes_total = Counter(
+    "system_log_writes_total", "写入 system_logs 的批次数", ("outcome",)
+)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# 写数据库时数据库驱动自身产生的日志不再写回数据库
+_DB_LOGGERS = ("sqlalchemy",)
+
+class RequestLogContext:
+    """
+    单个请求的日志上下文；对象在请求内共享，线程池中执行的依赖（例如认证）也能填入用户
+    """
+    __slots__ = ("scope", "user_id", "started")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.user_id: Optional[int] = None
+        self.started = time.perf_counter()
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+_log_context: ContextVar[Optional[RequestLogContext]] = ContextVar("log_context", default=None)
+
+def set_log_user(user_id: Optional[int]):
+    context = _log_context.get()
+    if context is not None:
+        context.user_id = user_id
+
+class RequestContextFilter(logging.Filter):
+    """
+    在产生日志的线程中附加请求字段（后台线程中已取不到请求上下文）
+    """
+    def filter(self, record):
+        context = _log_context.get()
+        if context is not None:
+            record.route = context.route
+            record.user_id = context.user_id
+            if not hasattr(record, "latency_ms"):
+                record.latency_ms = (time.perf_counter() - context.started) * 1000
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped_total.inc(level=record.levelname)
+
+class SystemLogHandler(logging.Handler):
+    """
+    批量写入 system_logs：缓冲达到 batch_size 条或距上次写入超过 flush_interval 秒时写入一次
+    """
+    def __init__(self, level=logging.WARNING, batch_size: int = 200, flush_interval: float = 2.0):
+        super().__init__(level)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[dict] = []
+        self._buffer_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_periodically, name="system-log-flush", daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        if record.name.startswith(_DB_LOGGERS):
+            return
+        row = {
+            "level": record.levelname,
+            "message": record.getMessage(),  # QueueHandler 已把异常堆栈并入消息
+            "timestamp": datetime.utcfromtimestamp(record.created),
+            "source": record.name[:100],
+            "user_id": getattr(record, "user_id", None),
+            "route": getattr(record, "route", None),
+            "status_code": getattr(record, "status_code", None),
+            "latency_ms": getattr(record, "latency_ms", None),
+        }
+        with self._buffer_lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        from sqlalchemy import insert
+        from app.db.session import engine
+        from app.models.models import SystemLog
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(SystemLog), rows)
+            system_log_writes_total.inc(outcome="ok")
+        except Exception:
+            # 不能通过 logging 报告，否则写入失败的日志又会进入队列
+            system_log_writes_total.inc(outcome="error")
+            sys.stderr.write(f"写入 system_logs 失败，丢弃 {len(rows)} 条记录\n")
+            traceback.print_exc(file=sys.stderr)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        super().close()
+
+class RequestLogMiddleware:
+    """
+    建立请求的日志上下文；耗时超过 SLOW_REQUEST_THRESHOLD 或返回5xx的请求记录一条带状态码和耗时的日志
+    """
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("app.access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = RequestLogContext(scope)
+        token = _log_context.set(context)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency_ms = (time.perf_counter() - context.started) * 1000
+            if status_code >= 500 or latency_ms >= settings.SLOW_REQUEST_THRESHOLD * 1000:
+                level = logging.ERROR if status_code >= 500 else logging.WARNING
+                self.logger.log(
+                    level, f"{scope.get('method', '')} {scope.get('path', '')} 返回 {status_code}，耗时 {latency_ms:.0f}ms",
+                    extra={"status_code": status_code, "latency_ms": latency_ms}
+                )
+            _log_context.reset(token)
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging() -> QueueListener:
+    """
+    配置根日志：根日志只挂一个非阻塞的队列处理器，文件、控制台和数据库处理器在后台线程中执行
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.FileHandler(os.path.join(settings.LOGS_DIR, "app.log")), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    if settings.SYSTEM_LOG_LEVEL:
+        handlers.append(SystemLogHandler(
+            level=settings.SYSTEM_LOG_LEVEL.upper(),
+            batch_size=settings.SYSTEM_LOG_BATCH_SIZE,
+            flush_interval=settings.SYSTEM_LOG_FLUSH_INTERVAL
+        ))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """
+    处理完队列中剩余的记录并写入数据库
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
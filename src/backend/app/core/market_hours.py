@@ -0,0 +1,42 @@
+from datetime import datetime, time, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+# 美股常规交易时段（美东时间），未考虑交易所节假日
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+def _now(now: Optional[datetime] = None) -> datetime:
+    if now is None:
+        return datetime.now(MARKET_TZ)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=ZoneInfo("UTC"))
+    return now.astimezone(MARKET_TZ)
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """
+    当前是否处于常规交易时段
+    """
+    now = _now(now)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def seconds_until_open(now: Optional[datetime] = None) -> int:
+    """
+    距离下一次开盘的秒数，交易时段内返回0
+    """
+    now = _now(now)
+    if is_market_open(now):
+        return 0
+    candidate = now.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if now.time() >= MARKET_OPEN:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return int((candidate - now).total_seconds())
+
+def calendar_days_for_bars(bars: int) -> int:
+    """
+    估算覆盖 bars 根日K线所需的日历天数（约每周5个交易日，另加节假日余量）
+    """
+    return int(bars * 7 / 5) + 10
@@ -0,0 +1,316 @@
+import os
+import glob
+import time
+import pickle
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Registry:
+    """
+    指标注册表，输出Prometheus文本格式
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def collect(self) -> Dict[str, Tuple[str, dict]]:
+        return {m.name: (m.type, m.snapshot()) for m in self._metrics}
+
+    def render(self) -> str:
+        states = [self.collect()]
+        if settings.METRICS_MULTIPROC_DIR:
+            # 多worker模式：合并其他worker导出的指标
+            states = _load_worker_states()
+        lines = []
+        for metric in self._metrics:
+            values = _merge(metric, [state.get(metric.name, (metric.type, {}))[1] for state in states])
+            lines.append(f"# HELP {metric.name} {metric.doc}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple, **extra) -> Dict[str, str]:
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: (list(v) if isinstance(v, list) else v) for k, v in self._values.items()}
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self, values):
+        return [f"{self.name}{_format_labels(self._labels(k))} {v}" for k, v in sorted(values.items())]
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self, values):
+        return [f"{self.name}{_format_labels(self._labels(k))} {v}" for k, v in sorted(values.items())]
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # 各桶计数（最后一个为+Inf）、总和、次数
+                state = [0] * (len(self.buckets) + 1) + [0.0, 0]
+                self._values[key] = state
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self, values):
+        lines = []
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-2]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self._labels(key, le=le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self._labels(key))} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self._labels(key))} {state[-1]}")
+        return lines
+
+def _merge(metric, snapshots: List[dict]) -> dict:
+    """
+    合并多个进程的指标：计数器和直方图求和，仪表取各进程最大值
+    """
+    merged = {}
+    for values in snapshots:
+        for key, value in values.items():
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif metric.type == "histogram":
+                merged[key] = [a + b for a, b in zip(merged[key], value)]
+            elif metric.type == "gauge":
+                merged[key] = max(merged[key], value)
+            else:
+                merged[key] += value
+    return merged
+
+def dump_worker_state():
+    """
+    多worker模式下把本进程的指标写入共享目录
+    """
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.pkl")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(REGISTRY.collect(), f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def _load_worker_states() -> List[dict]:
+    dump_worker_state()
+    states = []
+    for path in glob.glob(os.path.join(settings.METRICS_MULTIPROC_DIR, "*.pkl")):
+        try:
+            with open(path, "rb") as f:
+                states.append(pickle.load(f))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            continue
+    return states
+
+# HTTP请求指标
+http_requests_total = Counter(
+    "http_requests_total", "HTTP请求总数", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP请求耗时", ("method", "route")
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "每个请求的数据库查询次数", ("route",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+http_request_db_duration = Histogram(
+    "http_request_db_duration_seconds", "每个请求的数据库查询总耗时", ("route",)
+)
+
+# 上游数据源指标
+upstream_request_duration = Histogram(
+    "upstream_request_duration_seconds", "上游数据源调用耗时", ("provider", "operation")
+)
+upstream_errors_total = Counter(
+    "upstream_errors_total", "上游数据源调用失败次数", ("provider", "operation")
+)
+
+# 缓存指标
+cache_requests_total = Counter(
+    "cache_requests_total", "缓存读取次数", ("cache", "result")
+)
+
+# 数据库指标
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "单条数据库查询耗时"
+)
+
+# 事件循环延迟
+event_loop_lag = Gauge(
+    "event_loop_lag_seconds", "事件循环调度延迟（最近一次采样）"
+)
+event_loop_lag_histogram = Histogram(
+    "event_loop_lag_histogram_seconds", "事件循环调度延迟分布"
+)
+
+class RequestStats:
+    """
+    单个请求内的统计数据
+    """
+    __slots__ = ("db_queries", "db_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+@contextmanager
+def track_upstream(provider: str, operation: str):
+    """
+    记录一次上游数据源调用的耗时和错误
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        upstream_errors_total.inc(provider=provider, operation=operation)
+        raise
+    finally:
+        upstream_request_duration.observe(time.perf_counter() - start, provider=provider, operation=operation)
+
+def instrument_engine(engine):
+    """
+    为SQLAlchemy引擎注册查询计时
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        db_query_duration.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+
+class MetricsMiddleware:
+    """
+    记录每个路由的请求耗时、状态码和数据库查询情况
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            # 使用路由模板而不是实际路径，避免标签基数爆炸
+            route_path = getattr(route, "path", None) or "other"
+            method = scope.get("method", "")
+            http_requests_total.inc(method=method, route=route_path, status=status_code)
+            http_request_duration.observe(elapsed, method=method, route=route_path)
+            http_request_db_queries.observe(stats.db_queries, route=route_path)
+            http_request_db_duration.observe(stats.db_seconds, route=route_path)
+            _request_stats.reset(token)
+
+async def monitor_event_loop(interval: float = 0.5):
+    """
+    周期性测量事件循环延迟，并在多worker模式下导出指标
+    """
+    loop = asyncio.get_running_loop()
+    last_dump = loop.time()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - expected, 0.0)
+        event_loop_lag.set(lag)
+        event_loop_lag_histogram.observe(lag)
+        if settings.METRICS_MULTIPROC_DIR and loop.time() - last_dump >= 5:
+            last_dump = loop.time()
+            try:
+                dump_worker_state()
+            except OSError as e:
+                logger.warning(f"导出指标失败: {str(e)}")
+
+def render_metrics() -> str:
+    return REGISTRY.render()
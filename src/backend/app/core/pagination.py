@@ -0,0 +1,55 @@
+"""
+游标分页（keyset）：下一页的起点由上一页最后一行的排序键决定，翻页代价与页码无关，
+翻页期间插入或删除行也不会重复或遗漏。游标对客户端不透明，下一页游标放在响应头中返回
+"""
+import json
+import base64
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(**values: Any) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str, *fields: str) -> Dict[str, Any]:
+    """
+    解析游标并检查包含所需的字段，游标无效时抛出 InvalidCursor
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursor("无效的分页游标")
+    if not isinstance(values, dict) or any(field not in values for field in fields):
+        raise InvalidCursor("无效的分页游标")
+    return values
+
+def cursor_param(cursor: Optional[str], *fields: str) -> Optional[Dict[str, Any]]:
+    """
+    路由中使用：没有游标时返回 None，游标无效时返回400
+    """
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, *fields)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def page_size(limit: int) -> int:
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+def wants_ndjson(request: Request, format: Optional[str] = None) -> bool:
+    """
+    format=ndjson，或未指定 format 时 Accept 头要求 application/x-ndjson，则以NDJSON流式返回
+    """
+    if format:
+        if format not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail="format 只能为 json 或 ndjson")
+        return format == "ndjson"
+    return "application/x-ndjson" in request.headers.get("accept", "")
@@ -0,0 +1,261 @@
+import os
+import sys
+import time
+import uuid
+import json
+import random
+import logging
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RequestProfile:
+    """
+    单个请求的采样剖析结果
+
+    thread_id 为处理请求的线程（事件循环线程）；请求交给线程池执行的代码运行期间，
+    其所在线程登记在 worker_threads 中一并采样
+    """
+    def __init__(self, name: str, thread_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.stacks = Counter()
+        self.sections: Dict[str, float] = {}
+        self.worker_threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def add_section(self, name: str, elapsed_ms: float):
+        with self._lock:
+            self.sections[name] = self.sections.get(name, 0.0) + elapsed_ms
+
+    def attach_thread(self, thread_id: int):
+        with self._lock:
+            self.worker_threads[thread_id] = self.worker_threads.get(thread_id, 0) + 1
+
+    def detach_thread(self, thread_id: int):
+        with self._lock:
+            depth = self.worker_threads.pop(thread_id, 1) - 1
+            if depth > 0:
+                self.worker_threads[thread_id] = depth
+
+    def merge(self, stacks: Dict[str, int], sections: Dict[str, float], root: str):
+        """
+        合并其他进程中采样的结果，栈以 root 为根帧
+        """
+        with self._lock:
+            for stack, count in stacks.items():
+                self.stacks[f"{root};{stack}"] += count
+            for name, elapsed_ms in sections.items():
+                self.sections[name] = self.sections.get(name, 0.0) + elapsed_ms
+
+    def folded(self) -> str:
+        """
+        折叠栈格式（每行 "frame;frame;frame count"），可直接交给 flamegraph.pl / speedscope
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def server_timing(self) -> str:
+        return ", ".join(f'{name};dur={ms:.2f}' for name, ms in self.sections.items())
+
+class StackSampler(threading.Thread):
+    """
+    后台线程定时采样请求线程和当前登记的工作线程的调用栈
+
+    异步路由运行在事件循环线程上，采样期间同一线程处理的其他请求也会被计入；
+    工作线程的栈以 "worker-thread" 为根帧，与事件循环线程上的等待区分
+    """
+    def __init__(self, profile: RequestProfile, interval: float):
+        super().__init__(daemon=True, name="request-profiler")
+        self.profile = profile
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            self._sample(frames.get(self.profile.thread_id), None)
+            for thread_id in list(self.profile.worker_threads):
+                self._sample(frames.get(thread_id), "worker-thread")
+
+    def _sample(self, frame, root: Optional[str]):
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            stack.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        if root:
+            stack.append(root)
+        self.profile.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+def profiling_active() -> bool:
+    return _current_profile.get() is not None
+
+@contextmanager
+def _sampled_thread(profile: RequestProfile):
+    # run_in_threadpool 会复制上下文，线程池中执行的代码也能取到当前请求的剖析；
+    # 运行期间把所在线程登记到剖析中，由采样线程一并采样
+    thread_id = threading.get_ident()
+    if thread_id == profile.thread_id:
+        yield
+        return
+    profile.attach_thread(thread_id)
+    try:
+        yield
+    finally:
+        profile.detach_thread(thread_id)
+
+@contextmanager
+def profile_section(name: str):
+    """
+    记录代码段耗时；当前请求未开启剖析时不做任何事
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        with _sampled_thread(profile):
+            yield
+    finally:
+        profile.add_section(name, (time.perf_counter() - start) * 1000)
+
+def call_sampled(func: Callable, *args, **kwargs) -> Any:
+    """
+    在线程池中执行 func 并采样所在线程；当前请求未开启剖析时直接调用
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return func(*args, **kwargs)
+    with _sampled_thread(profile):
+        return func(*args, **kwargs)
+
+def collect_profile(interval: float, func: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, int], Dict[str, float]]:
+    """
+    在计算子进程中剖析一次调用，返回结果、采样到的栈和代码段，由父进程通过 merge_profile 合并
+    """
+    profile = RequestProfile(func.__name__)
+    token = _current_profile.set(profile)
+    sampler = StackSampler(profile, interval)
+    sampler.start()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        sampler.stop()
+        _current_profile.reset(token)
+    return result, dict(profile.stacks), profile.sections
+
+def merge_profile(stacks: Dict[str, int], sections: Dict[str, float], root: str):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.merge(stacks, sections, root)
+
+def profiled(func):
+    """
+    把函数调用记录为剖析中的一个代码段
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_profile.get() is None:
+            return func(*args, **kwargs)
+        with profile_section(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def _should_profile(scope) -> bool:
+    # 未开启剖析时随机采样也不生效
+    if not settings.PROFILING_ENABLED:
+        return False
+    if settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return True
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile":
+            token = value.decode("latin-1")
+            if settings.PROFILE_TOKEN:
+                return token == settings.PROFILE_TOKEN
+            return token not in ("", "0", "false")
+    return False
+
+def _save_profile(profile: RequestProfile):
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILES_DIR, profile.id)
+    with open(base + ".folded", "w") as f:
+        f.write(profile.folded())
+    with open(base + ".json", "w") as f:
+        json.dump({
+            "id": profile.id,
+            "name": profile.name,
+            "started_at": profile.started_at,
+            "duration_ms": round(profile.duration_ms, 2),
+            "samples": sum(profile.stacks.values()),
+            "sections": {k: round(v, 2) for k, v in profile.sections.items()}
+        }, f, ensure_ascii=False)
+
+def load_profile(profile_id: str, folded: bool = False):
+    """
+    读取已保存的剖析结果
+    """
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(settings.PROFILES_DIR, profile_id + (".folded" if folded else ".json"))
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read() if folded else json.load(f)
+
+class ProfilingMiddleware:
+    """
+    对带有 X-Profile 请求头（或按配置采样）的单个请求进行栈采样剖析
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(f"{scope.get('method', '')} {scope.get('path', '')}")
+        token = _current_profile.set(profile)
+        sampler = StackSampler(profile, settings.PROFILE_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        sampler.start()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.add_section("total", (time.perf_counter() - start) * 1000)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            _current_profile.reset(token)
+            try:
+                _save_profile(profile)
+            except OSError as e:
+                logger.warning(f"保存剖析结果失败: {str(e)}")
@@ -0,0 +1,87 @@
+import json
+import math
+from typing import Any, Iterable, Iterator
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.profiling import profile_section
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时退回标准库json
+    orjson = None
+
+def _to_builtin(value: Any) -> Any:
+    """
+    标准库json的后备路径：把NumPy数组/标量转换为Python对象，NaN/Inf转换为None
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    if hasattr(value, "tolist"):  # NumPy数组和标量
+        return _to_builtin(value.tolist())
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+def _orjson_default(value: Any) -> Any:
+    # orjson 不直接支持的类型：非连续或object类型的NumPy数组、numpy.datetime64等
+    if hasattr(value, "tolist"):
+        return _to_builtin(value.tolist())
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """
+    序列化为紧凑的JSON字节串，NumPy数组和 NaN 的处理见 FastJSONResponse
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        _to_builtin(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    面向大批量数值数据的JSON响应：直接序列化NumPy数组，NaN（例如指标的预热期）输出为null
+
+    路由直接返回该响应时，FastAPI不再按 response_model 逐项校验和转换内容
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with profile_section("serialize"):
+            return dumps(content)
+
+NDJSON_CHUNK_SIZE = 64 * 1024
+
+def _ndjson_chunks(rows: Iterable[Any], chunk_size: int) -> Iterator[bytes]:
+    buffer = bytearray()
+    for row in rows:
+        buffer += dumps(row)
+        buffer += b"\n"
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+class NDJSONResponse(StreamingResponse):
+    """
+    逐行输出的JSON（application/x-ndjson）：rows 是按需生成行的迭代器，
+    行累积到约 chunk_size 字节发送一次，内存占用与结果总行数无关，客户端收到第一块即可开始处理
+
+    普通迭代器在线程池中迭代（可以在其中查询数据库），每块只切换一次线程
+    """
+    media_type = "application/x-ndjson"
+
+    def __init__(self, rows: Iterable[Any], chunk_size: int = NDJSON_CHUNK_SIZE, **kwargs):
+        super().__init__(_ndjson_chunks(rows, chunk_size), **kwargs)
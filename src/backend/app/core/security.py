@@ -7,6 +7,7 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.logs import set_log_user
 from app.db.session import get_db
 from app.models.models import User
 
@@ -57,6 +58,7 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
+    set_log_user(user.id)
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)):
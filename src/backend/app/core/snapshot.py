@@ -0,0 +1,231 @@
+"""
+预热快照：定期把热点数据写入 DATA_DIR 下的一个二进制文件，进程启动时映射该文件恢复，避免重启后集中回源
+
+快照包含：
+- 最常请求股票的最新报价和基础周期K线（恢复到缓存，按剩余有效期过期）
+- 最近使用的选股K线矩阵（只读映射，数据版本与数据库一致时直接使用）
+
+文件格式: 8字节头部长度 + JSON头部 + 按64字节对齐的数组数据；写入临时文件后原子替换
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter as HitCounter
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.cache import get_cache, make_key
+from app.core.worker import file_lock
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+_ALIGN = 64
+
+class HotSet:
+    """
+    近似的访问频率统计，只保留访问次数最多的一部分键
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._hits: HitCounter = HitCounter()
+        self._lock = threading.Lock()
+
+    def touch(self, key: Hashable):
+        with self._lock:
+            self._hits[key] += 1
+            if len(self._hits) > self.capacity * 4:
+                self._hits = HitCounter(dict(self._hits.most_common(self.capacity)))
+
+    def top(self, n: int) -> List[Hashable]:
+        with self._lock:
+            return [key for key, _ in self._hits.most_common(n)]
+
+hot_quotes = HotSet(settings.SNAPSHOT_MAX_SYMBOLS)
+hot_bars = HotSet(settings.SNAPSHOT_MAX_SYMBOLS)
+
+def snapshot_path() -> str:
+    return settings.SNAPSHOT_PATH or os.path.join(settings.DATA_DIR, "warm_start.snapshot")
+
+def write_arrays(path: str, header: Dict[str, Any], arrays: Dict[str, Any]):
+    """
+    把头部和数组写入一个文件；对象数组（例如名称，可能为 None）直接保存在头部
+    """
+    import numpy as np
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        if array.dtype == object:
+            layout[name] = {"values": array.tolist()}
+            continue
+        layout[name] = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    encoded = json.dumps({**header, "arrays": layout}).encode()
+    data_start = -(-(8 + len(encoded)) // _ALIGN) * _ALIGN
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for name, array in arrays.items():
+            if "offset" in layout[name]:
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+def read_arrays(path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    读取头部并把数组区域映射为只读数组（按需从磁盘加载）
+    """
+    import numpy as np
+    with open(path, "rb") as f:
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length))
+    data_start = -(-(8 + length) // _ALIGN) * _ALIGN
+    mapped = np.memmap(path, mode="r")
+    arrays = {}
+    for name, spec in header.pop("arrays").items():
+        if "values" in spec:
+            arrays[name] = np.array(spec["values"], dtype=object)
+            continue
+        dtype = np.dtype(spec["dtype"])
+        start = data_start + spec["offset"]
+        size = int(np.prod(spec["shape"], dtype=np.int64)) * dtype.itemsize
+        arrays[name] = mapped[start:start + size].view(dtype).reshape(spec["shape"])
+    return header, arrays
+
+def _collect_bars(arrays: Dict[str, Any]) -> List[Dict[str, Any]]:
+    cache = get_cache()
+    entries = []
+    for args in hot_bars.top(settings.SNAPSHOT_MAX_SYMBOLS):
+        try:
+            bars = cache.get(make_key("bars", *args))
+        except Exception:
+            bars = None
+        if not bars:
+            continue
+        prefix = f"bars.{len(entries)}"
+        fields = [field for field in bars if field != "actions"]
+        for field in fields:
+            arrays[f"{prefix}.{field}"] = bars[field]
+        for key, column in bars["actions"].items():
+            arrays[f"{prefix}.actions.{key}"] = column
+        entries.append({"args": list(args), "fields": fields, "actions": list(bars["actions"])})
+    return entries
+
+def _collect_quotes() -> Dict[str, Any]:
+    symbols = hot_quotes.top(settings.SNAPSHOT_MAX_SYMBOLS)
+    if not symbols:
+        return {}
+    try:
+        cached = get_cache().get_many([f"quote:{symbol}" for symbol in symbols])
+    except Exception:
+        return {}
+    return {key.split(":", 1)[1]: quote for key, quote in cached.items()}
+
+def _collect_universes(arrays: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from app.services.market_data import cached_universes
+
+    entries = []
+    for key, universe in cached_universes():
+        prefix = f"universe.{len(entries)}"
+        arrays[f"{prefix}.dates"] = universe.dates
+        for name, matrix in universe.fields.items():
+            arrays[f"{prefix}.fields.{name}"] = matrix
+        for name, values in universe.meta.items():
+            arrays[f"{prefix}.meta.{name}"] = values
+        entries.append({
+            "key": [list(part) if isinstance(part, tuple) else part for part in key],
+            "symbols": universe.symbols,
+            "fields": list(universe.fields),
+            "meta": list(universe.meta)
+        })
+    return entries
+
+def save_snapshot(path: Optional[str] = None) -> Dict[str, int]:
+    """
+    写入快照，返回各部分的条目数
+    """
+    path = path or snapshot_path()
+    arrays: Dict[str, Any] = {}
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "quotes": _collect_quotes(),
+        "bars": _collect_bars(arrays),
+        "universes": _collect_universes(arrays)
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 多个worker共用同一个快照文件
+    with file_lock("snapshot"):
+        write_arrays(path, header, arrays)
+    summary = {part: len(header[part]) for part in ("quotes", "bars", "universes")}
+    logger.info(
+        f"预热快照已写入: 报价 {summary['quotes']}，K线 {summary['bars']}，选股矩阵 {summary['universes']}，"
+        f"{os.path.getsize(path) / 1024:.0f} KB"
+    )
+    return summary
+
+def restore_snapshot(path: Optional[str] = None) -> Dict[str, int]:
+    """
+    恢复快照：报价和K线按剩余有效期写入缓存（已存在的键不覆盖），选股矩阵放回进程内缓存
+    """
+    import numpy as np
+    from app.data_sources.stock_data import history_ttl
+    from app.services.bar_matrix import BarMatrix
+    from app.services.market_data import remember_universe
+
+    path = path or snapshot_path()
+    summary = {"quotes": 0, "bars": 0, "universes": 0}
+    if not os.path.exists(path):
+        return summary
+    try:
+        header, arrays = read_arrays(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取预热快照失败: {str(e)}")
+        return summary
+    age = time.time() - header.get("created_at", 0)
+    if header.get("version") != SNAPSHOT_VERSION or age > settings.SNAPSHOT_MAX_AGE:
+        logger.info("预热快照版本不符或已过期，跳过恢复")
+        return summary
+    cache = get_cache()
+
+    quote_ttl = int(settings.QUOTE_CACHE_TTL - age)
+    if quote_ttl > 0:
+        for symbol, quote in header["quotes"].items():
+            summary["quotes"] += bool(cache.add(f"quote:{symbol}", quote, ttl=quote_ttl))
+
+    for i, entry in enumerate(header["bars"]):
+        args = tuple(entry["args"])
+        ttl = int(history_ttl(*args) - age)
+        if ttl <= 0:
+            continue
+        prefix = f"bars.{i}"
+        # 复制为普通数组，缓存中的K线不引用映射的文件
+        bars = {field: np.array(arrays[f"{prefix}.{field}"]) for field in entry["fields"]}
+        bars["actions"] = {key: np.array(arrays[f"{prefix}.actions.{key}"]) for key in entry["actions"]}
+        summary["bars"] += bool(cache.add(make_key("bars", *args), bars, ttl=ttl))
+
+    for i, entry in enumerate(header["universes"]):
+        prefix = f"universe.{i}"
+        key = tuple(tuple(part) if isinstance(part, list) else part for part in entry["key"])
+        # 存储类型与 BAR_PRICE_DTYPE 一致时直接使用映射的数组，否则转换一次
+        universe = BarMatrix(
+            entry["symbols"],
+            arrays[f"{prefix}.dates"],
+            {name: arrays[f"{prefix}.fields.{name}"] for name in entry["fields"]},
+            {name: arrays[f"{prefix}.meta.{name}"] for name in entry["meta"]}
+        )
+        universe.freeze()
+        remember_universe(key, universe)
+        summary["universes"] += 1
+
+    logger.info(
+        f"已从预热快照恢复（{age:.0f} 秒前）: 报价 {summary['quotes']}，K线 {summary['bars']}，"
+        f"选股矩阵 {summary['universes']}"
+    )
+    return summary
@@ -0,0 +1,50 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# 进程启动基准时间（本模块应最先被 main.py 导入）
+_process_start = time.perf_counter()
+
+# 各启动阶段耗时记录
+_phases: List[Dict[str, Any]] = []
+_ready_at = None
+
+@contextmanager
+def timed_phase(name: str):
+    """
+    记录一个启动阶段的耗时
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _phases.append({
+            "phase": name,
+            "started_ms": round((start - _process_start) * 1000, 2),
+            "duration_ms": round(elapsed_ms, 2)
+        })
+
+def mark_ready():
+    """
+    标记应用已可以接收请求，并输出启动耗时明细
+    """
+    global _ready_at
+    _ready_at = time.perf_counter()
+    report = startup_report()
+    details = ", ".join(f"{p['phase']}={p['duration_ms']}ms" for p in report["phases"])
+    logger.info(f"启动完成，总耗时 {report['total_ms']}ms ({details})")
+
+def startup_report() -> Dict[str, Any]:
+    """
+    获取启动耗时明细
+    """
+    end = _ready_at if _ready_at is not None else time.perf_counter()
+    return {
+        "ready": _ready_at is not None,
+        "total_ms": round((end - _process_start) * 1000, 2),
+        "phases": list(_phases)
+    }
@@ -0,0 +1,50 @@
+import os
+import fcntl
+import logging
+from contextlib import contextmanager
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def default_worker_count() -> int:
+    """
+    计算worker进程数：优先使用配置，否则使用当前容器可用的CPU核数
+    """
+    if settings.WEB_CONCURRENCY > 0:
+        return settings.WEB_CONCURRENCY
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+@contextmanager
+def file_lock(name: str):
+    """
+    基于数据目录下锁文件的跨进程互斥锁，用于多个worker同时启动时串行化初始化步骤
+    """
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+    path = os.path.join(settings.DATA_DIR, f".{name}.lock")
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def warm_up_cache():
+    """
+    预热共享缓存：多个worker中只有抢到锁的一个执行
+    """
+    from app.core.cache import get_cache
+    from app.data_sources.stock_data import get_stock_info
+
+    cache = get_cache()
+    if not cache.add("warmup:lock", os.getpid(), ttl=settings.CACHE_DEFAULT_TTL):
+        logger.info("缓存预热已由其他worker执行，跳过")
+        return
+
+    symbols = [s.strip().upper() for s in settings.CACHE_WARMUP_SYMBOLS.split(",") if s.strip()]
+    for symbol in symbols:
+        get_stock_info(symbol)
+    logger.info(f"缓存预热完成，共 {len(symbols)} 只股票")
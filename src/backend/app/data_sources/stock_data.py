@@ -1,22 +1,82 @@
-import requests
-import yfinance as yf
-import pandas as pd
 from datetime import datetime, timedelta
 import os
+import math
 import logging
 from typing import List, Dict, Any, Optional
 
 from app.core.config import settings
+from app.core.cache import cached, get_cache
+from app.core.metrics import cache_requests_total
+from app.core.metrics import track_upstream
+from app.core.profiling import profiled
+from app.core.snapshot import hot_bars, hot_quotes
+from app.data_sources import yahoo_http
 
 logger = logging.getLogger(__name__)
 
+def _yf():
+    """
+    延迟导入yfinance（连带pandas/numpy/requests），避免拖慢进程启动
+    """
+    import yfinance
+    return yfinance
+
+def _use_http_provider() -> bool:
+    """
+    MARKET_DATA_PROVIDER=yahoo_http 时直接请求 MARKET_DATA_URL 上的 Yahoo 接口（例如本地模拟数据源），不经过yfinance
+    """
+    return settings.MARKET_DATA_PROVIDER == "yahoo_http"
+
+SEARCH_LIMIT = 20
+
+def _search_listed(query: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    在 stocks 表中按代码前缀或名称搜索在市股票，代码完全匹配的排在最前，其余按市值排序；
+    尚未同步证券列表或数据库不可用时返回 None
+    """
+    from app.db.session import SessionLocal
+    from app.models.models import Stock
+    from app.services.universe import universe_synced
+    query = query.strip()
+    pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    try:
+        with SessionLocal() as db:
+            if not universe_synced(db):
+                return None
+            rows = (
+                db.query(Stock.symbol, Stock.name, Stock.exchange)
+                .filter(
+                    Stock.is_delisted.isnot(True),
+                    Stock.symbol.like(f"{pattern.upper()}%", escape="\\") | Stock.name.ilike(f"%{pattern}%", escape="\\")
+                )
+                .order_by((Stock.symbol == query.upper()).desc(), Stock.market_cap.is_(None), Stock.market_cap.desc(), Stock.symbol)
+                .limit(SEARCH_LIMIT)
+                .all()
+            )
+    except Exception as e:
+        logger.warning(f"查询证券列表失败: {str(e)}")
+        return None
+    return [{"symbol": symbol, "name": name, "exchange": exchange} for symbol, name, exchange in rows]
+
+@cached("search", ttl=3600)
 def search_stocks(query: str) -> List[Dict[str, Any]]:
     """
-    搜索股票
+    搜索股票：优先使用同步到 stocks 表的证券列表
     """
+    listed = _search_listed(query)
+    if listed is not None:
+        return listed
+    if _use_http_provider():
+        try:
+            with track_upstream("yahoo_http", "search"):
+                return yahoo_http.search(query, SEARCH_LIMIT)
+        except Exception as e:
+            logger.error(f"搜索股票时出错: {str(e)}")
+            return []
     try:
         # 使用Yahoo Finance搜索
-        tickers = yf.Tickers(query)
+        with track_upstream("yfinance", "search"):
+            tickers = _yf().Tickers(query)
         results = []
         
         # 由于API限制，这里简化为返回一些示例数据
@@ -45,94 +105,331 @@ def search_stocks(query: str) -> List[Dict[str, Any]]:
         logger.error(f"搜索股票时出错: {str(e)}")
         return []
 
+def _listed_stock(symbol: str):
+    """
+    读取 stocks 表中的证券信息和最近一年的最高/最低价，不在表中或数据库不可用时返回 None
+    """
+    from sqlalchemy import func
+    from app.db.session import SessionLocal
+    from app.models.models import Stock, StockPrice
+    try:
+        with SessionLocal() as db:
+            stock = db.query(Stock).filter(Stock.symbol == symbol.upper()).first()
+            if stock is None:
+                return None
+            high, low = (
+                db.query(func.max(StockPrice.high), func.min(StockPrice.low))
+                .filter(StockPrice.stock_id == stock.id, StockPrice.date >= datetime.utcnow() - timedelta(days=365))
+                .one()
+            )
+            db.expunge(stock)
+            return stock, high, low
+    except Exception as e:
+        logger.warning(f"查询证券信息失败: {str(e)}")
+        return None
+
+@cached("info", ttl=60)
 def get_stock_info(symbol: str) -> Optional[Dict[str, Any]]:
     """
-    获取股票信息
+    获取股票信息：基本信息来自 stocks 表（由证券列表同步维护），价格来自批量报价；
+    不在表中的股票回退到上游查询
     """
+    listed = _listed_stock(symbol)
+    if listed is not None:
+        stock, high, low = listed
+        quote = get_stock_quotes([stock.symbol]).get(stock.symbol, {})
+        return {
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "exchange": stock.exchange,
+            "sector": stock.sector,
+            "industry": stock.industry,
+            "current_price": quote.get("current_price"),
+            "change_percent": quote.get("change_percent"),
+            "market_cap": stock.market_cap,
+            "pe_ratio": None,
+            "52_week_high": high,
+            "52_week_low": low,
+            "volume": quote.get("volume"),
+            "is_delisted": bool(stock.is_delisted)
+        }
+    if _use_http_provider():
+        try:
+            with track_upstream("yahoo_http", "info"):
+                return yahoo_http.fetch_info(symbol)
+        except Exception as e:
+            logger.error(f"获取股票信息时出错: {str(e)}")
+            return None
     try:
         # 使用Yahoo Finance获取股票信息
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        with track_upstream("yfinance", "info"):
+            ticker = _yf().Ticker(symbol)
+            info = ticker.info
         
-        # 由于API限制，这里简化为返回一些示例数据
-        if symbol == "AAPL":
-            return {
-                "symbol": "AAPL",
-                "name": "Apple Inc.",
-                "exchange": "NASDAQ",
-                "sector": "Technology",
-                "industry": "Consumer Electronics",
-                "current_price": 175.23,
-                "change_percent": 1.25,
-                "market_cap": 2850000000000,
-                "pe_ratio": 28.75,
-                "52_week_high": 182.94,
-                "52_week_low": 124.17,
-                "volume": 65432100
-            }
-        elif symbol == "MSFT":
-            return {
-                "symbol": "MSFT",
-                "name": "Microsoft Corporation",
-                "exchange": "NASDAQ",
-                "sector": "Technology",
-                "industry": "Software—Infrastructure",
-                "current_price": 325.45,
-                "change_percent": 0.75,
-                "market_cap": 2420000000000,
-                "pe_ratio": 35.20,
-                "52_week_high": 335.94,
-                "52_week_low": 213.43,
-                "volume": 23456700
-            }
-        else:
-            # 返回通用数据
-            return {
-                "symbol": symbol,
-                "name": f"{symbol} Corporation",
-                "exchange": "NASDAQ",
-                "sector": "Technology",
-                "industry": "Software",
-                "current_price": 150.00,
-                "change_percent": 0.50,
-                "market_cap": 1000000000000,
-                "pe_ratio": 25.00,
-                "52_week_high": 180.00,
-                "52_week_low": 120.00,
-                "volume": 10000000
-            }
+        # 不存在的代码返回的 info 没有证券类型和交易所，不能当作有效股票
+        if not info or not info.get("quoteType") or not info.get("exchange"):
+            return None
+        return {
+            "symbol": info.get("symbol") or symbol,
+            "name": info.get("longName") or info.get("shortName"),
+            "exchange": info.get("fullExchangeName") or info["exchange"],
+            "sector": info.get("sector"),
+            "industry": info.get("industry"),
+            "current_price": info.get("currentPrice") or info.get("regularMarketPrice"),
+            "change_percent": info.get("regularMarketChangePercent"),
+            "market_cap": info.get("marketCap"),
+            "pe_ratio": info.get("trailingPE"),
+            "52_week_high": info.get("fiftyTwoWeekHigh"),
+            "52_week_low": info.get("fiftyTwoWeekLow"),
+            "volume": info.get("volume") or info.get("regularMarketVolume")
+        }
     except Exception as e:
         logger.error(f"获取股票信息时出错: {str(e)}")
         return None
 
-def get_stock_historical_data(symbol: str, period: str = "1y", interval: str = "1d") -> List[Dict[str, Any]]:
+def fetch_quotes(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    一次批量请求获取多只股票的最新报价
+    """
+    quotes = {}
+    for i in range(0, len(symbols), settings.QUOTE_BATCH_SIZE):
+        batch = symbols[i:i + settings.QUOTE_BATCH_SIZE]
+        if _use_http_provider():
+            with track_upstream("yahoo_http", "quotes"):
+                quotes.update(yahoo_http.fetch_quotes(batch))
+            continue
+        with track_upstream("yfinance", "quotes"):
+            data = _yf().download(
+                tickers=batch, period="5d", interval="1d", group_by="ticker",
+                threads=True, progress=False, timeout=settings.UPSTREAM_TIMEOUT
+            )
+        if data.empty:
+            continue
+        if data.columns.nlevels == 1:
+            # 只有一只股票时yfinance返回单层列
+            data = data.set_axis(
+                data.columns.map(lambda field: (batch[0], field)), axis=1
+            )
+        closes = data.xs("Close", axis=1, level=1).ffill()
+        volumes = data.xs("Volume", axis=1, level=1)
+        if len(closes) == 0:
+            continue
+        last = closes.iloc[-1]
+        prev = closes.iloc[-2] if len(closes) > 1 else last
+        change_percent = (last / prev - 1) * 100
+        for symbol in last.index:
+            if math.isnan(last[symbol]):  # 该股票没有数据
+                continue
+            volume = float(volumes[symbol].iloc[-1])
+            quotes[symbol] = {
+                "symbol": symbol,
+                "current_price": float(last[symbol]),
+                "previous_close": float(prev[symbol]),
+                "change_percent": round(float(change_percent[symbol]), 4),
+                "volume": None if math.isnan(volume) else volume
+            }
+    return quotes
+
+def get_stock_quotes(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
     """
-    获取股票历史数据
+    批量获取报价：先批量读取缓存，未命中的股票合并为一次上游请求
     """
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    if not symbols:
+        return {}
+    for symbol in symbols:
+        hot_quotes.touch(symbol)
+    cache = get_cache()
+    keys = {symbol: f"quote:{symbol}" for symbol in symbols}
     try:
-        # 使用Yahoo Finance获取历史数据
-        ticker = yf.Ticker(symbol)
-        history = ticker.history(period=period, interval=interval)
-        
-        # 转换为列表格式
-        result = []
-        for date, row in history.iterrows():
-            result.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "open": float(row["Open"]),
-                "high": float(row["High"]),
-                "low": float(row["Low"]),
-                "close": float(row["Close"]),
-                "adjusted_close": float(row["Close"]),  # Yahoo Finance已经调整了价格
-                "volume": float(row["Volume"])
-            })
-        
-        return result
+        cached_quotes = cache.get_many(keys.values())
+    except Exception as e:
+        logger.warning(f"读取报价缓存失败: {str(e)}")
+        cached_quotes = {}
+
+    quotes = {}
+    misses = []
+    for symbol, key in keys.items():
+        if key in cached_quotes:
+            quotes[symbol] = cached_quotes[key]
+        else:
+            misses.append(symbol)
+    cache_requests_total.inc(len(quotes), cache="quote", result="hit")
+    cache_requests_total.inc(len(misses), cache="quote", result="miss")
+
+    if misses:
+        try:
+            fetched = fetch_quotes(misses)
+        except Exception as e:
+            logger.error(f"批量获取报价时出错: {str(e)}")
+            fetched = {}
+        if fetched:
+            try:
+                cache.set_many({keys[symbol]: quote for symbol, quote in fetched.items()}, ttl=settings.QUOTE_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"写入报价缓存失败: {str(e)}")
+        quotes.update(fetched)
+    return quotes
+
+def fetch_history(symbol: str, period: str = "1y", interval: str = "1d",
+                  start: Optional[str] = None, end: Optional[str] = None):
+    """
+    从Yahoo Finance获取原始历史K线（DataFrame）；指定 start 时按日期范围获取（end 不包含），忽略 period
+
+    价格只按拆股调整（不含分红），拆股和分红记录在 Stock Splits / Dividends 列中
+    """
+    if _use_http_provider():
+        with track_upstream("yahoo_http", "history"):
+            return yahoo_http.fetch_history(symbol, period, interval, start, end)
+    with track_upstream("yfinance", "history"):
+        ticker = _yf().Ticker(symbol)
+        if start:
+            return ticker.history(start=start, end=end, interval=interval, auto_adjust=False, actions=True)
+        return ticker.history(period=period, interval=interval, auto_adjust=False, actions=True)
+
+def history_ttl(symbol: str, period: str = "1y", interval: str = "1d", *args, **kwargs) -> int:
+    """
+    日内K线在交易时段内不断更新，缓存时间较短
+    """
+    from app.services.resample import is_intraday
+    return settings.INTRADAY_CACHE_TTL if is_intraday(interval) else settings.HISTORY_CACHE_TTL
+
+def base_interval(interval: str) -> str:
+    """
+    实际从上游获取的周期：日内周期取 INTRADAY_BASE_INTERVAL，周线/月线取日线；无法聚合的周期直接获取
+    """
+    from app.services.resample import can_resample, is_intraday
+    base = settings.INTRADAY_BASE_INTERVAL if is_intraday(interval) else "1d"
+    return base if can_resample(base, interval) else interval
+
+def _stored_actions(symbol: str):
+    """
+    读取数据库中记录的公司行为，数据库不可用时返回空记录
+    """
+    from app.db.session import SessionLocal
+    from app.services.adjustments import load_symbol_actions, make_actions
+    try:
+        with SessionLocal() as db:
+            return load_symbol_actions(db, symbol)
+    except Exception as e:
+        logger.warning(f"读取公司行为记录失败: {str(e)}")
+        return make_actions()
+
+def _record_actions(symbol: str, actions):
+    from app.db.session import SessionLocal
+    from app.services.adjustments import save_actions
+    try:
+        with SessionLocal() as db:
+            save_actions(db, symbol, actions)
+    except Exception as e:
+        logger.warning(f"保存公司行为记录失败: {str(e)}")
+
+@cached("bars", ttl=history_ttl)
+def get_base_bars(symbol: str, period: str, interval: str,
+                  start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """
+    获取并缓存最细粒度的未复权K线（数组字典），出错或无数据时返回空字典
+
+    上游返回的拆股和分红写入 corporate_actions 表，复权在读取时计算
+    """
+    from app.services.adjustments import actions_from_frame, merge_actions, unadjust_splits
+    from app.services.resample import frame_to_bars
+    try:
+        history = fetch_history(symbol, period, interval, start, end)
+        bars = frame_to_bars(history)
+        if not bars:
+            return {}
+        upstream_actions = actions_from_frame(history)
+        if len(upstream_actions["ts"]):
+            _record_actions(symbol, upstream_actions)
+        actions = merge_actions(upstream_actions, _stored_actions(symbol))
+        bars = unadjust_splits(bars, actions)
+        bars["actions"] = actions
+        return bars
     except Exception as e:
         logger.error(f"获取股票历史数据时出错: {str(e)}")
+        return {}
+
+# K线数组字典中逐根K线的字段（另有 actions 等附加字段）
+BAR_COLUMNS = ("ts", "open", "high", "low", "close", "adjusted_close", "volume")
+
+def bar_dates(bars: Dict[str, Any], intraday: bool = False):
+    """
+    K线日期的字符串数组：日线为 YYYY-MM-DD，日内为 YYYY-MM-DD HH:MM（按字符串排序即按时间排序）
+    """
+    import numpy as np
+    if intraday:
+        return np.char.replace(np.datetime_as_string(bars["ts"], unit="m"), "T", " ")
+    return np.datetime_as_string(bars["ts"], unit="D")
+
+def bars_to_records(bars: Dict[str, Any], intraday: bool = False) -> List[Dict[str, Any]]:
+    """
+    把K线数组字典转换为列表格式；日线日期为 YYYY-MM-DD，日内为 YYYY-MM-DD HH:MM
+    """
+    if not bars or not len(bars["ts"]):
         return []
+    dates = bar_dates(bars, intraday).tolist()
+    close = bars["close"].tolist()
+    return [
+        {
+            "date": date,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close_,
+            "adjusted_close": adjusted_close,
+            "volume": volume
+        }
+        for date, open_, high, low, close_, adjusted_close, volume in zip(
+            dates, bars["open"].tolist(), bars["high"].tolist(), bars["low"].tolist(),
+            close, bars["adjusted_close"].tolist() if "adjusted_close" in bars else close,
+            bars["volume"].tolist()
+        )
+    ]
+
+def history_to_records(history) -> List[Dict[str, Any]]:
+    """
+    把历史K线DataFrame转换为列表格式
+    """
+    from app.services.resample import frame_to_bars
+    return bars_to_records(frame_to_bars(history))
+
+@profiled
+def get_stock_bars(symbol: str, period: str = "1y", interval: str = "1d",
+                   start: Optional[str] = None, end: Optional[str] = None,
+                   adjusted: bool = True, max_points: Optional[int] = None,
+                   downsample: str = "ohlc") -> Dict[str, Any]:
+    """
+    获取股票历史K线（数组字典），start/end 为 YYYY-MM-DD 格式的日期范围（end 不包含）
+
+    只从上游获取基础周期的K线，其它周期由基础K线聚合得到，聚合结果同样以数组缓存。
+    adjusted 为 True 时开高低收和成交量均为前复权值，否则为原始值；adjusted_close 始终为复权收盘价。
+    指定 max_points 时降采样为不超过该数量的点（downsample 为 ohlc 或 lttb），按分辨率分别缓存
+    """
+    # 在缓存之外计数，预热快照中的热点K线按请求次数而不是缓存未命中次数选择
+    hot_bars.touch((symbol, period, base_interval(interval), start, end))
+    return _stock_bars(symbol, period, interval, start, end, adjusted, max_points, downsample)
+
+@cached("history_bars", ttl=history_ttl)
+def _stock_bars(symbol: str, period: str, interval: str, start: Optional[str], end: Optional[str],
+                adjusted: bool, max_points: Optional[int], downsample: str) -> Dict[str, Any]:
+    from app.services.adjustments import adjust_bars, merge_actions
+    from app.services.downsample import downsample_bars
+    from app.services.resample import resample_bars
+    base = base_interval(interval)
+    bars = get_base_bars(symbol, period, base, start, end)
+    if bars:
+        # 读取时合并数据库中的新记录：新增的公司行为只改变复权因子，不需要重新获取K线
+        bars = adjust_bars(bars, merge_actions(bars["actions"], _stored_actions(symbol)), adjusted)
+    if bars and base != interval:
+        bars = resample_bars(bars, interval)
+    if bars and max_points:
+        bars = downsample_bars(bars, max_points, downsample)
+    # 只缓存逐根K线的数组（每根K线几十字节），公司行为记录不随K线缓存
+    return {field: bars[field] for field in BAR_COLUMNS} if bars else {}
 
-def get_market_movers() -> Dict[str, List[Dict[str, Any]]]:
+@cached("movers", ttl=60)
+def get_market_movers(market: str = "US") -> Dict[str, List[Dict[str, Any]]]:
     """
     获取市场涨跌幅排行
     """
@@ -188,7 +485,8 @@ def get_market_movers() -> Dict[str, List[Dict[str, Any]]]:
         logger.error(f"获取市场涨跌幅排行时出错: {str(e)}")
         return {"gainers": [], "losers": []}
 
-def get_sector_performance() -> List[Dict[str, Any]]:
+@cached("sectors", ttl=60)
+def get_sector_performance(period: str = "1d") -> List[Dict[str, Any]]:
     """
     获取板块表现
     """
@@ -0,0 +1,146 @@
+"""
+直接调用 Yahoo Finance 图表/报价/搜索接口的数据源（MARKET_DATA_PROVIDER=yahoo_http）
+
+与 yfinance 返回相同格式的数据，但接口地址可配置（MARKET_DATA_URL），
+可以指向本地的模拟数据源（loadtest/fake_provider.py）进行离线压测
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+_local = threading.local()
+
+class UpstreamError(Exception):
+    """
+    上游返回错误（包括限流），status_code 为HTTP状态码
+    """
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+
+def _session():
+    # requests.Session 不保证线程安全，每个线程一个会话（各自复用连接）
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests
+        session = _local.session = requests.Session()
+        session.headers["User-Agent"] = "Mozilla/5.0 (us-stock-scanner)"
+    return session
+
+def _get(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    response = _session().get(
+        settings.MARKET_DATA_URL.rstrip("/") + path, params=params, timeout=settings.UPSTREAM_TIMEOUT
+    )
+    if response.status_code == 404:
+        return response.json()
+    if response.status_code != 200:
+        raise UpstreamError(response.status_code, response.text[:200])
+    return response.json()
+
+def _period_seconds(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    from datetime import datetime, timezone
+    return int(datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+def fetch_history(symbol: str, period: str = "1y", interval: str = "1d",
+                  start: Optional[str] = None, end: Optional[str] = None):
+    """
+    获取历史K线，返回与 yfinance Ticker.history(auto_adjust=False, actions=True) 相同格式的DataFrame
+    """
+    import numpy as np
+    import pandas as pd
+
+    params = {"interval": interval, "events": "div,splits", "includePrePost": "false"}
+    if start:
+        params["period1"] = _period_seconds(start)
+        params["period2"] = _period_seconds(end) or int(pd.Timestamp.utcnow().timestamp())
+    else:
+        params["range"] = period
+    chart = _get(f"/v8/finance/chart/{symbol}", params).get("chart", {})
+    results = chart.get("result") or []
+    if not results or not results[0].get("timestamp"):
+        return pd.DataFrame()
+    result = results[0]
+
+    timezone = result.get("meta", {}).get("exchangeTimezoneName", "America/New_York")
+    index = pd.to_datetime(np.asarray(result["timestamp"], dtype=np.int64), unit="s", utc=True).tz_convert(timezone)
+    if interval in ("1d", "5d", "1wk", "1mo", "3mo"):
+        index = index.normalize()
+    quote = result["indicators"]["quote"][0]
+    columns = {
+        name.capitalize(): np.asarray(quote.get(name, []), dtype=np.float64)
+        for name in ("open", "high", "low", "close", "volume")
+    }
+    adjclose = result["indicators"].get("adjclose")
+    columns["Adj Close"] = np.asarray(adjclose[0]["adjclose"], dtype=np.float64) if adjclose else columns["Close"]
+    frame = pd.DataFrame(columns, index=index)
+
+    # 分红和拆股事件按日期对齐到K线
+    events = result.get("events", {})
+    frame["Dividends"] = 0.0
+    frame["Stock Splits"] = 0.0
+    day_index = index.normalize()
+    for column, items, value in (
+        ("Dividends", events.get("dividends", {}), lambda e: e["amount"]),
+        ("Stock Splits", events.get("splits", {}), lambda e: e["numerator"] / e["denominator"]),
+    ):
+        for event in items.values():
+            day = pd.Timestamp(event["date"], unit="s", tz="UTC").tz_convert(timezone).normalize()
+            frame.loc[day_index == day, column] = value(event)
+    return frame[["Open", "High", "Low", "Close", "Adj Close", "Volume", "Dividends", "Stock Splits"]]
+
+def _quote_results(symbols: List[str]) -> List[Dict[str, Any]]:
+    data = _get("/v7/finance/quote", {"symbols": ",".join(symbols)})
+    return (data.get("quoteResponse") or {}).get("result") or []
+
+def fetch_quotes(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    一次请求获取一批股票的最新报价，格式与 stock_data.fetch_quotes 相同
+    """
+    quotes = {}
+    for item in _quote_results(symbols):
+        price = item.get("regularMarketPrice")
+        if price is None:
+            continue
+        previous = item.get("regularMarketPreviousClose", price)
+        quotes[item["symbol"]] = {
+            "symbol": item["symbol"],
+            "current_price": float(price),
+            "previous_close": float(previous),
+            "change_percent": round(float(item.get("regularMarketChangePercent", 0.0)), 4),
+            "volume": item.get("regularMarketVolume")
+        }
+    return quotes
+
+def fetch_info(symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    股票基本信息和价格，格式与 stock_data.get_stock_info 相同；股票不存在时返回 None
+    """
+    results = _quote_results([symbol])
+    if not results:
+        return None
+    item = results[0]
+    return {
+        "symbol": item["symbol"],
+        "name": item.get("longName") or item.get("shortName"),
+        "exchange": item.get("fullExchangeName") or item.get("exchange"),
+        "sector": item.get("sector"),
+        "industry": item.get("industry"),
+        "current_price": item.get("regularMarketPrice"),
+        "change_percent": item.get("regularMarketChangePercent"),
+        "market_cap": item.get("marketCap"),
+        "pe_ratio": item.get("trailingPE"),
+        "52_week_high": item.get("fiftyTwoWeekHigh"),
+        "52_week_low": item.get("fiftyTwoWeekLow"),
+        "volume": item.get("regularMarketVolume")
+    }
+
+def search(query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    data = _get("/v1/finance/search", {"q": query, "quotesCount": limit, "newsCount": 0})
+    return [
+        {"symbol": item["symbol"], "name": item.get("longname") or item.get("shortname"), "exchange": item.get("exchDisp")}
+        for item in data.get("quotes", [])
+        if item.get("quoteType") in (None, "EQUITY", "ETF")
+    ]
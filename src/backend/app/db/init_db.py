@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 from app.db.session import Base, engine
@@ -6,8 +6,29 @@ from app.models.models import User
 from app.core.security import get_password_hash
 from app.core.config import settings
 
+def _ensure_columns(engine):
+    """
+    create_all 不会修改已存在的表：为旧数据库补上模型中新增的列（只支持可为空或有服务端默认值的列）
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT {default.compile(dialect=engine.dialect) if hasattr(default, 'compile') else default}"
+                conn.execute(text(ddl))
+
 def init_db(engine):
     Base.metadata.create_all(bind=engine)
+    _ensure_columns(engine)
     
     # 创建会话
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
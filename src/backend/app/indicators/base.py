@@ -0,0 +1,73 @@
+"""
+指标计算后端接口
+
+后端只需实现几个基础算子（滚动均值/标准差/最大/最小值、EMA），各指标由基础算子组合得到，
+因此不同后端的结果在数值上保持一致。所有算子沿最后一个维度（时间）计算，支持一维和二维数组
+"""
+from typing import Dict, Iterable
+
+import numpy as np
+
+from app.services import kernels
+
+class IndicatorBackend:
+    name = "base"
+
+    # 基础算子：窗口内存在缺失值时结果为NaN，与 pandas rolling 的默认行为一致
+    def sma(self, x: np.ndarray, period: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def std(self, x: np.ndarray, period: int) -> np.ndarray:
+        """样本标准差（ddof=1）"""
+        raise NotImplementedError
+
+    def rolling_max(self, x: np.ndarray, period: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def rolling_min(self, x: np.ndarray, period: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def ema(self, x: np.ndarray, span: int) -> np.ndarray:
+        """等价于 pandas ewm(span=span, adjust=False).mean()"""
+        raise NotImplementedError
+
+    # 组合指标，输出键与 app/api/analysis.py 的返回格式一致
+    def ma(self, close: np.ndarray, periods: Iterable[int] = (5, 10, 20, 60)) -> Dict[str, np.ndarray]:
+        return {f"MA{period}": self.sma(close, period) for period in periods}
+
+    def rsi(self, close: np.ndarray, period: int = 14) -> Dict[str, np.ndarray]:
+        """RSI（简单移动平均版本）"""
+        delta = kernels.diff(close)
+        with np.errstate(invalid="ignore"):
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+        avg_gain = self.sma(gain, period)
+        avg_loss = self.sma(loss, period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {"RSI": 100 - (100 / (1 + avg_gain / avg_loss))}
+
+    def macd(self, close: np.ndarray, fast_period: int = 12, slow_period: int = 26,
+             signal_period: int = 9) -> Dict[str, np.ndarray]:
+        line = self.ema(close, fast_period) - self.ema(close, slow_period)
+        signal = self.ema(line, signal_period)
+        return {"MACD": line, "MACD_signal": signal, "MACD_hist": line - signal}
+
+    def bbands(self, close: np.ndarray, period: int = 20, nbdevup: float = 2,
+               nbdevdn: float = 2) -> Dict[str, np.ndarray]:
+        middle = self.sma(close, period)
+        std = self.std(close, period)
+        return {
+            "BBANDS_upper": middle + nbdevup * std,
+            "BBANDS_middle": middle,
+            "BBANDS_lower": middle - nbdevdn * std
+        }
+
+    def stoch(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, fastk_period: int = 14,
+              slowk_period: int = 3, slowd_period: int = 3) -> Dict[str, np.ndarray]:
+        highest_high = self.rolling_max(high, fastk_period)
+        lowest_low = self.rolling_min(low, fastk_period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fastk = 100 * ((np.asarray(close, dtype=np.float64) - lowest_low) / (highest_high - lowest_low))
+        slowk = self.sma(fastk, slowk_period)
+        slowd = self.sma(slowk, slowd_period)
+        return {"STOCH_K": slowk, "STOCH_D": slowd}
@@ -0,0 +1,73 @@
+"""
+NumPy 后端：基于 app/services/kernels.py 的向量化实现，全市场二维数组一次计算
+
+安装了 numba 时可使用 numba 后端：EMA 的时间递推编译为机器码，其余算子与 NumPy 后端相同
+"""
+import numpy as np
+
+from app.indicators.base import IndicatorBackend
+from app.services import kernels
+
+class NumpyBackend(IndicatorBackend):
+    name = "numpy"
+
+    def sma(self, x, period):
+        return kernels.rolling_mean(x, period)
+
+    def std(self, x, period):
+        return kernels.rolling_std(x, period)
+
+    def rolling_max(self, x, period):
+        return kernels.rolling_max(x, period)
+
+    def rolling_min(self, x, period):
+        return kernels.rolling_min(x, period)
+
+    def ema(self, x, span):
+        return kernels.ema(x, span)
+
+_numba_ema = None
+
+def _compile_ema():
+    """
+    首次使用时编译，避免导入模块时就加载 numba
+    """
+    global _numba_ema
+    if _numba_ema is None:
+        import numba
+
+        @numba.njit(cache=True)
+        def ema_rows(x, alpha):
+            out = np.empty_like(x)
+            for row in range(x.shape[0]):
+                prev = x[row, 0]
+                weight = 1.0
+                out[row, 0] = prev
+                for t in range(1, x.shape[1]):
+                    current = x[row, t]
+                    weight *= 1 - alpha
+                    if np.isnan(prev):
+                        prev = current
+                        weight = 1.0
+                    elif not np.isnan(current):
+                        # 缺失期间的衰减计入旧值权重，与 pandas ewm(adjust=False) 一致
+                        prev = (weight * prev + alpha * current) / (weight + alpha)
+                        weight = 1.0
+                    out[row, t] = prev
+            return out
+
+        _numba_ema = ema_rows
+    return _numba_ema
+
+class NumbaBackend(NumpyBackend):
+    name = "numba"
+
+    def __init__(self):
+        import numba  # 未安装时抛出 ImportError，由 get_backend 回退到 NumPy 后端
+
+    def ema(self, x, span):
+        x = np.asarray(x, dtype=np.float64)
+        if x.shape[-1] == 0:
+            return x.copy()
+        rows = np.ascontiguousarray(x.reshape(-1, x.shape[-1]))
+        return _compile_ema()(rows, 2.0 / (int(span) + 1.0)).reshape(x.shape)
@@ -0,0 +1,38 @@
+"""
+pandas 后端：rolling/ewm 实现，作为其它后端数值一致性的参照
+"""
+import numpy as np
+
+from app.indicators.base import IndicatorBackend
+
+def _frame(x):
+    import pandas as pd
+    x = np.asarray(x, dtype=np.float64)
+    # pandas 沿行（索引）方向计算，二维数组转置为每列一只股票
+    return pd.DataFrame(np.atleast_2d(x).T), x.shape
+
+def _result(frame, shape) -> np.ndarray:
+    return frame.to_numpy().T.reshape(shape)
+
+class PandasBackend(IndicatorBackend):
+    name = "pandas"
+
+    def sma(self, x, period):
+        frame, shape = _frame(x)
+        return _result(frame.rolling(window=int(period)).mean(), shape)
+
+    def std(self, x, period):
+        frame, shape = _frame(x)
+        return _result(frame.rolling(window=int(period)).std(), shape)
+
+    def rolling_max(self, x, period):
+        frame, shape = _frame(x)
+        return _result(frame.rolling(window=int(period)).max(), shape)
+
+    def rolling_min(self, x, period):
+        frame, shape = _frame(x)
+        return _result(frame.rolling(window=int(period)).min(), shape)
+
+    def ema(self, x, span):
+        frame, shape = _frame(x)
+        return _result(frame.ewm(span=int(span), adjust=False).mean(), shape)
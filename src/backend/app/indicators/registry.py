@@ -0,0 +1,58 @@
+"""
+指标计算后端的选择：由 INDICATOR_BACKEND 配置，依赖未安装时回退到 NumPy 后端
+"""
+import logging
+import importlib
+import threading
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.indicators.base import IndicatorBackend
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = {
+    "pandas": ("app.indicators.pandas_backend", "PandasBackend"),
+    "numpy": ("app.indicators.numpy_backend", "NumpyBackend"),
+    "numba": ("app.indicators.numpy_backend", "NumbaBackend"),
+    "talib": ("app.indicators.talib_backend", "TalibBackend"),
+}
+
+_instances: Dict[str, IndicatorBackend] = {}
+_lock = threading.Lock()
+
+def _create(name: str) -> IndicatorBackend:
+    module_name, class_name = BACKENDS[name]
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def get_backend(name: Optional[str] = None) -> IndicatorBackend:
+    """
+    获取指标计算后端（每个进程每种后端一个实例）
+    """
+    name = (name or settings.INDICATOR_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"未知的指标计算后端: {name}")
+    backend = _instances.get(name)
+    if backend is not None:
+        return backend
+    with _lock:
+        if name not in _instances:
+            try:
+                _instances[name] = _create(name)
+            except ImportError as e:
+                logger.warning(f"指标计算后端 {name} 不可用（{str(e)}），改用 numpy 后端")
+                _instances[name] = _create("numpy")
+        return _instances[name]
+
+def available_backends() -> List[str]:
+    """
+    当前环境中依赖已安装的后端
+    """
+    names = []
+    for name in BACKENDS:
+        try:
+            _create(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
@@ -0,0 +1,59 @@
+"""
+TA-Lib 后端：滚动窗口算子使用 TA-Lib 的C实现
+
+为与 pandas 结果保持一致：
+- TA-Lib 的 STDDEV 为总体标准差，乘以 sqrt(n/(n-1)) 换算为样本标准差
+- TA-Lib 的 EMA 以前 n 个值的均值作为初值，与 ewm(adjust=False) 不同，因此 EMA 仍使用 NumPy 实现
+- TA-Lib 的滑动求和遇到中间的缺失值后会污染后续所有结果，含中间缺失值的序列改用 NumPy 实现
+"""
+import numpy as np
+
+from app.indicators.base import IndicatorBackend
+from app.services import kernels
+
+class TalibBackend(IndicatorBackend):
+    name = "talib"
+
+    def __init__(self):
+        import talib
+        self._talib = talib
+
+    def _apply(self, func, fallback, x, period):
+        x = np.asarray(x, dtype=np.float64)
+        period = int(period)
+        rows = x.reshape(-1, x.shape[-1]) if x.ndim else x.reshape(1, 1)
+        out = np.full(rows.shape, np.nan)
+        for i, row in enumerate(rows):
+            valid = ~np.isnan(row)
+            if not valid.any():
+                continue
+            first = int(np.argmax(valid))
+            if not valid[first:].all():
+                out[i] = fallback(row, period)
+            elif len(row) - first >= period:
+                # 开头的缺失值（例如上市前）直接跳过，只在有效部分上计算
+                out[i, first:] = func(np.ascontiguousarray(row[first:]), timeperiod=period)
+        return out.reshape(x.shape)
+
+    def sma(self, x, period):
+        return self._apply(self._talib.SMA, kernels.rolling_mean, x, period)
+
+    def std(self, x, period):
+        period = int(period)
+        if period <= 1:
+            return np.full(np.shape(x), np.nan)
+        population = self._apply(
+            lambda row, timeperiod: self._talib.STDDEV(row, timeperiod=timeperiod, nbdev=1),
+            lambda row, n: kernels.rolling_std(row, n, ddof=0),
+            x, period
+        )
+        return population * np.sqrt(period / (period - 1))
+
+    def rolling_max(self, x, period):
+        return self._apply(self._talib.MAX, kernels.rolling_max, x, period)
+
+    def rolling_min(self, x, period):
+        return self._apply(self._talib.MIN, kernels.rolling_min, x, period)
+
+    def ema(self, x, span):
+        return kernels.ema(x, span)
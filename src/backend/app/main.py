@@ -1,34 +1,44 @@
+from app.core.startup import timed_phase, mark_ready, startup_report
+
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 import os
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 
-from app.api import stocks, users, auth, analysis
-from app.core.config import settings
-from app.db.session import engine, SessionLocal
-from app.db import base_class, init_db
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(os.path.join(settings.LOGS_DIR, "app.log")),
-        logging.StreamHandler()
-    ]
-)
+from starlette.concurrency import run_in_threadpool
+
+# 路由模块只依赖轻量级库，pandas/yfinance等重型库在首次使用时才导入
+with timed_phase("import_routers"):
+    from app.api import stocks, users, auth, analysis, profiles, watchlists, alerts, logs
+    from app.core.config import settings
+    from app.db.session import engine, SessionLocal
+    from app.db import base_class, init_db
+    from app.core.worker import file_lock, warm_up_cache, default_worker_count
+    from app.core.cache import cache_backend
+    from app.core.metrics import MetricsMiddleware, monitor_event_loop, render_metrics
+    from app.core.profiling import ProfilingMiddleware
+    from app.core.compression import CompressionMiddleware
+    from app.core.responses import FastJSONResponse
+    from app.core.compute import compute_pool
+    from app.core.logs import RequestLogMiddleware, setup_logging
+    from app.core.snapshot import restore_snapshot, save_snapshot
+
+# 配置日志：写文件、控制台和数据库都在后台线程中完成
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="US Stock Scanner API",
     description="美股分析系统API",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # 配置CORS
@@ -38,28 +48,119 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],  # 游标分页的下一页游标
 )
 
+# 压缩较大的响应（brotli / gzip）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
+# 按需对单个请求进行采样剖析
+app.add_middleware(ProfilingMiddleware)
+
+# 请求耗时、状态码和数据库查询统计
+app.add_middleware(MetricsMiddleware)
+
+# 请求的日志上下文（路由、用户、耗时），慢请求和5xx写入日志
+app.add_middleware(RequestLogMiddleware)
+
 # 创建数据库表
 @app.on_event("startup")
 async def startup_event():
     logger.info("应用启动，初始化数据库...")
-    init_db.init_db(engine)
+    # 在线程池中执行，避免阻塞事件循环；多个worker同时启动时通过文件锁串行执行
+    with timed_phase("init_db"):
+        await run_in_threadpool(_init_db_locked)
     logger.info("数据库初始化完成")
+    # 从预热快照恢复热点报价、K线和选股矩阵，避免重启后集中回源
+    with timed_phase("restore_snapshot"):
+        await run_in_threadpool(_restore_snapshot)
+    mark_ready()
+    # 缓存预热不影响就绪，放到后台执行
+    asyncio.get_running_loop().run_in_executor(None, warm_up_cache)
+    # 事件循环延迟监控
+    app.state.loop_monitor = asyncio.create_task(monitor_event_loop())
+    # 定时检查价格提醒
+    if settings.ALERT_CHECK_INTERVAL > 0:
+        app.state.alert_scheduler = asyncio.create_task(_schedule_alert_checks())
+    # 定时同步证券列表
+    if settings.UNIVERSE_SYNC_INTERVAL > 0:
+        app.state.universe_scheduler = asyncio.create_task(_schedule_universe_sync())
+    # 定时写入预热快照
+    if settings.SNAPSHOT_INTERVAL > 0:
+        app.state.snapshot_scheduler = asyncio.create_task(_schedule_snapshots())
+    # 提前启动计算进程池
+    compute_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    compute_pool.shutdown()
+    if settings.SNAPSHOT_INTERVAL > 0:
+        await run_in_threadpool(_save_snapshot)
+
+async def _schedule_alert_checks():
+    from app.services.alerts import run_scheduled_alert_cycle
+    while True:
+        await asyncio.sleep(settings.ALERT_CHECK_INTERVAL)
+        await run_in_threadpool(run_scheduled_alert_cycle)
+
+async def _schedule_universe_sync():
+    from app.services.universe import run_scheduled_universe_sync
+    # 启动时只在 stocks 表为空时立即同步，之后按间隔定时同步
+    await run_in_threadpool(run_scheduled_universe_sync, True)
+    while True:
+        await asyncio.sleep(settings.UNIVERSE_SYNC_INTERVAL)
+        await run_in_threadpool(run_scheduled_universe_sync)
+
+async def _schedule_snapshots():
+    while True:
+        await asyncio.sleep(settings.SNAPSHOT_INTERVAL)
+        await run_in_threadpool(_save_snapshot)
+
+def _restore_snapshot():
+    try:
+        restore_snapshot()
+    except Exception as e:
+        logger.error(f"恢复预热快照失败: {str(e)}")
+
+def _save_snapshot():
+    try:
+        save_snapshot()
+    except Exception as e:
+        logger.error(f"写入预热快照失败: {str(e)}")
+
+def _init_db_locked():
+    with file_lock("init_db"):
+        init_db.init_db(engine)
 
 # 包含API路由
-app.include_router(auth.router, prefix="/api", tags=["认证"])
-app.include_router(users.router, prefix="/api/users", tags=["用户"])
-app.include_router(stocks.router, prefix="/api/stocks", tags=["股票"])
-app.include_router(analysis.router, prefix="/api/analysis", tags=["分析"])
+with timed_phase("include_routers"):
+    app.include_router(auth.router, prefix="/api", tags=["认证"])
+    app.include_router(users.router, prefix="/api/users", tags=["用户"])
+    app.include_router(stocks.router, prefix="/api/stocks", tags=["股票"])
+    app.include_router(analysis.router, prefix="/api/analysis", tags=["分析"])
+    app.include_router(watchlists.router, prefix="/api/watchlists", tags=["自选股"])
+    app.include_router(alerts.router, prefix="/api/alerts", tags=["提醒"])
+    app.include_router(profiles.router, prefix="/api/profiles", tags=["剖析"])
+    app.include_router(logs.router, prefix="/api/logs", tags=["日志"])
 
 # 健康检查端点
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
-# 挂载静态文件（前端构建后的文件）
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+# 启动耗时明细
+@app.get("/health/startup")
+async def startup_timing():
+    return startup_report()
+
+# Prometheus指标
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# 挂载静态文件（前端构建后的文件）；本地开发、基准测试等没有构建产物时跳过
+if os.path.isdir("static"):
+    app.mount("/", StaticFiles(directory="static", html=True), name="static")
 
 # 处理404错误，返回前端应用
 @app.exception_handler(404)
@@ -71,4 +172,12 @@ async def not_found_exception_handler(request, exc):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8888, reload=True)
+    if settings.DEBUG:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8888, reload=True)
+    else:
+        workers = default_worker_count()
+        if workers > 1 and cache_backend() == "memory":
+            # 进程内缓存中的锁只在单个worker内有效，多worker时预热和定时任务会在每个worker重复执行
+            logging.getLogger(__name__).warning("CACHE_BACKEND=memory 不能在多个worker间共享，只启动1个worker")
+            workers = 1
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8888, workers=workers)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, UniqueConstraint, false
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -27,10 +27,12 @@ class Stock(Base):
     industry = Column(String(100), nullable=True)
     country = Column(String(50), default="US")
     market_cap = Column(Float, nullable=True)
+    is_delisted = Column(Boolean, default=False, server_default=false())  # 证券列表同步时不再出现的股票
     last_updated = Column(DateTime, default=datetime.utcnow)
     
     # 关联关系
     prices = relationship("StockPrice", back_populates="stock", cascade="all, delete-orphan")
+    actions = relationship("CorporateAction", back_populates="stock", cascade="all, delete-orphan")
 
 class StockPrice(Base):
     __tablename__ = "stock_prices"
@@ -48,6 +50,23 @@ class StockPrice(Base):
     # 关联关系
     stock = relationship("Stock", back_populates="prices")
 
+class CorporateAction(Base):
+    """
+    拆股和分红记录；stock_prices 保存未复权价格，复权价格在读取时按这里的记录计算
+    """
+    __tablename__ = "corporate_actions"
+    __table_args__ = (UniqueConstraint("stock_id", "date", "action_type"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), index=True)
+    date = Column(DateTime)  # 除权除息日
+    action_type = Column(String(20))  # "split" 或 "dividend"
+    value = Column(Float)  # 拆股比例（例如4拆1为4.0）或每股分红金额
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 关联关系
+    stock = relationship("Stock", back_populates="actions")
+
 class TechnicalIndicator(Base):
     __tablename__ = "technical_indicators"
 
@@ -97,6 +116,37 @@ class SystemLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     level = Column(String(20))
     message = Column(Text)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     source = Column(String(100), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    route = Column(String(200), nullable=True)  # 路由模板，例如 /api/stocks/{symbol}
+    status_code = Column(Integer, nullable=True)
+    latency_ms = Column(Float, nullable=True)  # 记录日志时请求已耗时
+
+class Alert(Base):
+    __tablename__ = "alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    symbol = Column(String(20), index=True)
+    condition = Column(String(200))  # 例如: "RSI(14) crosses below 30"
+    is_active = Column(Boolean, default=True)
+    last_triggered_at = Column(DateTime, nullable=True)
+    last_bar_date = Column(DateTime, nullable=True)  # 最近一次触发对应的K线日期，避免同一根K线重复触发
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 关联关系
+    events = relationship("AlertEvent", back_populates="alert", cascade="all, delete-orphan")
+
+class AlertEvent(Base):
+    __tablename__ = "alert_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alert_id = Column(Integer, ForeignKey("alerts.id"), index=True)
+    bar_date = Column(DateTime)
+    value = Column(Float, nullable=True)
+    message = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # 关联关系
+    alert = relationship("Alert", back_populates="events")
@@ -105,7 +105,7 @@ class WatchlistBase(BaseModel):
     name: str
 
 class WatchlistCreate(WatchlistBase):
-    user_id: int
+    symbols: List[str] = []
 
 class WatchlistUpdate(WatchlistBase):
     pass
@@ -119,8 +119,43 @@ class WatchlistInDBBase(WatchlistBase):
         orm_mode = True
 
 class Watchlist(WatchlistInDBBase):
+    symbols: List[str] = []
+
+class WatchlistSymbols(BaseModel):
+    symbols: List[str]
+
+# 价格提醒相关模型
+class AlertBase(BaseModel):
+    symbol: str
+    condition: str  # 例如: "RSI(14) crosses below 30", "close crosses above MA(20)"
+
+class AlertCreate(AlertBase):
+    pass
+
+class AlertInDBBase(AlertBase):
+    id: int
+    user_id: int
+    is_active: bool
+    last_triggered_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class Alert(AlertInDBBase):
     pass
 
+class AlertEvent(BaseModel):
+    id: int
+    alert_id: int
+    bar_date: datetime
+    value: Optional[float] = None
+    message: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
 # 认证相关模型
 class Token(BaseModel):
     access_token: str
@@ -144,6 +179,9 @@ class StockFilterRequest(BaseModel):
     rsi_min: Optional[float] = None
     rsi_max: Optional[float] = None
     macd_signal: Optional[str] = None  # MACD信号: bullish, bearish
+    expression: Optional[str] = None  # 自定义选股表达式，例如 "close > ma(50) and rsi(14) < 30"
+    limit: Optional[int] = 500  # null 表示不限（导出全部结果时与 format=ndjson 一起使用）
+    cursor: Optional[str] = None  # 上一页响应头 X-Next-Cursor 的值
 
 # 技术分析请求模型
 class TechnicalAnalysisRequest(BaseModel):
@@ -151,7 +189,15 @@ class TechnicalAnalysisRequest(BaseModel):
     indicators: List[str]  # 例如: ["MA", "RSI", "MACD"]
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    max_points: Optional[int] = None  # 图表点数上限，超过时用 LTTB 降采样
     
+# 相关性分析请求模型
+class CorrelationRequest(BaseModel):
+    symbols: Optional[List[str]] = None  # 股票列表，与 sector 二选一
+    sector: Optional[str] = None
+    window: int = 60  # 收益率窗口（交易日）
+    benchmark: Optional[str] = "SPY"  # 计算Beta和相对强弱的基准
+
 # 市场趋势请求模型
 class MarketTrendRequest(BaseModel):
     market: str = "US"  # 市场: US, HK, CN
@@ -0,0 +1,163 @@
+"""
+复权计算：K线保存为未复权的原始价格，拆股和分红单独记录，读取时按累积乘积计算复权因子
+
+新增一条拆股或分红只改变复权因子，不需要重新获取或改写历史K线
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.models import CorporateAction, Stock
+
+logger = logging.getLogger(__name__)
+
+SPLIT = "split"
+DIVIDEND = "dividend"
+
+def make_actions(ts=(), types=(), values=()) -> Dict[str, np.ndarray]:
+    """
+    公司行为的数组表示，按日期排序
+    """
+    ts = np.asarray(ts, dtype="datetime64[ns]")
+    order = np.argsort(ts, kind="stable")
+    return {
+        "ts": ts[order],
+        "type": np.asarray(types, dtype=object)[order],
+        "value": np.asarray(values, dtype=np.float64)[order]
+    }
+
+def merge_actions(*groups: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    合并多个来源的公司行为，同一日期的同类行为只保留一条
+    """
+    seen = {}
+    for group in groups:
+        for ts, action_type, value in zip(group["ts"], group["type"], group["value"]):
+            seen.setdefault((ts, action_type), value)
+    if not seen:
+        return make_actions()
+    keys = list(seen)
+    return make_actions([k[0] for k in keys], [k[1] for k in keys], list(seen.values()))
+
+def adjustment_factors(ts: np.ndarray, close: np.ndarray, actions: Dict[str, np.ndarray], splits_only: bool = False):
+    """
+    每根K线的价格和成交量复权因子（前复权，以最新价格为基准）
+
+    除权除息日之前的K线乘以该事件的因子：拆股的价格因子为 1/比例、成交量因子为比例，
+    分红的价格因子为 1 - 分红/除息日前收盘价；多个事件按时间倒序累积相乘
+    """
+    n = len(ts)
+    price_step = np.ones(n + 1)
+    volume_step = np.ones(n + 1)
+    if n and len(actions["ts"]):
+        positions = np.searchsorted(ts, actions["ts"], side="left")
+        # 除权日在第一根K线之前（含当天）的事件不影响任何K线
+        applies = positions > 0
+        value = actions["value"]
+        split = applies & (actions["type"] == SPLIT) & (value > 0)
+        np.multiply.at(price_step, positions[split], 1.0 / value[split])
+        np.multiply.at(volume_step, positions[split], value[split])
+        if not splits_only:
+            dividend = applies & (actions["type"] == DIVIDEND)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                factor = 1.0 - value[dividend] / close[positions[dividend] - 1]
+            usable = np.isfinite(factor) & (factor > 0)
+            np.multiply.at(price_step, positions[dividend][usable], factor[usable])
+    price_factor = np.cumprod(price_step[::-1])[::-1][1:]
+    volume_factor = np.cumprod(volume_step[::-1])[::-1][1:]
+    return price_factor, volume_factor
+
+def unadjust_splits(bars: dict, actions: Dict[str, np.ndarray]) -> dict:
+    """
+    上游返回的价格已按拆股调整，除以拆股因子还原为原始成交价格
+    """
+    if not bars:
+        return bars
+    price_factor, volume_factor = adjustment_factors(bars["ts"], bars["close"], actions, splits_only=True)
+    raw = dict(bars)
+    for field in ("open", "high", "low", "close"):
+        raw[field] = bars[field] / price_factor
+    raw["volume"] = bars["volume"] / volume_factor
+    return raw
+
+def adjust_bars(bars: dict, actions: Dict[str, np.ndarray], adjusted: bool = True) -> dict:
+    """
+    按公司行为计算复权价格；adjusted 为 False 时开高低收保持原始价格，只增加 adjusted_close
+    """
+    if not bars:
+        return bars
+    price_factor, volume_factor = adjustment_factors(bars["ts"], bars["close"], actions)
+    result = dict(bars)
+    result["adjusted_close"] = bars["close"] * price_factor
+    if adjusted:
+        for field in ("open", "high", "low", "close"):
+            result[field] = bars[field] * price_factor
+        result["volume"] = bars["volume"] * volume_factor
+    return result
+
+def actions_from_frame(history) -> Dict[str, np.ndarray]:
+    """
+    从 yfinance 返回的 Dividends / Stock Splits 列提取公司行为
+    """
+    if history is None or len(history) == 0:
+        return make_actions()
+    index = history.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    ts = index.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype("datetime64[ns]")
+    parts = []
+    for column, action_type in (("Stock Splits", SPLIT), ("Dividends", DIVIDEND)):
+        if column not in history:
+            continue
+        values = history[column].to_numpy(dtype=np.float64)
+        hit = np.nan_to_num(values) > 0
+        parts.append(make_actions(ts[hit], [action_type] * int(hit.sum()), values[hit]))
+    return merge_actions(*parts) if parts else make_actions()
+
+def load_actions(db: Session, stock_ids: Iterable[int]) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    一次查询读取多只股票的公司行为
+    """
+    rows = (
+        db.query(CorporateAction.stock_id, CorporateAction.date, CorporateAction.action_type, CorporateAction.value)
+        .filter(CorporateAction.stock_id.in_(list(stock_ids)))
+        .all()
+    )
+    grouped = defaultdict(lambda: ([], [], []))
+    for stock_id, date, action_type, value in rows:
+        ts, types, values = grouped[stock_id]
+        ts.append(date)
+        types.append(action_type)
+        values.append(value)
+    return {stock_id: make_actions(*columns) for stock_id, columns in grouped.items()}
+
+def load_symbol_actions(db: Session, symbol: str) -> Dict[str, np.ndarray]:
+    stock_id = db.query(Stock.id).filter(Stock.symbol == symbol.upper()).scalar()
+    if stock_id is None:
+        return make_actions()
+    return load_actions(db, [stock_id]).get(stock_id, make_actions())
+
+def save_actions(db: Session, symbol: str, actions: Dict[str, np.ndarray]) -> int:
+    """
+    保存新出现的公司行为，已有记录不重复写入；返回新增条数。股票不在 stocks 表中时不保存
+    """
+    if not len(actions["ts"]):
+        return 0
+    stock_id: Optional[int] = db.query(Stock.id).filter(Stock.symbol == symbol.upper()).scalar()
+    if stock_id is None:
+        return 0
+    existing = load_symbol_actions(db, symbol)
+    known = set(zip(existing["ts"], existing["type"]))
+    new_rows = [
+        CorporateAction(stock_id=stock_id, date=ts.astype("datetime64[us]").item(), action_type=action_type, value=float(value))
+        for ts, action_type, value in zip(actions["ts"], actions["type"], actions["value"])
+        if (ts, action_type) not in known
+    ]
+    if new_rows:
+        db.add_all(new_rows)
+        db.commit()
+        logger.info(f"{symbol} 新增 {len(new_rows)} 条公司行为记录")
+    return len(new_rows)
@@ -0,0 +1,333 @@
+import re
+import math
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import get_cache
+from app.core.config import settings
+from app.models.models import Alert, AlertEvent
+
+logger = logging.getLogger(__name__)
+
+class AlertConditionError(ValueError):
+    """提醒条件无法解析"""
+
+def _close(df):
+    return df["close"]
+
+# 指标由配置的后端计算（INDICATOR_BACKEND），与技术分析接口的结果一致
+
+def _backend():
+    from app.indicators.registry import get_backend
+    return get_backend()
+
+def _column(df, name):
+    return df[name].to_numpy(dtype="float64")
+
+def _ma(df, period):
+    return _backend().sma(_column(df, "close"), int(period))
+
+def _ema(df, period):
+    return _backend().ema(_column(df, "close"), int(period))
+
+def _rsi(df, period):
+    return _backend().rsi(_column(df, "close"), int(period))
+
+def _macd(df, fast, slow, signal):
+    return _backend().macd(_column(df, "close"), int(fast), int(slow), int(signal))
+
+def _bbands(df, period, nbdev):
+    return _backend().bbands(_column(df, "close"), int(period), nbdev, nbdev)
+
+def _stoch(df, fastk, slowk, slowd):
+    return _backend().stoch(
+        _column(df, "high"), _column(df, "low"), _column(df, "close"), int(fastk), int(slowk), int(slowd)
+    )
+
+# 可用的操作数: 名称 -> (计算组, 默认参数, 输出键, 预热K线数)
+# 同一计算组、同一参数的多个输出（如 MACD 与 MACD_SIGNAL）只计算一次；
+# 预热K线数按参数计算，与技术分析接口的 INDICATOR_WARMUP 口径一致（EMA类取3倍周期使初值影响可以忽略）
+_NO_WARMUP = lambda *args: 1
+OPERANDS = {
+    "OPEN": (lambda df: df["open"], (), None, _NO_WARMUP),
+    "HIGH": (lambda df: df["high"], (), None, _NO_WARMUP),
+    "LOW": (lambda df: df["low"], (), None, _NO_WARMUP),
+    "CLOSE": (_close, (), None, _NO_WARMUP),
+    "PRICE": (_close, (), None, _NO_WARMUP),
+    "VOLUME": (lambda df: df["volume"], (), None, _NO_WARMUP),
+    "MA": (_ma, (20,), None, lambda period: period),
+    "EMA": (_ema, (20,), None, lambda period: period * 3),
+    "RSI": (_rsi, (14,), "RSI", lambda period: period + 1),
+    "MACD": (_macd, (12, 26, 9), "MACD", lambda fast, slow, signal: slow * 3 + signal),
+    "MACD_SIGNAL": (_macd, (12, 26, 9), "MACD_signal", lambda fast, slow, signal: slow * 3 + signal),
+    "MACD_HIST": (_macd, (12, 26, 9), "MACD_hist", lambda fast, slow, signal: slow * 3 + signal),
+    "BBANDS_UPPER": (_bbands, (20, 2), "BBANDS_upper", lambda period, nbdev: period),
+    "BBANDS_MIDDLE": (_bbands, (20, 2), "BBANDS_middle", lambda period, nbdev: period),
+    "BBANDS_LOWER": (_bbands, (20, 2), "BBANDS_lower", lambda period, nbdev: period),
+    "STOCH_K": (_stoch, (14, 3, 3), "STOCH_K", lambda fastk, slowk, slowd: fastk + slowk + slowd),
+    "STOCH_D": (_stoch, (14, 3, 3), "STOCH_D", lambda fastk, slowk, slowd: fastk + slowk + slowd),
+}
+
+OPERATORS = {
+    ">": lambda pl, pr, cl, cr: cl > cr,
+    "<": lambda pl, pr, cl, cr: cl < cr,
+    ">=": lambda pl, pr, cl, cr: cl >= cr,
+    "<=": lambda pl, pr, cl, cr: cl <= cr,
+    "crosses_above": lambda pl, pr, cl, cr: pl <= pr and cl > cr,
+    "crosses_below": lambda pl, pr, cl, cr: pl >= pr and cl < cr,
+}
+
+_CONDITION_RE = re.compile(
+    r"^\s*(?P<lhs>.+?)\s+(?P<op>crosses\s+above|crosses\s+below|>=|<=|>|<)\s+(?P<rhs>.+?)\s*$",
+    re.IGNORECASE
+)
+_OPERAND_RE = re.compile(r"^(?P<name>[A-Za-z_]+)\s*(?:\(\s*(?P<args>[^)]*)\))?$")
+_NUMBER_RE = re.compile(r"^-?\d+(?:\.\d+)?$")
+
+class Operand(NamedTuple):
+    name: str  # 指标名，常数为 "CONST"
+    args: Tuple[float, ...]
+
+    @property
+    def warmup(self) -> int:
+        """求出最新值所需的K线数"""
+        if self.name == "CONST":
+            return 0
+        return int(math.ceil(OPERANDS[self.name][3](*self.args)))
+
+    def __str__(self):
+        if self.name == "CONST":
+            return f"{self.args[0]:g}"
+        if not self.args:
+            return self.name
+        return f"{self.name}({','.join(f'{a:g}' for a in self.args)})"
+
+class Condition(NamedTuple):
+    lhs: Operand
+    op: str
+    rhs: Operand
+
+    @property
+    def key(self) -> str:
+        """规范化后的条件文本，相同含义的条件共用同一个键"""
+        return f"{self.lhs} {self.op} {self.rhs}"
+
+def _parse_operand(text: str) -> Operand:
+    text = text.strip()
+    if _NUMBER_RE.match(text):
+        return Operand("CONST", (float(text),))
+    match = _OPERAND_RE.match(text)
+    if not match:
+        raise AlertConditionError(f"无法识别的操作数: {text}")
+    name = match.group("name").upper()
+    if name not in OPERANDS:
+        raise AlertConditionError(f"不支持的指标: {name}")
+    defaults = OPERANDS[name][1]
+    args_text = (match.group("args") or "").strip()
+    try:
+        args = tuple(float(a) for a in args_text.split(",")) if args_text else defaults
+    except ValueError:
+        raise AlertConditionError(f"指标参数必须是数字: {text}")
+    if len(args) != len(defaults):
+        raise AlertConditionError(f"{name} 需要 {len(defaults)} 个参数")
+    return Operand(name, args)
+
+def parse_condition(text: str) -> Condition:
+    """
+    解析提醒条件，例如 "RSI(14) crosses below 30"、"close crosses above MA(20)"
+    """
+    match = _CONDITION_RE.match(text or "")
+    if not match:
+        raise AlertConditionError(f"无法解析的条件: {text}")
+    op = re.sub(r"\s+", "_", match.group("op").lower())
+    condition = Condition(_parse_operand(match.group("lhs")), op, _parse_operand(match.group("rhs")))
+    if condition.lhs.name == "CONST" and condition.rhs.name == "CONST":
+        raise AlertConditionError("条件两侧不能都是常数")
+    return condition
+
+class Trigger(NamedTuple):
+    alert_id: int
+    bar_date: Any
+    value: Optional[float]
+    message: str
+
+class AlertPlan:
+    """
+    所有有效提醒编译后的共享求值计划
+
+    相同的条件只求值一次，同一股票上的每个指标（按参数区分）只计算一次
+    """
+    def __init__(self):
+        self.conditions: Dict[str, Condition] = {}
+        self.subscribers: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        self.by_symbol: Dict[str, Set[str]] = defaultdict(set)
+
+    def add(self, alert_id: int, symbol: str, condition: Condition):
+        key = condition.key
+        self.conditions[key] = condition
+        self.subscribers[(symbol, key)].add(alert_id)
+        self.by_symbol[symbol].add(key)
+
+    def lookback(self, symbol: str) -> int:
+        """
+        求值该股票全部条件所需的K线数：最长的指标预热期，加上比较前一根K线（穿越条件）所需的一根
+        """
+        return max(
+            (max(self.conditions[key].lhs.warmup, self.conditions[key].rhs.warmup) for key in self.by_symbol.get(symbol, ())),
+            default=0
+        ) + 1
+
+    def symbol_signature(self, symbol: str):
+        return frozenset(
+            (key, alert_id) for key in self.by_symbol.get(symbol, ())
+            for alert_id in self.subscribers[(symbol, key)]
+        )
+
+    @classmethod
+    def build(cls, alerts) -> "AlertPlan":
+        plan = cls()
+        for alert in alerts:
+            try:
+                plan.add(alert.id, alert.symbol.upper(), parse_condition(alert.condition))
+            except AlertConditionError as e:
+                logger.warning(f"跳过无效提醒 {alert.id}: {str(e)}")
+        return plan
+
+    def evaluate(self, symbol: str, df) -> List[Trigger]:
+        """
+        在一只股票的最新K线上求值该股票的全部条件
+        """
+        if len(df) < 2:
+            return []
+        import numpy as np
+        computed = {}
+
+        def last_two(operand: Operand):
+            if operand.name == "CONST":
+                return operand.args[0], operand.args[0]
+            func, _, output, _ = OPERANDS[operand.name]
+            group_key = (func, operand.args)
+            if group_key not in computed:
+                computed[group_key] = func(df, *operand.args)
+            values = computed[group_key]
+            if output is not None:
+                values = values[output]
+            values = np.asarray(values, dtype=float)
+            return float(values[-2]), float(values[-1])
+
+        bar_date = df.index[-1]
+        triggers = []
+        for key in self.by_symbol.get(symbol, ()):
+            condition = self.conditions[key]
+            prev_l, cur_l = last_two(condition.lhs)
+            prev_r, cur_r = last_two(condition.rhs)
+            if any(math.isnan(v) for v in (prev_l, cur_l, prev_r, cur_r)):
+                continue
+            if OPERATORS[condition.op](prev_l, prev_r, cur_l, cur_r):
+                for alert_id in self.subscribers[(symbol, key)]:
+                    triggers.append(Trigger(alert_id, bar_date, cur_l, f"{symbol} {key}"))
+        return triggers
+
+class AlertEngine:
+    """
+    增量提醒引擎：只对K线有更新的股票重新求值，且只在最近的预热窗口上计算指标
+    """
+    def __init__(self):
+        self.plan = AlertPlan()
+        self._plan_signature = None
+        self._last_bar: Dict[str, Any] = {}
+
+    def refresh_plan(self, alerts):
+        signature = tuple(sorted((a.id, a.symbol, a.condition) for a in alerts))
+        if signature != self._plan_signature:
+            old_plan = self.plan
+            self.plan = AlertPlan.build(alerts)
+            self._plan_signature = signature
+            # 提醒有变化的股票需要在当前K线上重新求值一次
+            self._last_bar = {
+                symbol: bar for symbol, bar in self._last_bar.items()
+                if self.plan.symbol_signature(symbol) == old_plan.symbol_signature(symbol)
+            }
+
+    def on_bars(self, symbol: str, df) -> List[Trigger]:
+        """
+        收到一只股票的K线；最新K线未变化时直接跳过
+
+        交易时段内当天的日K线日期不变但价格和成交量持续更新，因此按 (日期, 收盘价, 成交量) 判断是否变化，
+        盘中每次更新都会重新求值，直到收盘后K线不再变化
+        """
+        if df is None or len(df) == 0:
+            return []
+        last = (df.index[-1], float(df["close"].iloc[-1]), float(df["volume"].iloc[-1]))
+        if self._last_bar.get(symbol) == last:
+            return []
+        self._last_bar[symbol] = last
+        return self.plan.evaluate(symbol, df.iloc[-self.plan.lookback(symbol):])
+
+alert_engine = AlertEngine()
+
+# 按需要的K线数选择获取的历史长度（日K线约每年252根）
+_HISTORY_PERIODS = ((120, "6mo"), (250, "1y"), (500, "2y"), (1250, "5y"))
+
+def _history_period(bars: int) -> str:
+    for limit, period in _HISTORY_PERIODS:
+        if bars <= limit:
+            return period
+    return "max"
+
+def _load_bars(symbol: str, bars: int = 0):
+    from app.data_sources.stock_data import BAR_COLUMNS, get_stock_bars
+    import pandas as pd
+
+    history = get_stock_bars(symbol, period=_history_period(bars), interval="1d")
+    if not history:
+        return None
+    df = pd.DataFrame({field: history[field] for field in BAR_COLUMNS[1:]})
+    df.index = pd.DatetimeIndex(history["ts"].astype("datetime64[D]").astype("datetime64[ns]"), name="date")
+    return df
+
+def run_alert_cycle(db: Session, symbols: Optional[List[str]] = None) -> List[Trigger]:
+    """
+    执行一轮提醒检查并保存触发记录
+    """
+    alerts = db.query(Alert).filter(Alert.is_active == True).all()
+    alert_engine.refresh_plan(alerts)
+    alerts_by_id = {alert.id: alert for alert in alerts}
+
+    triggered = []
+    for symbol in symbols or list(alert_engine.plan.by_symbol):
+        bars = _load_bars(symbol, alert_engine.plan.lookback(symbol))
+        for trigger in alert_engine.on_bars(symbol, bars):
+            alert = alerts_by_id[trigger.alert_id]
+            bar_date = trigger.bar_date.to_pydatetime().replace(tzinfo=None)
+            # 多个worker轮流执行检查时，通过数据库记录避免同一根K线重复触发
+            if alert.last_bar_date == bar_date:
+                continue
+            alert.last_bar_date = bar_date
+            alert.last_triggered_at = datetime.utcnow()
+            db.add(AlertEvent(alert_id=alert.id, bar_date=bar_date, value=trigger.value, message=trigger.message))
+            triggered.append(trigger)
+    db.commit()
+    if triggered:
+        logger.info(f"提醒检查完成，触发 {len(triggered)} 条提醒")
+    return triggered
+
+def run_scheduled_alert_cycle():
+    """
+    后台定时检查：多个worker中每个周期只有一个执行
+    """
+    from app.db.session import SessionLocal
+
+    if not get_cache().add("alerts:cycle", True, ttl=max(settings.ALERT_CHECK_INTERVAL - 1, 1)):
+        return
+    db = SessionLocal()
+    try:
+        run_alert_cycle(db)
+    except Exception as e:
+        logger.error(f"提醒检查时出错: {str(e)}")
+    finally:
+        db.close()
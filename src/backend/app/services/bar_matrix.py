@@ -0,0 +1,112 @@
+"""
+紧凑的全市场K线矩阵：每个字段一个连续的 (股票数, 交易日数) 数组，所有股票共用一条日期轴
+
+价格默认为 float64，设置 BAR_PRICE_DTYPE=float32 时内存减半；成交量为 int64。
+缺失的K线价格为 NaN、成交量为 0（以收盘价是否为 NaN 区分），计算时通过 float_fields 按需转换为 float64
+"""
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+PRICE_FIELDS = ("open", "high", "low", "close")
+FIELDS = PRICE_FIELDS + ("volume",)
+
+def compact_field(name: str, values: np.ndarray, price_dtype) -> np.ndarray:
+    """
+    把一个字段转换为存储类型；类型已经一致时不复制（例如从快照映射的只读数组）
+    """
+    if name == "volume":
+        if values.dtype == np.int64:
+            return values
+        return np.nan_to_num(np.rint(values), nan=0, posinf=0, neginf=0).astype(np.int64)
+    return np.ascontiguousarray(values, dtype=price_dtype)
+
+def to_float64(name: str, values: np.ndarray, close: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    计算用的 float64 数组：成交量在缺失的K线（收盘价为 NaN）处恢复为 NaN
+    """
+    if values.dtype == np.float64:
+        return values
+    result = values.astype(np.float64)
+    if name == "volume" and close is not None:
+        result[np.isnan(close)] = np.nan
+    return result
+
+def exact_float64(values: np.ndarray) -> np.ndarray:
+    """
+    输出用的 float64：float32 按最短十进制表示还原（101.23 而不是 101.2300033569336）
+    """
+    if values.dtype == np.float32:
+        return values.astype(str).astype(np.float64)
+    return values.astype(np.float64, copy=False)
+
+class FloatFields(Mapping):
+    """
+    按需转换为 float64 的字段视图，每个字段只转换一次；选股表达式通常只用到部分字段
+    """
+    def __init__(self, fields: Dict[str, np.ndarray]):
+        self._fields = fields
+        self._converted: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._converted:
+            self._converted[name] = to_float64(name, self._fields[name], self._fields.get("close"))
+        return self._converted[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+class BarMatrix:
+    """
+    按日期对齐的全市场K线：fields 为各字段的二维数组，meta 为每只股票一个值的字段（例如 market_cap）
+    """
+    def __init__(self, symbols: List[str], dates: np.ndarray, fields: Dict[str, np.ndarray],
+                 meta: Optional[Dict[str, np.ndarray]] = None, price_dtype: Optional[str] = None):
+        if price_dtype is None:
+            from app.core.config import settings
+            price_dtype = settings.BAR_PRICE_DTYPE
+        self.symbols = symbols
+        self.dates = dates
+        self.fields = {name: compact_field(name, values, price_dtype) for name, values in fields.items()}
+        self.meta = meta or {}
+        self._index: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def empty(cls) -> "BarMatrix":
+        return cls([], np.array([], dtype="datetime64[D]"), {f: np.empty((0, 0)) for f in FIELDS}, {})
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """
+        股票代码到行号的索引
+        """
+        if self._index is None:
+            self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return self._index
+
+    def row(self, symbol: str) -> Optional[int]:
+        return self.index.get(symbol.upper())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.fields.values()) + self.dates.nbytes
+
+    def float_fields(self) -> FloatFields:
+        return FloatFields(self.fields)
+
+    def float_field(self, name: str) -> np.ndarray:
+        return to_float64(name, self.fields[name], self.fields.get("close"))
+
+    def freeze(self):
+        """
+        标记为只读：矩阵被缓存并在多个请求间共享
+        """
+        for values in self.fields.values():
+            values.flags.writeable = False
@@ -0,0 +1,156 @@
+"""
+跨股票分析：收益率相关系数矩阵、相对基准指数的Beta和相对强弱排名
+
+所有股票的收益率对齐为一个 (股票数, 窗口长度) 矩阵，相关系数和Beta通过矩阵乘法（BLAS）一次算出
+"""
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.cache import cache_get, cache_set, make_key
+from app.core.config import settings
+from app.models.models import StockPrice
+from app.services.bar_matrix import BarMatrix
+from app.services.market_data import load_universe
+
+logger = logging.getLogger(__name__)
+
+def returns_matrix(close: np.ndarray, window: int) -> np.ndarray:
+    """
+    最近 window 个交易日的日收益率，形状为 (股票数, window)；float32 价格先转换为 float64
+    """
+    close = close[:, -(window + 1):].astype(np.float64, copy=False)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return close[:, 1:] / close[:, :-1] - 1
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """
+    各行之间的皮尔逊相关系数：先按行标准化，再做一次 X @ X.T
+    """
+    centered = returns - returns.mean(axis=1, keepdims=True)
+    norms = np.sqrt(np.einsum("ij,ij->i", centered, centered))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = centered / norms[:, None]
+    corr = normalized @ normalized.T
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return corr
+
+def betas(returns: np.ndarray, benchmark_returns: np.ndarray) -> np.ndarray:
+    """
+    每只股票相对基准的Beta: cov(r, b) / var(b)
+    """
+    centered = returns - returns.mean(axis=1, keepdims=True)
+    bench = benchmark_returns - benchmark_returns.mean()
+    variance = bench @ bench
+    if variance == 0:
+        return np.full(len(returns), np.nan)
+    return (centered @ bench) / variance
+
+def _align_benchmark(universe: BarMatrix, benchmark: BarMatrix) -> Optional[np.ndarray]:
+    """
+    把基准指数的收盘价对齐到股票矩阵的日期上
+    """
+    if len(benchmark) == 0:
+        return None
+    aligned = np.full(len(universe.dates), np.nan)
+    positions = np.searchsorted(benchmark.dates, universe.dates)
+    positions = np.minimum(positions, len(benchmark.dates) - 1)
+    found = benchmark.dates[positions] == universe.dates
+    aligned[found] = benchmark.fields["close"][0, positions[found]]
+    return aligned
+
+def compute_correlation(universe: BarMatrix, window: int, benchmark_close: Optional[np.ndarray] = None,
+                        benchmark: Optional[str] = None) -> Dict[str, Any]:
+    """
+    在对齐后的全市场矩阵上计算相关系数、Beta和相对强弱；窗口内有缺失数据的股票不参与计算
+    """
+    window = min(window, max(len(universe.dates) - 1, 0))
+    returns = returns_matrix(universe.fields["close"], window)
+    complete = ~np.isnan(returns).any(axis=1) if window else np.zeros(len(universe), dtype=bool)
+    symbols = [s for s, ok in zip(universe.symbols, complete) if ok]
+    excluded = [s for s, ok in zip(universe.symbols, complete) if not ok]
+    returns = returns[complete]
+
+    total_return = np.prod(1 + returns, axis=1) - 1 if window else np.array([])
+    result: Dict[str, Any] = {
+        "symbols": symbols,
+        "window": window,
+        "start_date": str(universe.dates[-(window + 1)]) if window else None,
+        "end_date": str(universe.dates[-1]) if window else None,
+        "correlation": correlation_matrix(returns) if len(symbols) else [],
+        "benchmark": benchmark,
+        "beta": None,
+        "excluded": excluded
+    }
+
+    benchmark_return = None
+    if benchmark_close is not None and window:
+        bench_returns = returns_matrix(benchmark_close[None, :], window)[0]
+        if not np.isnan(bench_returns).any():
+            result["beta"] = betas(returns, bench_returns)
+            benchmark_return = float(np.prod(1 + bench_returns) - 1)
+        else:
+            logger.warning(f"基准 {benchmark} 在窗口内有缺失数据，不计算Beta")
+
+    # 相对强弱：窗口收益率相对基准（没有基准时相对等权平均）的比值，按从强到弱排名
+    reference = benchmark_return if benchmark_return is not None else (
+        float(total_return.mean()) if len(total_return) else 0.0
+    )
+    strength = (1 + total_return) / (1 + reference)
+    order = np.argsort(-strength, kind="stable")
+    result["relative_strength"] = [
+        {
+            "symbol": symbols[i],
+            "return": round(float(total_return[i]) * 100, 4),
+            "relative_strength": round(float(strength[i]), 6),
+            "rank": rank + 1
+        }
+        for rank, i in enumerate(order)
+    ]
+    return result
+
+def universe_key(symbols: Optional[List[str]], sector: Optional[str]) -> str:
+    if symbols:
+        joined = ",".join(sorted(s.upper() for s in symbols))
+        return "symbols-" + hashlib.sha1(joined.encode()).hexdigest()[:16]
+    return f"sector-{sector or 'all'}"
+
+def cached_correlation(db: Session, symbols: Optional[List[str]], sector: Optional[str],
+                       window: int, benchmark: Optional[str]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    按 (股票范围, 窗口, 基准, 最新交易日) 查找缓存结果，新的K线入库后自动失效；返回缓存键和结果
+    """
+    latest = db.query(func.max(StockPrice.date)).scalar()
+    key = make_key("correlation", universe_key(symbols, sector), window, benchmark or "", latest)
+    return key, cache_get(key)
+
+def store_correlation(key: str, result: Dict[str, Any]):
+    cache_set(key, result, settings.HISTORY_CACHE_TTL)
+
+def load_correlation_inputs(db: Session, symbols: Optional[List[str]], sector: Optional[str],
+                            window: int, benchmark: Optional[str]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    读取对齐后的收盘价矩阵（以及基准收盘价），作为 correlation_job 的输入
+    """
+    universe = load_universe(db, symbols=symbols, sector=sector, lookback_bars=window + 1)
+    arrays = {"dates": universe.dates, "close": universe.fields["close"]}
+    if benchmark and len(universe):
+        benchmark_close = _align_benchmark(
+            universe, load_universe(db, symbols=[benchmark], lookback_bars=window + 1)
+        )
+        if benchmark_close is not None:
+            arrays["benchmark_close"] = benchmark_close
+    return universe.symbols, arrays
+
+def correlation_job(arrays: Dict[str, np.ndarray], symbols: List[str], window: int,
+                    benchmark: Optional[str]) -> Dict[str, Any]:
+    """
+    计算进程池中执行的任务
+    """
+    close = arrays["close"]
+    universe = BarMatrix(symbols, arrays["dates"], {"close": close}, price_dtype=close.dtype)
+    return compute_correlation(universe, window, arrays.get("benchmark_close"), benchmark)
@@ -0,0 +1,108 @@
+"""
+图表降采样：图表的横向像素有限，长历史只需返回与分辨率相当的点数
+
+- 折线（收盘价、指标）使用 LTTB（Largest-Triangle-Three-Buckets），保留走势中的拐点和极值
+- K线按等数量分组聚合为更粗的K线，保留每组的开盘、最高、最低和收盘
+"""
+from typing import Optional
+
+import numpy as np
+
+from app.services.resample import aggregate_bars
+
+DOWNSAMPLE_METHODS = ("ohlc", "lttb")
+
+# 少于3个点时 LTTB 没有意义（首尾两点固定保留）
+MIN_POINTS = 3
+
+def validate_downsample(max_points: Optional[int], method: str = "ohlc"):
+    """
+    检查降采样参数，无效时抛出 ValueError
+    """
+    if max_points is not None and max_points < MIN_POINTS:
+        raise ValueError(f"max_points 不能小于 {MIN_POINTS}")
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方式: {method}")
+
+def lttb_indices(y: np.ndarray, max_points: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    LTTB 选出的点的下标（升序，包含首尾两点）；x 默认为等间距
+
+    首尾之外的点均分为 max_points - 2 组，每组选出与上一个选中点、下一组均值构成的三角形面积最大的点。
+    各组的均值一次算出，逐组的选择依赖上一组的结果，只在组之间循环
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if max_points >= n or max_points < MIN_POINTS:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    # 各组的均值（缺失值不计入）；最后一组的“下一组”为末尾的点
+    missing = np.isnan(y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+        avg_y = np.append(
+            np.add.reduceat(np.where(missing, 0.0, y)[:-1], edges[:-1])
+            / np.add.reduceat((~missing[:-1]).astype(np.int64), edges[:-1]),
+            y[-1]
+        )
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    if n / (max_points - 2) > _SCALAR_BUCKET:
+        _select_vector(x, y, edges, avg_x, avg_y, selected)
+    else:
+        _select_scalar(x.tolist(), y.tolist(), edges.tolist(), avg_x.tolist(), avg_y.tolist(), selected)
+    return selected
+
+# 平均每组的点数不超过该值时逐点计算：小数组上每次调用NumPy的固定开销远大于计算本身
+_SCALAR_BUCKET = 32
+
+def _select_scalar(x, y, edges, avg_x, avg_y, selected):
+    a = 0
+    for i in range(len(edges) - 1):
+        ax, ay = x[a], y[a]
+        dx, dy = ax - avg_x[i + 1], avg_y[i + 1] - ay
+        best, a = -1.0, edges[i]
+        for j in range(edges[i], edges[i + 1]):
+            area = abs(dx * (y[j] - ay) - (ax - x[j]) * dy)
+            if area > best:  # 缺失点的面积为 NaN，不会被选中
+                best, a = area, j
+        selected[i + 1] = a
+
+def _select_vector(x, y, edges, avg_x, avg_y, selected):
+    a = 0
+    for i in range(len(edges) - 1):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        with np.errstate(invalid="ignore"):
+            area = np.abs((ax - avg_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[i + 1] - ay))
+        a = lo + int(np.argmax(np.where(np.isnan(area), -1.0, area)))
+        selected[i + 1] = a
+
+def ohlc_buckets(n: int, max_points: int) -> np.ndarray:
+    """
+    把 n 根K线均分为不超过 max_points 组，返回每组的起始下标
+    """
+    return np.unique(np.linspace(0, n, max_points, endpoint=False).astype(np.int64))
+
+def downsample_bars(bars: dict, max_points: int, method: str = "ohlc") -> dict:
+    """
+    把K线降采样到不超过 max_points 个点
+
+    ohlc: 相邻K线聚合为一根，时间取每组第一根；lttb: 按收盘价用 LTTB 选出原始K线
+    """
+    n = len(bars.get("ts", ()))
+    if n <= max_points:
+        return bars
+    if method == "lttb":
+        x = bars["ts"].astype(np.int64)
+        indices = lttb_indices(bars["close"], max_points, x)
+        return {
+            key: values[indices] for key, values in bars.items()
+            if isinstance(values, np.ndarray) and len(values) == n
+        }
+    starts = ohlc_buckets(n, max_points)
+    return aggregate_bars(bars, starts, bars["ts"][starts])
@@ -0,0 +1,125 @@
+"""
+向量化指标计算核心，沿最后一个维度（时间）计算，支持单只股票的一维数组和全市场的二维数组
+
+结果与 app/api/analysis.py 中基于 pandas 的实现保持一致：窗口内存在缺失值时结果为 NaN
+"""
+import numpy as np
+
+def _window_view(x: np.ndarray, window: int):
+    from numpy.lib.stride_tricks import sliding_window_view
+    return sliding_window_view(x, window, axis=-1)
+
+def _pad_front(result: np.ndarray, x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    out[..., window - 1:] = result
+    return out
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    window = int(window)
+    if window <= 0 or x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    valid = ~np.isnan(x)
+    zero_filled = np.where(valid, x, 0.0)
+    shape = x.shape[:-1] + (1,)
+    csum = np.concatenate([np.zeros(shape), np.cumsum(zero_filled, axis=-1)], axis=-1)
+    ccount = np.concatenate([np.zeros(shape), np.cumsum(valid, axis=-1)], axis=-1)
+    sums = csum[..., window:] - csum[..., :-window]
+    counts = ccount[..., window:] - ccount[..., :-window]
+    result = np.where(counts == window, sums / window, np.nan)
+    return _pad_front(result, x, window)
+
+def rolling_std(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    window = int(window)
+    if window <= ddof or x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    return _pad_front(_window_view(x, window).std(axis=-1, ddof=ddof), x, window)
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    window = int(window)
+    if window <= 0 or x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    # 窗口内有NaN时np.max返回NaN，与pandas默认的min_periods行为一致
+    return _pad_front(_window_view(x, window).max(axis=-1), x, window)
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    window = int(window)
+    if window <= 0 or x.shape[-1] < window:
+        return np.full(x.shape, np.nan)
+    return _pad_front(_window_view(x, window).min(axis=-1), x, window)
+
+def _ema_loop(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    逐步递推；缺失值处沿用上一个值，之后的第一个有效值按 pandas（ignore_na=False）的方式计入缺失期间的衰减
+    """
+    decay = 1 - alpha
+    out = np.empty(x.shape)
+    prev = x[..., 0].copy()
+    weight = np.ones(prev.shape)
+    out[..., 0] = prev
+    for t in range(1, x.shape[-1]):
+        current = x[..., t]
+        observed = ~np.isnan(current)
+        weight = weight * decay
+        updated = (weight * prev + alpha * current) / (weight + alpha)
+        # 尚未出现有效值时取当前值；当前值缺失时沿用上一个值
+        prev = np.where(np.isnan(prev), current, np.where(observed, updated, prev))
+        weight = np.where(observed, 1.0, weight)
+        out[..., t] = prev
+    return out
+
+def _ema_blocked(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    无缺失值的二维数组上的EMA：分块使用闭式解 y_j = d^(j+1) * (c + alpha * sum(x_i * d^-(i+1)))，
+    块长使 d^-块长 不超过1e6，保证精度，时间方向只需循环 n/块长 次
+    """
+    decay = 1 - alpha
+    block = max(int(np.log(1e6) / -np.log(decay)), 1)
+    out = np.empty(x.shape)
+    carry = x[:, 0].copy()  # 使 y_0 = x_0
+    for start in range(0, x.shape[1], block):
+        chunk = x[:, start:start + block]
+        powers = decay ** np.arange(1, chunk.shape[1] + 1)
+        out[:, start:start + chunk.shape[1]] = powers * (carry[:, None] + alpha * np.cumsum(chunk / powers, axis=1))
+        carry = out[:, start + chunk.shape[1] - 1]
+    return out
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数移动平均，等价于 pandas ewm(span=span, adjust=False).mean()，从第一个有效值开始
+    """
+    x = np.asarray(x, dtype=np.float64)
+    alpha = 2.0 / (int(span) + 1.0)
+    if x.shape[-1] == 0 or alpha >= 1:
+        return _ema_loop(x, alpha) if x.shape[-1] else x.copy()
+    rows = x.reshape(-1, x.shape[-1])
+    valid = ~np.isnan(rows)
+    first = valid.argmax(axis=1)
+    started = np.arange(rows.shape[1]) >= first[:, None]
+    # 开头的缺失值（上市前）之后没有缺失值的行用分块闭式解，其余行逐步递推
+    gapless = valid.any(axis=1) & ~(started & ~valid).any(axis=1)
+    out = np.full(rows.shape, np.nan)
+    if gapless.any():
+        filled = np.where(started, rows, rows[np.arange(len(rows)), first][:, None])[gapless]
+        out[gapless] = np.where(started[gapless], _ema_blocked(filled, alpha), np.nan)
+    rest = ~gapless & valid.any(axis=1)
+    if rest.any():
+        out[rest] = _ema_loop(rows[rest], alpha)
+    return out.reshape(x.shape)
+
+def diff(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if periods < x.shape[-1]:
+        out[..., periods:] = x[..., periods:] - x[..., :-periods]
+    return out
+
+def shift(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if periods < x.shape[-1]:
+        out[..., periods:] = x[..., :-periods]
+    return out
@@ -0,0 +1,136 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.market_hours import calendar_days_for_bars
+from app.models.models import CorporateAction, Stock, StockPrice
+from app.services.adjustments import adjustment_factors, load_actions
+from app.services.bar_matrix import FIELDS, BarMatrix
+
+logger = logging.getLogger(__name__)
+
+# 最近使用的K线矩阵，键包含数据版本，K线、股票列表或公司行为变化后自动失效；
+# 进程启动时可从预热快照恢复（见 app/core/snapshot.py）
+_universe_cache: "OrderedDict[Tuple, BarMatrix]" = OrderedDict()
+_universe_lock = threading.Lock()
+
+def data_version(db: Session) -> Tuple:
+    """
+    K线矩阵依赖的数据版本：K线只追加写入，股票列表同步会刷新 last_updated
+    """
+    return tuple(db.query(
+        func.max(StockPrice.id), func.max(StockPrice.date),
+        db.query(func.count(Stock.id)).scalar_subquery(),
+        db.query(func.max(Stock.last_updated)).scalar_subquery(),
+        db.query(func.max(CorporateAction.id)).scalar_subquery()
+    ).one())
+
+def universe_key(symbols, sector, industry, country, lookback_bars, version) -> Tuple:
+    symbols = tuple(sorted(s.upper() for s in symbols)) if symbols else None
+    return (symbols, sector, industry, country, lookback_bars, tuple(str(v) for v in version))
+
+def cached_universes() -> List[Tuple[Tuple, BarMatrix]]:
+    with _universe_lock:
+        return list(_universe_cache.items())
+
+def remember_universe(key: Tuple, universe: BarMatrix):
+    with _universe_lock:
+        _universe_cache[key] = universe
+        _universe_cache.move_to_end(key)
+        while len(_universe_cache) > settings.UNIVERSE_CACHE_SIZE:
+            _universe_cache.popitem(last=False)
+
+def load_universe(
+    db: Session,
+    symbols: Optional[List[str]] = None,
+    sector: Optional[str] = None,
+    industry: Optional[str] = None,
+    country: Optional[str] = None,
+    lookback_bars: int = 260
+) -> BarMatrix:
+    """
+    从 stock_prices 表读取全市场最近 lookback_bars 个交易日的K线矩阵；数据未变化时直接返回缓存的矩阵（只读）
+    """
+    if settings.UNIVERSE_CACHE_SIZE <= 0:
+        return _load_universe(db, symbols, sector, industry, country, lookback_bars)
+    key = universe_key(symbols, sector, industry, country, lookback_bars, data_version(db))
+    with _universe_lock:
+        universe = _universe_cache.get(key)
+        if universe is not None:
+            _universe_cache.move_to_end(key)
+            return universe
+    universe = _load_universe(db, symbols, sector, industry, country, lookback_bars)
+    universe.freeze()
+    remember_universe(key, universe)
+    return universe
+
+def _load_universe(db, symbols, sector, industry, country, lookback_bars) -> BarMatrix:
+    import numpy as np
+
+    stock_query = db.query(Stock.id, Stock.symbol, Stock.name, Stock.market_cap)
+    if symbols:
+        stock_query = stock_query.filter(Stock.symbol.in_([s.upper() for s in symbols]))
+    else:
+        # 未指定股票时只包含在市股票
+        stock_query = stock_query.filter(Stock.is_delisted.isnot(True))
+    if sector:
+        stock_query = stock_query.filter(Stock.sector == sector)
+    if industry:
+        stock_query = stock_query.filter(Stock.industry == industry)
+    if country:
+        stock_query = stock_query.filter(Stock.country == country)
+    stocks = stock_query.order_by(Stock.symbol).all()
+
+    latest = db.query(func.max(StockPrice.date)).scalar()
+    if not stocks or latest is None:
+        return BarMatrix.empty()
+
+    cutoff = latest - timedelta(days=calendar_days_for_bars(lookback_bars))
+    id_to_row = {stock.id: i for i, stock in enumerate(stocks)}
+    rows = (
+        db.query(StockPrice.stock_id, StockPrice.date, StockPrice.open, StockPrice.high,
+                 StockPrice.low, StockPrice.close, StockPrice.volume)
+        .filter(StockPrice.stock_id.in_(list(id_to_row)), StockPrice.date >= cutoff)
+        .all()
+    )
+    if not rows:
+        return BarMatrix.empty()
+
+    stock_ids, dates, *values = zip(*rows)
+    row_index = np.fromiter((id_to_row[i] for i in stock_ids), dtype=np.int64, count=len(rows))
+    day = np.array(dates, dtype="datetime64[D]")
+    unique_dates, col_index = np.unique(day, return_inverse=True)
+    # 只保留最近 lookback_bars 个交易日
+    offset = max(len(unique_dates) - lookback_bars, 0)
+    unique_dates = unique_dates[offset:]
+    col_index = col_index - offset
+    keep = col_index >= 0
+
+    shape = (len(stocks), len(unique_dates))
+    fields = {}
+    for name, column in zip(FIELDS, values):
+        matrix = np.full(shape, np.nan)
+        matrix[row_index[keep], col_index[keep]] = np.array(column, dtype=np.float64)[keep]
+        fields[name] = matrix
+
+    # stock_prices 保存原始价格，按公司行为记录计算前复权价格（只有少数股票有记录）
+    ts = unique_dates.astype("datetime64[ns]")
+    for stock_id, actions in load_actions(db, id_to_row).items():
+        row = id_to_row[stock_id]
+        price_factor, volume_factor = adjustment_factors(ts, fields["close"][row], actions)
+        for name in ("open", "high", "low", "close"):
+            fields[name][row] *= price_factor
+        fields["volume"][row] *= volume_factor
+
+    meta = {
+        "name": np.array([stock.name for stock in stocks], dtype=object),
+        "market_cap": np.array([stock.market_cap if stock.market_cap is not None else np.nan for stock in stocks])
+    }
+    # 复权在 float64 上完成，之后按 BAR_PRICE_DTYPE 压缩存储
+    return BarMatrix([stock.symbol for stock in stocks], unique_dates, fields, meta)
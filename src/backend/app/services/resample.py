@@ -0,0 +1,96 @@
+"""
+K线重采样：只获取和缓存最细粒度的K线，更粗的周期在需要时向量化聚合得到
+
+K线以字典表示: {"ts": datetime64[ns]（交易所当地时间）, "open", "high", "low", "close", "volume": float64数组}
+"""
+import numpy as np
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+# 日内周期的分钟数
+INTRADAY_MINUTES = {
+    "1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30,
+    "60m": 60, "1h": 60, "90m": 90
+}
+
+# 日线及以上周期
+DAILY_INTERVALS = ("1d", "1wk", "1mo")
+
+# 日内K线从开盘时间（9:30）开始分组，与上游的小时线对齐
+SESSION_OPEN_MINUTES = 9 * 60 + 30
+
+def is_intraday(interval: str) -> bool:
+    return interval in INTRADAY_MINUTES
+
+def can_resample(base: str, interval: str) -> bool:
+    """
+    interval 能否由 base 周期的K线聚合得到
+    """
+    if is_intraday(base) and is_intraday(interval):
+        return INTRADAY_MINUTES[interval] > INTRADAY_MINUTES[base] and INTRADAY_MINUTES[interval] % INTRADAY_MINUTES[base] == 0
+    if base == "1d":
+        return interval in ("1wk", "1mo")
+    return False
+
+def _labels(ts: np.ndarray, interval: str) -> np.ndarray:
+    """
+    每根K线所属的目标周期起始时间
+    """
+    if interval == "1d":
+        return ts.astype("datetime64[D]").astype(ts.dtype)
+    if interval == "1wk":
+        days = ts.astype("datetime64[D]")
+        # 1970-01-01 是星期四，按星期一对齐
+        weekday = (days.astype(np.int64) + 3) % 7
+        return (days - weekday.astype("timedelta64[D]")).astype(ts.dtype)
+    if interval == "1mo":
+        return ts.astype("datetime64[M]").astype(ts.dtype)
+    minutes = INTRADAY_MINUTES[interval]
+    days = ts.astype("datetime64[D]")
+    since_open = (ts - days).astype("timedelta64[m]").astype(np.int64) - SESSION_OPEN_MINUTES
+    bucket = np.floor_divide(since_open, minutes) * minutes + SESSION_OPEN_MINUTES
+    return (days + bucket.astype("timedelta64[m]")).astype(ts.dtype)
+
+def aggregate_bars(bars: dict, starts: np.ndarray, ts: np.ndarray) -> dict:
+    """
+    按分组起始下标聚合K线：开盘取首根、收盘取末根、最高/最低取极值、成交量求和，ts 为每组的时间标签
+    """
+    ends = np.concatenate((starts[1:], [len(bars["ts"])])) - 1
+    result = {
+        "ts": ts,
+        "open": bars["open"][starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": bars["close"][ends],
+        "volume": np.add.reduceat(bars["volume"], starts)
+    }
+    if "adjusted_close" in bars:
+        result["adjusted_close"] = bars["adjusted_close"][ends]
+    return result
+
+def resample_bars(bars: dict, interval: str) -> dict:
+    """
+    把按时间排序的K线聚合为 interval 周期
+    """
+    ts = bars["ts"]
+    if len(ts) == 0:
+        return bars
+    labels = _labels(ts, interval)
+    starts = np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+    return aggregate_bars(bars, starts, labels[starts])
+
+def frame_to_bars(history) -> dict:
+    """
+    把 yfinance 返回的DataFrame转换为K线字典，去掉收盘价缺失的行
+    """
+    if history is None or len(history) == 0:
+        return {}
+    index = history.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)  # 保留交易所当地时间
+    close = history["Close"].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(close)
+    bars = {"ts": index.to_numpy(dtype="datetime64[ns]")[valid]}
+    for field in FIELDS:
+        bars[field] = history[field.capitalize()].to_numpy(dtype=np.float64)[valid]
+    return bars
@@ -0,0 +1,369 @@
+"""
+选股表达式语言
+
+示例:
+    close > ma(50) and rsi(14) < 30 and volume > 2 * avg(volume, 20)
+
+表达式只解析一次并缓存为编译后的计划；求值时在全市场二维数组上调用配置的指标计算后端，
+同一次选股中相同的子表达式（例如多处出现的 ma(50)）只计算一次
+"""
+import re
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.indicators.registry import get_backend
+from app.services import kernels
+from app.services.bar_matrix import FloatFields
+
+class ScreenerExpressionError(ValueError):
+    """选股表达式无法解析或求值"""
+
+# 字段: 二维K线数组，或每只股票一个值的元数据（自动按时间广播）
+SERIES_FIELDS = ("open", "high", "low", "close", "volume")
+META_FIELDS = ("market_cap",)
+
+# 函数: 名称 -> (参数说明, 求值函数)
+# 参数说明中 "x" 表示序列参数，"n" 表示正整数常量参数，带默认值时为 (类型, 默认值)
+FUNCTIONS: Dict[str, Tuple[Tuple, Callable]] = {
+    "ma": (("n", ("x", "close")), lambda n, x: get_backend().sma(x, n)),
+    "sma": (("n", ("x", "close")), lambda n, x: get_backend().sma(x, n)),
+    "ema": (("n", ("x", "close")), lambda n, x: get_backend().ema(x, n)),
+    "avg": (("x", "n"), lambda x, n: get_backend().sma(x, n)),
+    "std": (("x", "n"), lambda x, n: get_backend().std(x, n)),
+    "highest": (("x", "n"), lambda x, n: get_backend().rolling_max(x, n)),
+    "lowest": (("x", "n"), lambda x, n: get_backend().rolling_min(x, n)),
+    "ref": (("x", "n"), lambda x, n: kernels.shift(x, n)),
+    "rsi": ((("n", 14), ("x", "close")), lambda n, x: get_backend().rsi(x, n)["RSI"]),
+    "change": ((("n", 1), ("x", "close")), lambda n, x: (x / kernels.shift(x, n) - 1) * 100),
+    "macd": ((("n", 12), ("n", 26), ("n", 9)), None),
+    "macd_signal": ((("n", 12), ("n", 26), ("n", 9)), None),
+    "abs": (("x",), lambda x: abs(x)),
+}
+
+# 各函数需要的历史长度（不含参数本身的回看）
+def _lookback(name: str, ints: List[int]) -> int:
+    if name in ("ema", "macd", "macd_signal"):
+        # 指数平均需要足够长的预热期才能收敛
+        return max(ints) * 4 + (ints[2] if len(ints) > 2 else 0)
+    if name in ("rsi", "change", "ref"):
+        return ints[0] + 1
+    return ints[0] if ints else 0
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?)|(?P<name>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<op>>=|<=|==|!=|[-+*/()<>,]))"
+)
+
+_COMPARE = {">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le, "==": operator.eq, "!=": operator.ne}
+_ARITH = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ScreenerExpressionError(f"无法识别的字符: {text[pos:pos + 10]!r}")
+        pos = match.end()
+        if match.group("number") is not None:
+            tokens.append(("num", float(match.group("number"))))
+        elif match.group("name") is not None:
+            name = match.group("name").lower()
+            tokens.append(("kw" if name in ("and", "or", "not") else "name", name))
+        else:
+            tokens.append(("op", match.group("op")))
+    tokens.append(("end", None))
+    return tokens
+
+class _Parser:
+    """
+    递归下降解析器，生成由元组构成的语法树（可哈希，用于识别公共子表达式）
+
+    节点: ("num", v) / ("field", name) / ("call", name, args) / ("neg", x)
+          ("arith", op, a, b) / ("cmp", op, a, b) / ("and", a, b) / ("or", a, b) / ("not", x)
+    """
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self, kind=None, value=None):
+        token = self.tokens[self.pos]
+        if (kind and token[0] != kind) or (value is not None and token[1] != value):
+            actual = "表达式结尾" if token[0] == "end" else repr(token[1])
+            raise ScreenerExpressionError(f"语法错误: 期望 {value or kind}，实际为 {actual}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        self.take("end")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ("kw", "or"):
+            self.take()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ("kw", "and"):
+            self.take()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ("kw", "not"):
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_compare()
+
+    def parse_compare(self):
+        node = self.parse_sum()
+        token = self.peek()
+        if token[0] == "op" and token[1] in _COMPARE:
+            self.take()
+            node = ("cmp", token[1], node, self.parse_sum())
+        return node
+
+    def parse_sum(self):
+        node = self.parse_term()
+        while self.peek()[0] == "op" and self.peek()[1] in ("+", "-"):
+            op = self.take()[1]
+            node = ("arith", op, node, self.parse_term())
+        return node
+
+    def parse_term(self):
+        node = self.parse_unary()
+        while self.peek()[0] == "op" and self.peek()[1] in ("*", "/"):
+            op = self.take()[1]
+            node = ("arith", op, node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return ("neg", self.parse_unary())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, value = self.peek()
+        if kind == "num":
+            self.take()
+            return ("num", value)
+        if kind == "op" and value == "(":
+            self.take()
+            node = self.parse_or()
+            self.take("op", ")")
+            return node
+        if kind == "name":
+            self.take()
+            if self.peek() == ("op", "("):
+                return self.parse_call(value)
+            if value not in SERIES_FIELDS and value not in META_FIELDS:
+                raise ScreenerExpressionError(f"未知字段: {value}")
+            return ("field", value)
+        if kind == "end":
+            raise ScreenerExpressionError("语法错误: 表达式不完整")
+        raise ScreenerExpressionError(f"语法错误: 意外的 {value!r}")
+
+    def parse_call(self, name):
+        if name not in FUNCTIONS:
+            raise ScreenerExpressionError(f"未知函数: {name}")
+        self.take("op", "(")
+        args = []
+        if self.peek() != ("op", ")"):
+            args.append(self.parse_sum())
+            while self.peek() == ("op", ","):
+                self.take()
+                args.append(self.parse_sum())
+        self.take("op", ")")
+        return ("call", name, self._bind_args(name, args))
+
+    def _bind_args(self, name, args):
+        spec = FUNCTIONS[name][0]
+        if len(args) > len(spec):
+            raise ScreenerExpressionError(f"{name} 最多接受 {len(spec)} 个参数")
+        bound = []
+        for i, item in enumerate(spec):
+            kind, default = item if isinstance(item, tuple) else (item, None)
+            if i < len(args):
+                arg = args[i]
+            elif default is not None:
+                arg = ("field", default) if kind == "x" else ("num", float(default))
+            else:
+                raise ScreenerExpressionError(f"{name} 缺少第 {i + 1} 个参数")
+            if kind == "n":
+                if arg[0] != "num" or arg[1] < 1 or arg[1] != int(arg[1]):
+                    raise ScreenerExpressionError(f"{name} 的第 {i + 1} 个参数必须是正整数")
+                arg = ("num", float(int(arg[1])))
+            bound.append(arg)
+        return tuple(bound)
+
+class CompiledScreen(NamedTuple):
+    expression: str
+    tree: tuple
+    lookback: int  # 求值最新一根K线所需的历史长度
+
+def _tree_lookback(node) -> int:
+    kind = node[0]
+    if kind in ("num", "field"):
+        return 1
+    if kind == "call":
+        name, args = node[1], node[2]
+        ints = [int(a[1]) for a in args if a[0] == "num"]
+        inner = max((_tree_lookback(a) for a in args if a[0] != "num"), default=1)
+        return inner + _lookback(name, ints)
+    return max(_tree_lookback(child) for child in node[1:] if isinstance(child, tuple))
+
+@lru_cache(maxsize=512)
+def compile_screen(expression: str) -> CompiledScreen:
+    """
+    解析并缓存选股表达式
+    """
+    if not expression or not expression.strip():
+        raise ScreenerExpressionError("表达式不能为空")
+    tree = _Parser(expression).parse()
+    if tree[0] not in ("cmp", "and", "or", "not"):
+        raise ScreenerExpressionError("表达式的结果必须是条件（比较或逻辑运算）")
+    return CompiledScreen(expression, tree, _tree_lookback(tree))
+
+def combine_screens(screens: List[CompiledScreen]) -> CompiledScreen:
+    """
+    用 and 连接多个已编译的条件：直接组合语法树，各部分的错误信息仍指向各自的原始文本
+    """
+    tree = screens[0].tree
+    for screen in screens[1:]:
+        tree = ("and", tree, screen.tree)
+    expression = " and ".join(f"({screen.expression})" for screen in screens)
+    return CompiledScreen(expression, tree, max(screen.lookback for screen in screens))
+
+class _Evaluator:
+    def __init__(self, fields: Dict[str, Any], meta: Dict[str, Any]):
+        import numpy as np
+        self.np = np
+        self.fields = fields
+        self.meta = meta
+        self.memo: Dict[tuple, Any] = {}
+
+    def eval(self, node):
+        # 以语法树节点为键缓存结果，相同子表达式只计算一次
+        if node in self.memo:
+            return self.memo[node]
+        result = self._eval(node)
+        self.memo[node] = result
+        return result
+
+    def _eval(self, node):
+        np = self.np
+        kind = node[0]
+        if kind == "num":
+            return node[1]
+        if kind == "field":
+            name = node[1]
+            if name in SERIES_FIELDS:
+                return self.fields[name]
+            return self.meta[name][:, None]
+        if kind == "neg":
+            return -self.eval(node[1])
+        if kind == "arith":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return _ARITH[node[1]](self.eval(node[2]), self.eval(node[3]))
+        if kind == "cmp":
+            with np.errstate(invalid="ignore"):
+                return _COMPARE[node[1]](self.eval(node[2]), self.eval(node[3]))
+        if kind == "and":
+            return np.logical_and(self.eval(node[1]), self.eval(node[2]))
+        if kind == "or":
+            return np.logical_or(self.eval(node[1]), self.eval(node[2]))
+        if kind == "not":
+            return np.logical_not(self.eval(node[1]))
+        if kind == "call":
+            return self._call(node[1], node[2])
+        raise ScreenerExpressionError(f"无法求值的节点: {kind}")
+
+    def _call(self, name, args):
+        np = self.np
+        if name in ("macd", "macd_signal"):
+            fast, slow, signal = (int(a[1]) for a in args)
+            result = get_backend().macd(self.fields["close"], fast, slow, signal)
+            return result["MACD"] if name == "macd" else result["MACD_signal"]
+        values = []
+        for item, arg in zip(FUNCTIONS[name][0], args):
+            kind = item[0] if isinstance(item, tuple) else item
+            if kind == "n":
+                values.append(int(arg[1]))
+            else:
+                value = self.eval(arg)
+                values.append(np.broadcast_to(value, self.fields["close"].shape).astype(np.float64))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return FUNCTIONS[name][1](*values)
+
+def evaluate_screen(screen: CompiledScreen, fields: Dict[str, Any], meta: Dict[str, Any]):
+    """
+    在全市场数组上求值，返回每只股票最新一根K线是否满足条件的布尔数组
+    """
+    import numpy as np
+
+    n_symbols = fields["close"].shape[0]
+    if n_symbols == 0 or fields["close"].shape[1] == 0:
+        return np.zeros(n_symbols, dtype=bool)
+    result = _Evaluator(fields, meta).eval(screen.tree)
+    result = np.broadcast_to(result, fields["close"].shape)
+    return np.asarray(result[:, -1], dtype=bool)
+
+def screen_job(arrays: Dict[str, Any], screen: CompiledScreen):
+    """
+    计算进程池中执行的选股任务：arrays 包含K线字段和 market_cap；screen 在父进程中编译，语法树随任务传入。
+    K线字段可能以 float32/int64 紧凑存储，只有表达式用到的字段才转换为 float64
+    """
+    fields = FloatFields({name: arrays[name] for name in SERIES_FIELDS})
+    meta = {name: arrays[name] for name in META_FIELDS}
+    return evaluate_screen(screen, fields, meta)
+
+def build_filter_screen(filter_params) -> Optional[CompiledScreen]:
+    """
+    把 StockFilterRequest 中的固定筛选字段和自定义表达式编译为一个选股计划，没有任何条件时返回 None
+
+    自定义表达式单独编译，语法错误的位置和内容与用户输入一致，再与固定条件的语法树用 and 组合
+    """
+    parts = []
+    if filter_params.min_price is not None:
+        parts.append(f"close >= {filter_params.min_price!r}")
+    if filter_params.max_price is not None:
+        parts.append(f"close <= {filter_params.max_price!r}")
+    if filter_params.min_volume is not None:
+        parts.append(f"volume >= {filter_params.min_volume!r}")
+    if filter_params.min_market_cap is not None:
+        parts.append(f"market_cap >= {filter_params.min_market_cap!r}")
+    if filter_params.max_market_cap is not None:
+        parts.append(f"market_cap <= {filter_params.max_market_cap!r}")
+    if filter_params.price_change_percent is not None:
+        if filter_params.price_change_percent >= 0:
+            parts.append(f"change(1) >= {filter_params.price_change_percent!r}")
+        else:
+            parts.append(f"change(1) <= {filter_params.price_change_percent!r}")
+    if filter_params.rsi_min is not None:
+        parts.append(f"rsi(14) >= {filter_params.rsi_min!r}")
+    if filter_params.rsi_max is not None:
+        parts.append(f"rsi(14) <= {filter_params.rsi_max!r}")
+    if filter_params.ma_trend == "up":
+        parts.append("close > ma(20) and ma(20) > ma(60)")
+    elif filter_params.ma_trend == "down":
+        parts.append("close < ma(20) and ma(20) < ma(60)")
+    elif filter_params.ma_trend == "cross":
+        parts.append("ma(5) > ma(20) and ref(ma(5), 1) <= ref(ma(20), 1)")
+    if filter_params.macd_signal == "bullish":
+        parts.append("macd() > macd_signal()")
+    elif filter_params.macd_signal == "bearish":
+        parts.append("macd() < macd_signal()")
+    screens = [compile_screen(" and ".join(parts))] if parts else []
+    if filter_params.expression:
+        screens.append(compile_screen(filter_params.expression))
+    return combine_screens(screens) if screens else None
@@ -0,0 +1,53 @@
+"""
+单只股票的技术指标计算任务（在计算进程池中执行）
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.profiling import profile_section
+from app.indicators.registry import get_backend
+from app.services.downsample import lttb_indices
+
+# 传入计算进程的K线字段
+INDICATOR_INPUTS = ("ts", "open", "high", "low", "close", "volume")
+
+# 指标名 -> 以K线数组计算该指标
+INDICATORS = {
+    "MA": lambda backend, bars: backend.ma(bars["close"]),
+    "RSI": lambda backend, bars: backend.rsi(bars["close"]),
+    "MACD": lambda backend, bars: backend.macd(bars["close"]),
+    "BBANDS": lambda backend, bars: backend.bbands(bars["close"]),
+    "STOCH": lambda backend, bars: backend.stoch(bars["high"], bars["low"], bars["close"]),
+}
+
+def compute_indicators(bars: Dict[str, np.ndarray], indicators: List[str],
+                       start: date, end: Optional[date], max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    在全部K线（含预热部分）上计算指标，只返回 [start, end] 范围内的结果
+
+    指定 max_points 时按收盘价用 LTTB 选出共同的日期，所有指标序列取相同的点，与价格图共用横轴。
+    每个指标记录为剖析中的 indicator.<名称> 代码段
+    """
+    backend = get_backend()
+    computed = {}
+    for name in indicators:
+        if name in INDICATORS:
+            with profile_section(f"indicator.{name}"):
+                computed[name] = INDICATORS[name](backend, bars)
+
+    ts = bars["ts"]
+    in_range = ts >= np.datetime64(start, "D")
+    if end is not None:
+        in_range &= ts <= np.datetime64(end, "D")
+    in_range = np.flatnonzero(in_range)
+    if max_points:
+        in_range = in_range[lttb_indices(bars["close"][in_range], max_points, ts[in_range].astype(np.int64))]
+    return {
+        "dates": np.datetime_as_string(ts[in_range], unit="D").tolist(),
+        "indicators": {
+            name: {key: values[in_range] for key, values in outputs.items()}
+            for name, outputs in computed.items()
+        }
+    }
@@ -0,0 +1,222 @@
+"""
+证券列表同步：从数据源读取全部上市证券，与 stocks 表比较后只对新增、变化和退市的股票执行批量写入
+
+数据源由 UNIVERSE_SOURCE 配置：
+- "nasdaqtrader": NASDAQ Trader 公布的全美上市证券列表（只有代码、名称和交易所）
+- 本地 CSV / JSON 文件路径：字段与 stocks 表相同（symbol, name, exchange, sector, industry, country, market_cap）
+
+数据源中缺失的字段（None）不会覆盖表中已有的值，因此可以先用交易所列表同步，再用带行业和市值的文件补充
+"""
+import os
+import csv
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import track_upstream
+from app.models.models import Stock
+
+logger = logging.getLogger(__name__)
+
+# 同步的字段（symbol 为比较的键）
+FIELDS = ("name", "exchange", "sector", "industry", "country", "market_cap")
+
+# 单次同步最多把多少比例的在市股票标记为退市；超过时认为数据源不完整，跳过退市处理
+MAX_DELIST_FRACTION = 0.5
+
+NASDAQ_TRADER_URLS = (
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+)
+
+# otherlisted.txt 的交易所代码
+OTHER_EXCHANGES = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+
+def _normalize(listing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    symbol = (listing.get("symbol") or "").strip().upper()
+    if not symbol:
+        return None
+    row = {"symbol": symbol}
+    for field in FIELDS:
+        value = listing.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if field == "market_cap" and value is not None:
+            try:
+                value = float(value)
+            except ValueError:
+                value = None
+        row[field] = value
+    return row
+
+def parse_nasdaq_trader(text: str, exchange: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    解析 NASDAQ Trader 的竖线分隔文件；跳过测试代码，类别股的 "." 转为与 yfinance 一致的 "-"
+    """
+    lines = [line for line in text.splitlines() if line and not line.startswith("File Creation Time")]
+    if not lines:
+        return []
+    listings = []
+    for record in csv.DictReader(lines, delimiter="|"):
+        if record.get("Test Issue") == "Y":
+            continue
+        symbol = record.get("Symbol") or record.get("ACT Symbol") or ""
+        if "$" in symbol:  # 优先股等
+            continue
+        listings.append({
+            "symbol": symbol.replace(".", "-"),
+            "name": record.get("Security Name"),
+            "exchange": exchange or OTHER_EXCHANGES.get(record.get("Exchange", ""), record.get("Exchange")),
+            "country": "US"
+        })
+    return listings
+
+def fetch_nasdaq_trader() -> List[Dict[str, Any]]:
+    import requests
+
+    listings = []
+    for url in NASDAQ_TRADER_URLS:
+        with track_upstream("nasdaqtrader", "listings"):
+            response = requests.get(url, timeout=settings.UPSTREAM_TIMEOUT)
+            response.raise_for_status()
+        listings += parse_nasdaq_trader(response.text, "NASDAQ" if "nasdaqlisted" in url else None)
+    return listings
+
+def read_listing_file(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            return json.load(f)
+        return list(csv.DictReader(f))
+
+def load_listings(source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    从数据源读取证券列表，按代码去重（后出现的覆盖先出现的）
+    """
+    source = source or settings.UNIVERSE_SOURCE
+    if source == "nasdaqtrader":
+        raw = fetch_nasdaq_trader()
+    elif os.path.isfile(source):
+        raw = read_listing_file(source)
+    else:
+        raise ValueError(f"无法识别的证券列表数据源: {source}")
+    rows = {}
+    for listing in raw:
+        row = _normalize(listing)
+        if row is not None:
+            rows[row["symbol"]] = row
+    return list(rows.values())
+
+def diff_universe(existing: Iterable[Any], listings: List[Dict[str, Any]]) -> Dict[str, List]:
+    """
+    比较表中现有记录和数据源，返回需要新增、更新（含重新上市）和标记退市的记录
+    """
+    current = {stock.symbol: stock for stock in existing}
+    inserts, updates = [], []
+    for row in listings:
+        stock = current.pop(row["symbol"], None)
+        if stock is None:
+            inserts.append(row)
+            continue
+        changes = {
+            field: row[field] for field in FIELDS
+            if row[field] is not None and row[field] != getattr(stock, field)
+        }
+        if stock.is_delisted:
+            changes["is_delisted"] = False
+        if changes:
+            updates.append({"id": stock.id, **changes})
+    delisted = [stock.id for stock in current.values() if not stock.is_delisted]
+    return {"inserts": inserts, "updates": updates, "delisted": delisted}
+
+def sync_universe(db: Session, listings: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    把证券列表同步到 stocks 表：新增、更新和退市各执行一次批量语句，只有发生变化的记录刷新 last_updated
+    """
+    if not listings:
+        raise ValueError("证券列表为空")
+    existing = db.query(
+        Stock.id, Stock.symbol, Stock.is_delisted, *(getattr(Stock, field) for field in FIELDS)
+    ).all()
+    diff = diff_universe(existing, listings)
+
+    active = sum(1 for stock in existing if not stock.is_delisted)
+    if diff["delisted"] and len(diff["delisted"]) > active * MAX_DELIST_FRACTION:
+        logger.warning(
+            f"数据源缺少 {len(diff['delisted'])}/{active} 只在市股票，可能不完整，本次不处理退市"
+        )
+        diff["delisted"] = []
+
+    now = datetime.utcnow()
+    if diff["inserts"]:
+        db.execute(insert(Stock), [
+            {**row, "country": row["country"] or "US", "is_delisted": False, "last_updated": now}
+            for row in diff["inserts"]
+        ])
+    if diff["updates"]:
+        db.execute(update(Stock), [{**row, "last_updated": now} for row in diff["updates"]])
+    if diff["delisted"]:
+        db.execute(
+            update(Stock).where(Stock.id.in_(diff["delisted"])).values(is_delisted=True, last_updated=now),
+            execution_options={"synchronize_session": False}
+        )
+    db.commit()
+
+    summary = {
+        "total": len(listings),
+        "inserted": len(diff["inserts"]),
+        "updated": len(diff["updates"]),
+        "delisted": len(diff["delisted"]),
+    }
+    logger.info(
+        f"证券列表同步完成: 共 {summary['total']} 只，新增 {summary['inserted']}，"
+        f"更新 {summary['updated']}，退市 {summary['delisted']}"
+    )
+    return summary
+
+def universe_synced(db: Session) -> bool:
+    """
+    是否已经同步过证券列表：交易所为空字符串的是旧版本自选股接口创建的占位记录，不算作同步结果
+    """
+    return db.query(Stock.id).filter(Stock.exchange.is_(None) | (Stock.exchange != "")).first() is not None
+
+def run_universe_sync(db: Session, source: Optional[str] = None) -> Dict[str, int]:
+    return sync_universe(db, load_listings(source))
+
+def run_scheduled_universe_sync(only_if_empty: bool = False):
+    """
+    后台定时同步：多个worker中每个周期只有一个执行；only_if_empty 时只在尚未同步过证券列表时同步
+    """
+    from app.core.cache import get_cache
+    from app.db.session import SessionLocal
+
+    cache = get_cache()
+    db = SessionLocal()
+    try:
+        if only_if_empty and universe_synced(db):
+            return
+        if not cache.add("universe:sync", True, ttl=max(settings.UNIVERSE_SYNC_INTERVAL - 1, 1)):
+            return
+        try:
+            run_universe_sync(db)
+        except Exception:
+            # 同步失败时释放锁，下一个周期（或其他worker启动时）可以重试，而不是等待整个同步间隔
+            cache.delete("universe:sync")
+            raise
+    except Exception as e:
+        logger.error(f"同步证券列表时出错: {str(e)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # 手动同步: python -m app.services.universe [数据源]
+    import sys
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as session:
+        print(run_universe_sync(session, sys.argv[1] if len(sys.argv) > 1 else None))
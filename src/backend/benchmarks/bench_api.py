@@ -0,0 +1,111 @@
+"""
+API层：通过ASGI直接调用完整请求（路由、依赖、计算、序列化）
+"""
+import json
+
+from sqlalchemy import insert
+
+from app.main import app
+from app.core.security import get_current_active_user
+from app.data_sources import stock_data
+from app.db.session import SessionLocal
+from app.models.models import User, Stock, StockPrice
+
+from benchmarks.fixtures import make_ohlcv, make_universe
+from benchmarks.harness import ASGIClient, bench
+
+def _bench_user():
+    return User(id=1, username="bench", is_active=True, is_superuser=True)
+
+def _seed_universe(n_symbols: int, n_bars: int):
+    """
+    向基准数据库写入合成的全市场K线，供选股接口使用
+    """
+    with SessionLocal() as db:
+        if db.query(Stock).count() >= n_symbols:
+            return
+        universe = make_universe(n_symbols, n_bars)
+        db.execute(insert(Stock), [
+            {"id": i + 1, "symbol": symbol, "name": symbol, "exchange": "NASDAQ",
+             "country": "US", "market_cap": 1e9 * (i + 1)}
+            for i, symbol in enumerate(universe)
+        ])
+        rows = []
+        for i, history in enumerate(universe.values()):
+            for date, bar in zip(history.index, history.itertuples()):
+                rows.append({
+                    "stock_id": i + 1, "date": date.to_pydatetime().replace(tzinfo=None),
+                    "open": bar.Open, "high": bar.High, "low": bar.Low, "close": bar.Close,
+                    "adjusted_close": bar.Close, "volume": bar.Volume
+                })
+        db.execute(insert(StockPrice), rows)
+        db.commit()
+
+def _reject_constant(value):
+    raise ValueError(f"响应中包含非标准JSON常量 {value}")
+
+def _check(name, response, results):
+    """
+    基准测试前先确认请求成功且响应是标准JSON（NaN/Infinity 必须输出为 null）；失败的项目记录为 error
+    """
+    if response["status"] != 200:
+        print(f"{name} 请求失败: {response['status']} {response['body'][:200]!r}")
+        results[name] = {"error": response["status"]}
+        return False
+    try:
+        json.loads(response["body"], parse_constant=_reject_constant)
+    except ValueError as e:
+        print(f"{name} 响应无效: {str(e)}")
+        results[name] = {"error": "invalid json"}
+        return False
+    return True
+
+def run(quick: bool = False):
+    n_bars = 252
+    # 上游数据替换为确定性的合成K线；历史数据在首次调用后命中缓存
+    original_fetch = stock_data.fetch_history
+    stock_data.fetch_history = lambda symbol, *args, **kwargs: make_ohlcv(n_bars)
+    app.dependency_overrides[get_current_active_user] = _bench_user
+    client = ASGIClient(app)
+    results = {}
+    try:
+        name = "api.technical[5 indicators]"
+        technical_body = {
+            "symbol": "BENCH", "indicators": ["MA", "RSI", "MACD", "BBANDS", "STOCH"],
+            # 日期范围从第一根K线开始，结果包含指标预热期的空值
+            "start_date": "2020-01-01T00:00:00", "end_date": "2020-12-31T00:00:00"
+        }
+        if _check(name, client.request("POST", "/api/analysis/technical", json_body=technical_body), results):
+            results[name] = bench(
+                lambda: client.request("POST", "/api/analysis/technical", json_body=technical_body)
+            )
+
+        n_symbols = 100 if quick else 1000
+        _seed_universe(n_symbols, n_bars)
+        name = f"api.filter[{n_symbols} symbols]"
+        filter_body = {
+            "market": "US", "rsi_min": 30, "rsi_max": 70,
+            "expression": "close > ma(50) and volume > 0.5 * avg(volume, 20)"
+        }
+        if _check(name, client.request("POST", "/api/stocks/filter", json_body=filter_body), results):
+            results[name] = bench(
+                lambda: client.request("POST", "/api/stocks/filter", json_body=filter_body)
+            )
+
+        name = f"api.historical[{n_bars}]"
+        if _check(name, client.request("GET", "/api/stocks/BENCH/historical"), results):
+            results[name] = bench(
+                lambda: client.request("GET", "/api/stocks/BENCH/historical")
+            )
+
+        name = f"api.historical[{n_bars}, max_points=100]"
+        params = {"max_points": 100, "downsample": "lttb"}
+        if _check(name, client.request("GET", "/api/stocks/BENCH/historical", params=params), results):
+            results[name] = bench(
+                lambda: client.request("GET", "/api/stocks/BENCH/historical", params=params)
+            )
+    finally:
+        client.close()
+        app.dependency_overrides.pop(get_current_active_user, None)
+        stock_data.fetch_history = original_fetch
+    return results
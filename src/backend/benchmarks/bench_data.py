@@ -0,0 +1,24 @@
+"""
+数据源层：上游K线DataFrame到列表格式的转换，以及图表降采样
+"""
+from app.data_sources.stock_data import history_to_records
+from app.services.downsample import downsample_bars
+from app.services.resample import frame_to_bars
+
+from benchmarks.fixtures import make_ohlcv
+from benchmarks.harness import bench
+
+CHART_POINTS = 1000
+
+def run(quick: bool = False):
+    results = {}
+    for n_bars in ([252] if quick else [252, 1260, 5040]):
+        history = make_ohlcv(n_bars)
+        results[f"data.history_to_records[{n_bars}]"] = bench(lambda history=history: history_to_records(history))
+    for n_bars in ([5040] if quick else [5040, 50400]):
+        bars = frame_to_bars(make_ohlcv(n_bars))
+        for method in ("ohlc", "lttb"):
+            results[f"data.downsample.{method}[{n_bars}->{CHART_POINTS}]"] = bench(
+                lambda bars=bars, method=method: downsample_bars(bars, CHART_POINTS, method)
+            )
+    return results
@@ -0,0 +1,75 @@
+"""
+数据库层：StockPrice 批量写入和读取（内存SQLite）
+"""
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.models import Stock, StockPrice
+
+from benchmarks.fixtures import make_ohlcv
+from benchmarks.harness import bench
+
+def _price_rows(stock_id, n_bars):
+    history = make_ohlcv(n_bars)
+    return [
+        {
+            "stock_id": stock_id,
+            "date": date.to_pydatetime().replace(tzinfo=None),
+            "open": row.Open,
+            "high": row.High,
+            "low": row.Low,
+            "close": row.Close,
+            "adjusted_close": row.Close,
+            "volume": row.Volume
+        }
+        for date, row in zip(history.index, history.itertuples())
+    ]
+
+def run(quick: bool = False):
+    n_bars = 1260 if quick else 5040
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    rows = _price_rows(1, n_bars)
+    results = {}
+
+    with Session() as db:
+        db.add(Stock(id=1, symbol="BENCH", name="Bench Corp", exchange="NASDAQ"))
+        db.commit()
+
+    def bulk_insert():
+        with Session() as db:
+            db.execute(insert(StockPrice), rows)
+            db.rollback()
+
+    def orm_insert():
+        with Session() as db:
+            db.add_all([StockPrice(**row) for row in rows])
+            db.flush()
+            db.rollback()
+
+    results[f"db.bulk_insert[{n_bars}]"] = bench(bulk_insert, repeat=5)
+    results[f"db.orm_insert[{n_bars}]"] = bench(orm_insert, repeat=5)
+
+    with Session() as db:
+        db.execute(insert(StockPrice), rows)
+        db.commit()
+
+    def orm_read():
+        with Session() as db:
+            db.query(StockPrice).filter(StockPrice.stock_id == 1).order_by(StockPrice.date).all()
+
+    def core_read():
+        with Session() as db:
+            db.execute(
+                select(StockPrice.date, StockPrice.open, StockPrice.high, StockPrice.low,
+                       StockPrice.close, StockPrice.volume)
+                .where(StockPrice.stock_id == 1)
+                .order_by(StockPrice.date)
+            ).all()
+
+    results[f"db.orm_read[{n_bars}]"] = bench(orm_read, repeat=5)
+    results[f"db.core_read[{n_bars}]"] = bench(core_read, repeat=5)
+    engine.dispose()
+    return results
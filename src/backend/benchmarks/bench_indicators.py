@@ -0,0 +1,60 @@
+"""
+指标层：各 calculate_* 函数（使用配置的后端）、各指标计算后端、5个指标结果的JSON序列化，以及全市场相关系数矩阵
+"""
+import numpy as np
+
+from app.api import analysis
+from app.core.responses import FastJSONResponse
+from app.indicators.registry import available_backends, get_backend
+from app.services.correlation import compute_correlation
+from app.services.bar_matrix import BarMatrix
+
+from benchmarks.fixtures import make_frame
+from benchmarks.harness import bench
+
+INDICATORS = {
+    "MA": analysis.calculate_ma,
+    "RSI": analysis.calculate_rsi,
+    "MACD": analysis.calculate_macd,
+    "BBANDS": analysis.calculate_bbands,
+    "STOCH": analysis.calculate_stoch
+}
+
+def run(quick: bool = False):
+    results = {}
+    for n_bars in ([252] if quick else [252, 1260, 5040]):
+        df = make_frame(n_bars)
+        for name, func in INDICATORS.items():
+            results[f"indicators.{name}[{n_bars}]"] = bench(lambda func=func, df=df: func(df))
+        payload = {"symbol": "BENCH", "indicators": {name: func(df) for name, func in INDICATORS.items()}}
+        results[f"indicators.serialize[{n_bars}]"] = bench(lambda payload=payload: FastJSONResponse(payload))
+    # 各后端：单只股票和全市场二维数组上计算全部5个指标
+    for backend_name in available_backends():
+        backend = get_backend(backend_name)
+        for n_symbols, n_bars in ([(1, 252), (100, 252)] if quick else [(1, 252), (1, 5040), (500, 252)]):
+            fields = _random_universe(n_symbols, n_bars).float_fields()
+            results[f"indicators.backend.{backend_name}[{n_symbols}x{n_bars}]"] = bench(
+                lambda backend=backend, fields=fields: _all_indicators(backend, fields)
+            )
+    for n_symbols in ([100] if quick else [100, 500]):
+        universe = _random_universe(n_symbols, 61)
+        results[f"indicators.correlation[{n_symbols}x60]"] = bench(
+            lambda universe=universe: compute_correlation(universe, 60, universe.fields["close"][0], "BENCH")
+        )
+    return results
+
+def _all_indicators(backend, fields):
+    close = fields["close"]
+    backend.ma(close)
+    backend.rsi(close)
+    backend.macd(close)
+    backend.bbands(close)
+    backend.stoch(fields["high"], fields["low"], close)
+
+def _random_universe(n_symbols: int, n_bars: int, seed: int = 11) -> BarMatrix:
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (n_symbols, n_bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (2, n_symbols, n_bars)))
+    fields = {"close": close, "high": close * (1 + spread[0]), "low": close * (1 - spread[1])}
+    dates = np.arange(n_bars).astype("datetime64[D]")
+    return BarMatrix([f"SYM{i:04d}" for i in range(n_symbols)], dates, fields, {})
@@ -0,0 +1,48 @@
+"""
+比较两次基准测试结果，按中位数耗时判断回归
+
+用法: python -m benchmarks.compare <基线.json> <新结果.json> [--threshold 0.10]
+存在超过阈值的回归、或任一结果中有请求失败的项目时返回非零退出码
+"""
+import sys
+import json
+import argparse
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较两次基准测试结果")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="中位数变慢超过该比例视为回归")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"基线 {baseline['meta']['commit']}  ->  对比 {candidate['meta']['commit']}")
+    regressions = 0
+    failures = 0
+    for name in sorted(set(baseline["results"]) | set(candidate["results"])):
+        old = baseline["results"].get(name)
+        new = candidate["results"].get(name)
+        if (old is not None and "error" in old) or (new is not None and "error" in new):
+            failures += 1
+            print(f"{name:<45} {'请求失败':>30}")
+            continue
+        if old is None or new is None:
+            print(f"{name:<45} {'无法比较（缺失）':>30}")
+            continue
+        ratio = new["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  回归"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "  提升"
+        print(f"{name:<45} {old['median_ms']:>10.3f} -> {new['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+
+    return 1 if regressions or failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
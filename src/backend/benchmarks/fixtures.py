@@ -0,0 +1,44 @@
+"""
+确定性的合成行情数据，基准测试不访问网络
+"""
+import numpy as np
+import pandas as pd
+
+def make_ohlcv(n_bars: int = 252, seed: int = 42, start: str = "2020-01-02", freq: str = "B") -> pd.DataFrame:
+    """
+    生成与 yfinance Ticker.history() 格式相同的日K线
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start=start, periods=n_bars, freq=freq, tz="America/New_York")
+    returns = rng.normal(0.0003, 0.02, n_bars)
+    close = 100.0 * np.exp(np.cumsum(returns))
+    open_ = close * (1 + rng.normal(0, 0.005, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n_bars)))
+    volume = rng.integers(1_000_000, 50_000_000, n_bars).astype(np.float64)
+    return pd.DataFrame({
+        "Open": open_,
+        "High": high,
+        "Low": low,
+        "Close": close,
+        "Volume": volume,
+        "Dividends": 0.0,
+        "Stock Splits": 0.0
+    }, index=index)
+
+def make_frame(n_bars: int = 252, seed: int = 42) -> pd.DataFrame:
+    """
+    生成 technical_analysis 内部使用的小写列名DataFrame
+    """
+    history = make_ohlcv(n_bars, seed)
+    df = history[["Open", "High", "Low", "Close", "Volume"]].copy()
+    df.columns = ["open", "high", "low", "close", "volume"]
+    df.index = df.index.tz_localize(None).normalize()
+    df.index.name = "date"
+    return df
+
+def make_universe(n_symbols: int, n_bars: int = 252, seed: int = 7):
+    """
+    生成多只股票的合成K线 {symbol: DataFrame}
+    """
+    return {f"SYM{i:04d}": make_ohlcv(n_bars, seed + i) for i in range(n_symbols)}
@@ -0,0 +1,104 @@
+"""
+基准测试计时工具
+"""
+import json
+import time
+import asyncio
+import statistics
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+def bench(func: Callable[[], Any], repeat: int = 7, number: Optional[int] = None, min_time: float = 0.05) -> Dict[str, float]:
+    """
+    多轮计时：每轮调用 number 次，number 未指定时自动调整到单轮不少于 min_time 秒
+    """
+    func()  # 预热
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - start >= min_time or number >= 1_000_000:
+                break
+            number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+
+    timings.sort()
+    return {
+        "min_ms": timings[0] * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "max_ms": timings[-1] * 1000,
+        "repeat": repeat,
+        "number": number
+    }
+
+class ASGIClient:
+    """
+    直接调用ASGI应用的最小客户端，不经过网络和线程
+    """
+    def __init__(self, app, headers: Optional[Dict[str, str]] = None):
+        self.app = app
+        self.headers = headers or {}
+        self.loop = asyncio.new_event_loop()
+
+    def request(self, method: str, path: str, params: Optional[dict] = None,
+                json_body: Any = None, headers: Optional[Dict[str, str]] = None):
+        return self.loop.run_until_complete(self._request(method, path, params, json_body, headers))
+
+    async def _request(self, method, path, params, json_body, headers):
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        all_headers = {**self.headers, **(headers or {})}
+        if json_body is not None:
+            all_headers["content-type"] = "application/json"
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": urlencode(params or {}).encode(),
+            "headers": [(k.lower().encode(), v.encode()) for k, v in all_headers.items()],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80)
+        }
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        response = {"status": None, "headers": [], "body": []}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception:
+            # ServerErrorMiddleware 发送500响应后会重新抛出异常
+            if response["status"] is None:
+                raise
+        response["body"] = b"".join(response["body"])
+        return response
+
+    def close(self):
+        self.loop.close()
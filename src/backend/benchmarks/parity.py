@@ -0,0 +1,104 @@
+"""
+指标计算后端的数值一致性检查：以 pandas 后端为参照，比较其它已安装后端的全部指标输出
+
+用法（在 src/backend 目录下）:
+    python -m benchmarks.parity
+存在不一致时返回非零退出码
+"""
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fixtures import make_frame
+
+RTOL = 1e-7
+ATOL = 1e-8
+
+def _inputs(n_bars: int = 300, n_symbols: int = 20, seed: int = 3):
+    """
+    一维：单只股票；二维：多只股票，其中部分股票上市较晚（开头为缺失值），部分股票中途停牌几天
+    """
+    single = make_frame(n_bars)
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (n_symbols, n_bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (2, n_symbols, n_bars)))
+    high, low = close * (1 + spread[0]), close * (1 - spread[1])
+    for row in range(0, n_symbols, 4):
+        listed = int(rng.integers(1, n_bars // 2))
+        close[row, :listed] = high[row, :listed] = low[row, :listed] = np.nan
+    for row in range(1, n_symbols, 4):
+        halted = int(rng.integers(n_bars // 4, n_bars // 2))
+        close[row, halted:halted + 3] = high[row, halted:halted + 3] = low[row, halted:halted + 3] = np.nan
+    return {
+        "1d": tuple(single[c].to_numpy() for c in ("high", "low", "close")),
+        "2d": (high, low, close)
+    }
+
+def _outputs(backend, high, low, close) -> Dict[str, np.ndarray]:
+    outputs = {}
+    for period in (5, 14, 20):
+        outputs[f"sma{period}"] = backend.sma(close, period)
+        outputs[f"std{period}"] = backend.std(close, period)
+        outputs[f"max{period}"] = backend.rolling_max(high, period)
+        outputs[f"min{period}"] = backend.rolling_min(low, period)
+        outputs[f"ema{period}"] = backend.ema(close, period)
+    for group in (backend.ma(close), backend.rsi(close), backend.macd(close),
+                  backend.bbands(close), backend.stoch(high, low, close)):
+        outputs.update(group)
+    return outputs
+
+def _max_diff(expected: np.ndarray, actual: np.ndarray) -> float:
+    """
+    缺失值位置必须相同；其余位置返回超出容差部分的最大相对误差（0 表示一致）
+    """
+    if expected.shape != actual.shape or not np.array_equal(np.isnan(expected), np.isnan(actual)):
+        return float("inf")
+    finite = ~np.isnan(expected)
+    if not finite.any():
+        return 0.0
+    e, a = expected[finite], actual[finite]
+    if np.allclose(e, a, rtol=RTOL, atol=ATOL):
+        return 0.0
+    return float(np.max(np.abs(e - a) / np.maximum(np.abs(e), ATOL)))
+
+def check_parity(names: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    返回 {后端: {输入类型.输出名: 误差}}，只包含不一致的输出
+    """
+    from app.indicators.registry import available_backends, get_backend
+
+    reference = get_backend("pandas")
+    inputs = _inputs()
+    expected = {kind: _outputs(reference, *args) for kind, args in inputs.items()}
+    report = {}
+    for name in names or available_backends():
+        if name == "pandas":
+            continue
+        backend = get_backend(name)
+        mismatches = {}
+        for kind, args in inputs.items():
+            for key, actual in _outputs(backend, *args).items():
+                diff = _max_diff(expected[kind][key], actual)
+                if diff:
+                    mismatches[f"{kind}.{key}"] = diff
+        report[name] = mismatches
+    return report
+
+def main(argv=None):
+    from app.indicators.registry import available_backends
+
+    print(f"已安装的后端: {', '.join(available_backends())}")
+    failed = False
+    for name, mismatches in check_parity().items():
+        if not mismatches:
+            print(f"{name:<10} 与 pandas 一致")
+            continue
+        failed = True
+        print(f"{name:<10} 不一致:")
+        for key, diff in sorted(mismatches.items()):
+            print(f"    {key:<30} 相对误差 {diff:.3g}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
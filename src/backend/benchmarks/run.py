@@ -0,0 +1,111 @@
+"""
+运行基准测试并把结果保存为JSON
+
+用法（在 src/backend 目录下）:
+    python -m benchmarks.run                 # 完整运行，结果写入 benchmarks/results/<commit>.json
+    python -m benchmarks.run --quick         # 小数据量快速运行
+    python -m benchmarks.run --suite api     # 只运行某一组
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import importlib
+from datetime import datetime
+
+SUITES = ["data", "indicators", "api", "db"]
+
+def _prepare_environment(work_dir: str):
+    """
+    应用配置在导入时读取环境变量，必须在导入 app 之前设置
+    """
+    os.environ["DATA_DIR"] = work_dir
+    os.environ["LOGS_DIR"] = work_dir
+    os.environ["DATABASE_URL"] = f"sqlite:///{work_dir}/bench.db"
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["SECRET_KEY"] = "benchmark"
+    os.environ["UNIVERSE_SYNC_INTERVAL"] = "0"  # 不从外部数据源同步证券列表
+    os.environ["SNAPSHOT_INTERVAL"] = "0"  # 不写入预热快照
+    # 基准测试连续发出大量请求，不受单用户配额限制（并发控制仍然生效）
+    os.environ["ANALYTICS_RATE"] = os.environ["INTERACTIVE_RATE"] = "1000000"
+    os.environ["ANALYTICS_BURST"] = os.environ["INTERACTIVE_BURST"] = "1000000"
+    os.environ.pop("METRICS_MULTIPROC_DIR", None)
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _metadata(quick: bool) -> dict:
+    import numpy
+    import pandas
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "quick": quick,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count()
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="运行基准测试")
+    parser.add_argument("--quick", action="store_true", help="小数据量快速运行")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="只运行指定的组，可重复")
+    parser.add_argument("--output", help="结果文件路径，默认 benchmarks/results/<commit>.json")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    _prepare_environment(work_dir)
+    try:
+        return _run(args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _run(args, work_dir: str) -> int:
+    from app.db.session import Base, engine
+    from app.db import base_class  # noqa: F401  注册全部模型
+    Base.metadata.create_all(bind=engine)
+
+    results = {}
+    failed = []
+    try:
+        for suite in args.suite or SUITES:
+            module = importlib.import_module(f"benchmarks.bench_{suite}")
+            for name, stats in module.run(quick=args.quick).items():
+                results[name] = stats
+                if "error" in stats:
+                    failed.append(name)
+                    print(f"{name:<45} 失败: {stats['error']}")
+                    continue
+                print(f"{name:<45} median {stats['median_ms']:>10.3f} ms  min {stats['min_ms']:>10.3f} ms")
+    finally:
+        engine.dispose()
+
+    metadata = _metadata(args.quick)
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"{metadata['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": metadata, "results": results}, f, indent=2, ensure_ascii=False)
+    print(f"结果已保存到 {output}")
+    if failed:
+        # 请求失败的项目没有耗时数据，结果不能作为基线
+        print(f"{len(failed)} 项基准测试失败: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import os
+import glob
+
+# 必须在导入应用配置之前设置，worker由master fork后继承同一份配置
+os.environ.setdefault(
+    "METRICS_MULTIPROC_DIR", os.path.join(os.getenv("DATA_DIR", "/app/data"), "metrics")
+)
+
+from app.core.worker import default_worker_count
+
+# 监听地址
+bind = os.getenv("BIND", "0.0.0.0:8888")
+
+# 每个可用CPU核一个uvicorn worker
+workers = default_worker_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# 不在master中预加载应用，避免数据库连接等资源在fork后被多个worker共享
+preload_app = False
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# 日志输出到标准输出，由应用自身的日志配置写入文件
+accesslog = "-"
+errorlog = "-"
+
+def on_starting(server):
+    # 清理上次运行遗留的worker指标文件
+    for path in glob.glob(os.path.join(os.environ["METRICS_MULTIPROC_DIR"], "*.pkl")):
+        os.remove(path)
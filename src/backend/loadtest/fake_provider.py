@@ -0,0 +1,425 @@
+"""
+本地模拟行情数据源：确定性的合成数据，模拟 Yahoo Finance / Alpha Vantage / Finnhub 的接口，
+可配置延迟、错误率和限流，用于离线压测和复现上游故障
+
+    python -m loadtest.fake_provider --port 8900 --latency-ms 80 --error-rate 0.02 --rate-limit 50
+
+应用设置 MARKET_DATA_PROVIDER=yahoo_http、MARKET_DATA_URL=http://127.0.0.1:8900 后使用本数据源。
+运行中可通过 POST /_control（JSON，字段同命令行参数）修改故障参数，GET /_stats 查看请求统计
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+EPOCH = np.datetime64("2000-01-03")
+SESSION_OPEN = 9 * 60 + 30  # 交易时段 09:30-16:00（纽约时间），按固定 UTC-5 换算
+SESSION_MINUTES = 390
+UTC_OFFSET = -5 * 3600
+INTRADAY_INTERVALS = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+RANGES = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260, "10y": 2520, "ytd": 200}
+NAMES = ("Holdings", "Technologies", "Industries", "Energy", "Pharmaceuticals", "Financial", "Systems", "Retail")
+
+def symbol_seed(symbol: str) -> int:
+    return zlib.crc32(symbol.upper().encode())
+
+def is_known(symbol: str) -> bool:
+    # 以 ZZ 开头的代码模拟不存在或已退市的股票
+    return not symbol.upper().startswith("ZZ")
+
+@lru_cache(maxsize=4096)
+def daily_series(symbol: str, as_of: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    从 2000-01-03 到 as_of 的日K线（拆股调整后价格），同一股票同一日期的数据始终相同
+    """
+    seed = symbol_seed(symbol)
+    dates = np.arange(EPOCH, np.datetime64(as_of) + 1, dtype="datetime64[D]")
+    dates = dates[np.is_busday(dates)]
+    rng = np.random.default_rng(seed)
+    n = len(dates)
+    start_price = 10 + seed % 490
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n)))
+    volume = rng.integers(100_000, 50_000_000, n).astype(np.float64)
+    return dates, {"open": open_, "high": high, "low": low, "close": close, "volume": volume}
+
+def corporate_actions(symbol: str, dates: np.ndarray) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    确定性的公司行为：三分之一的股票每季度分红，约每17只股票一只在固定日期做一次 2:1 拆股
+    """
+    seed = symbol_seed(symbol)
+    dividends = []
+    if seed % 3 == 0:
+        quarter_ends = np.flatnonzero(np.diff(dates.astype("datetime64[M]").astype(int) // 3) != 0)
+        dividends = [(dates[i], round(0.1 + (seed % 50) / 100, 2)) for i in quarter_ends]
+    splits = []
+    if seed % 17 == 0:
+        day = np.busday_offset(EPOCH + 2000 + seed % 3000, 0, roll="forward")
+        if len(dates) and day <= dates[-1]:
+            splits.append((day, 2, 1))
+    return dividends, splits
+
+def to_epoch(day: np.datetime64, minute: int = SESSION_OPEN) -> int:
+    return int(day.astype("datetime64[s]").astype(np.int64)) + minute * 60 - UTC_OFFSET
+
+def intraday_bars(symbol: str, day: np.datetime64, step: int, daily: Dict[str, float]) -> Dict[str, list]:
+    """
+    单个交易日的日内K线：在当日开盘价和收盘价之间的确定性随机路径
+    """
+    rng = np.random.default_rng([symbol_seed(symbol), int(day.astype(np.int64))])
+    n = SESSION_MINUTES // step
+    path = np.cumsum(rng.normal(0, 0.002, n))
+    path = daily["open"] * np.exp(path - np.linspace(0, path[-1] - np.log(daily["close"] / daily["open"]), n))
+    close = path
+    open_ = np.concatenate([[daily["open"]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, n))
+    return {
+        "timestamp": [to_epoch(day, SESSION_OPEN + i * step) for i in range(n)],
+        "open": open_.round(4).tolist(),
+        "high": (np.maximum(open_, close) * (1 + spread)).round(4).tolist(),
+        "low": (np.minimum(open_, close) * (1 - spread)).round(4).tolist(),
+        "close": close.round(4).tolist(),
+        "volume": np.full(n, daily["volume"] / n).round().tolist()
+    }
+
+class FaultConfig:
+    """
+    故障参数：固定延迟 + 随机抖动、随机 500 错误、全局每秒请求数上限（超出返回 429）
+    """
+    FIELDS = ("latency_ms", "jitter_ms", "error_rate", "rate_limit")
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 rate_limit: float = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+
+    def update(self, values: Dict[str, Any]):
+        with self._lock:
+            for field in self.FIELDS:
+                if field in values:
+                    setattr(self, field, float(values[field]))
+            self._tokens = min(self._tokens, self.rate_limit) if self.rate_limit else 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def decide(self) -> Tuple[float, Optional[int]]:
+        """
+        返回 (延迟秒数, 需要返回的错误状态码或 None)
+        """
+        with self._lock:
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            if self.rate_limit > 0:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+                self._updated = now
+                if self._tokens < 1:
+                    return 0.0, 429
+                self._tokens -= 1
+            if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                return delay, 500
+            return delay, None
+
+class FakeProvider:
+    """
+    请求处理逻辑，与HTTP服务器分离，便于在压测进程中直接启动
+    """
+    def __init__(self, faults: FaultConfig, n_symbols: int = 500, as_of: Optional[str] = None):
+        self.faults = faults
+        self.symbols = [f"SYM{i:04d}" for i in range(n_symbols)]
+        self.as_of = as_of or str(np.datetime64(datetime.now(timezone.utc).date()))
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def record(self, endpoint: str, status: int):
+        with self._stats_lock:
+            self.stats[f"{endpoint} {status}"] += 1
+
+    def name(self, symbol: str) -> str:
+        return f"{symbol.title()} {NAMES[symbol_seed(symbol) % len(NAMES)]}"
+
+    def route(self, path: str, query: Dict[str, str]) -> Tuple[str, int, Any]:
+        """
+        返回 (接口名称, 状态码, JSON内容)
+        """
+        if path.startswith("/v8/finance/chart/"):
+            return ("yahoo.chart",) + self.yahoo_chart(path.rsplit("/", 1)[1], query)
+        if path == "/v7/finance/quote":
+            return ("yahoo.quote",) + self.yahoo_quote(query.get("symbols", ""))
+        if path == "/v1/finance/search":
+            return ("yahoo.search",) + self.yahoo_search(query.get("q", ""), int(query.get("quotesCount", 10)))
+        if path == "/query":
+            return ("alphavantage",) + self.alpha_vantage(query)
+        if path == "/api/v1/quote":
+            return ("finnhub.quote",) + self.finnhub_quote(query.get("symbol", ""))
+        if path == "/api/v1/stock/candle":
+            return ("finnhub.candle",) + self.finnhub_candle(query)
+        return "unknown", 404, {"error": "Not Found"}
+
+    def rate_limited(self, endpoint: str) -> Tuple[int, Any]:
+        if endpoint == "alphavantage":
+            # Alpha Vantage 限流时仍返回 200，内容为提示信息
+            return 200, {"Note": "Thank you for using Alpha Vantage! Our standard API rate limit has been reached."}
+        if endpoint.startswith("finnhub"):
+            return 429, {"error": "API limit reached. Please try again later."}
+        return 429, {"finance": {"result": None, "error": {"code": "Too Many Requests", "description": "Rate limited"}}}
+
+    # Yahoo Finance
+
+    def _window(self, symbol: str, query: Dict[str, str]):
+        dates, fields = daily_series(symbol, self.as_of)
+        if "period1" in query:
+            lo = np.datetime64(int(query["period1"]), "s").astype("datetime64[D]")
+            hi = np.datetime64(int(query.get("period2", 2 ** 31)), "s").astype("datetime64[D]")
+            mask = (dates >= lo) & (dates < hi)
+            return dates[mask], {name: values[mask] for name, values in fields.items()}
+        count = RANGES.get(query.get("range", "1y"), len(dates)) if query.get("range") != "max" else len(dates)
+        return dates[-count:], {name: values[-count:] for name, values in fields.items()}
+
+    def yahoo_chart(self, symbol: str, query: Dict[str, str]) -> Tuple[int, Any]:
+        symbol = symbol.upper()
+        if not is_known(symbol):
+            return 404, {"chart": {"result": None, "error": {"code": "Not Found", "description": "No data found, symbol may be delisted"}}}
+        interval = query.get("interval", "1d")
+        dates, fields = self._window(symbol, query)
+        meta = {
+            "currency": "USD", "symbol": symbol, "exchangeName": "NMS", "instrumentType": "EQUITY",
+            "exchangeTimezoneName": "America/New_York", "timezone": "EST", "gmtoffset": UTC_OFFSET,
+            "dataGranularity": interval, "range": query.get("range", "")
+        }
+        if len(dates):
+            meta["regularMarketPrice"] = round(float(fields["close"][-1]), 4)
+
+        if interval in INTRADAY_INTERVALS:
+            step = INTRADAY_INTERVALS[interval]
+            # 与 Yahoo 一致：分钟线只保留最近一段时间
+            keep = 7 if step == 1 else 60
+            columns = {"timestamp": [], "open": [], "high": [], "low": [], "close": [], "volume": []}
+            for i in range(max(len(dates) - keep, 0), len(dates)):
+                bars = intraday_bars(symbol, dates[i], step, {name: float(values[i]) for name, values in fields.items()})
+                for name in columns:
+                    columns[name] += bars[name]
+            timestamps = columns.pop("timestamp")
+            result = {"meta": meta, "timestamp": timestamps, "indicators": {"quote": [columns]}}
+            return 200, {"chart": {"result": [result], "error": None}}
+
+        quote = {name: values.round(4).tolist() for name, values in fields.items()}
+        quote["volume"] = [int(v) for v in fields["volume"]]
+        result = {
+            "meta": meta,
+            "timestamp": [to_epoch(day) for day in dates],
+            "indicators": {"quote": [quote], "adjclose": [{"adjclose": quote["close"]}]}
+        }
+        if "div" in query.get("events", "") or "split" in query.get("events", ""):
+            dividends, splits = corporate_actions(symbol, daily_series(symbol, self.as_of)[0])
+            lo, hi = (dates[0], dates[-1]) if len(dates) else (None, None)
+            result["events"] = {
+                "dividends": {
+                    str(to_epoch(day)): {"amount": amount, "date": to_epoch(day)}
+                    for day, amount in dividends if lo is not None and lo <= day <= hi
+                },
+                "splits": {
+                    str(to_epoch(day)): {"date": to_epoch(day), "numerator": num, "denominator": den, "splitRatio": f"{num}:{den}"}
+                    for day, num, den in splits if lo is not None and lo <= day <= hi
+                }
+            }
+        return 200, {"chart": {"result": [result], "error": None}}
+
+    def _quote(self, symbol: str) -> Dict[str, Any]:
+        dates, fields = daily_series(symbol, self.as_of)
+        close, previous = float(fields["close"][-1]), float(fields["close"][-2])
+        year = slice(-252, None)
+        seed = symbol_seed(symbol)
+        return {
+            "symbol": symbol,
+            "shortName": self.name(symbol),
+            "longName": self.name(symbol),
+            "exchange": "NMS",
+            "fullExchangeName": "NasdaqGS",
+            "quoteType": "EQUITY",
+            "regularMarketPrice": round(close, 4),
+            "regularMarketPreviousClose": round(previous, 4),
+            "regularMarketChangePercent": round((close / previous - 1) * 100, 4),
+            "regularMarketVolume": int(fields["volume"][-1]),
+            "regularMarketTime": to_epoch(dates[-1], SESSION_OPEN + SESSION_MINUTES),
+            "marketCap": int(close * (1 + seed % 1000) * 1e7),
+            "trailingPE": round(5 + seed % 60 + (seed % 100) / 100, 2),
+            "fiftyTwoWeekHigh": round(float(fields["high"][year].max()), 4),
+            "fiftyTwoWeekLow": round(float(fields["low"][year].min()), 4)
+        }
+
+    def yahoo_quote(self, symbols: str) -> Tuple[int, Any]:
+        result = [self._quote(s) for s in dict.fromkeys(s.strip().upper() for s in symbols.split(",")) if s and is_known(s)]
+        return 200, {"quoteResponse": {"result": result, "error": None}}
+
+    def yahoo_search(self, q: str, limit: int) -> Tuple[int, Any]:
+        q = q.strip().upper()
+        matches = [s for s in self.symbols if s.startswith(q) or q in self.name(s).upper()][:limit]
+        return 200, {
+            "quotes": [
+                {"symbol": s, "shortname": self.name(s), "longname": self.name(s),
+                 "exchange": "NMS", "exchDisp": "NASDAQ", "quoteType": "EQUITY"}
+                for s in matches
+            ],
+            "news": []
+        }
+
+    # Alpha Vantage
+
+    def alpha_vantage(self, query: Dict[str, str]) -> Tuple[int, Any]:
+        function = query.get("function", "")
+        symbol = query.get("symbol", "").upper()
+        if not symbol or not is_known(symbol):
+            return 200, {"Error Message": "Invalid API call. Please retry or visit the documentation for TIME_SERIES_DAILY."}
+        if function == "GLOBAL_QUOTE":
+            q = self._quote(symbol)
+            return 200, {"Global Quote": {
+                "01. symbol": symbol,
+                "05. price": f"{q['regularMarketPrice']:.4f}",
+                "06. volume": str(q["regularMarketVolume"]),
+                "08. previous close": f"{q['regularMarketPreviousClose']:.4f}",
+                "10. change percent": f"{q['regularMarketChangePercent']:.4f}%"
+            }}
+        if function in ("TIME_SERIES_DAILY", "TIME_SERIES_DAILY_ADJUSTED"):
+            dates, fields = daily_series(symbol, self.as_of)
+            count = 100 if query.get("outputsize", "compact") == "compact" else len(dates)
+            series = {
+                str(dates[i]): {
+                    "1. open": f"{fields['open'][i]:.4f}", "2. high": f"{fields['high'][i]:.4f}",
+                    "3. low": f"{fields['low'][i]:.4f}", "4. close": f"{fields['close'][i]:.4f}",
+                    "5. volume": str(int(fields["volume"][i]))
+                }
+                for i in range(len(dates) - 1, max(len(dates) - count, 0) - 1, -1)
+            }
+            return 200, {
+                "Meta Data": {"1. Information": "Daily Prices", "2. Symbol": symbol, "3. Last Refreshed": self.as_of},
+                "Time Series (Daily)": series
+            }
+        return 200, {"Error Message": f"Unsupported function: {function}"}
+
+    # Finnhub
+
+    def finnhub_quote(self, symbol: str) -> Tuple[int, Any]:
+        symbol = symbol.upper()
+        if not is_known(symbol):
+            return 200, {"c": 0, "d": None, "dp": None, "h": 0, "l": 0, "o": 0, "pc": 0, "t": 0}
+        dates, fields = daily_series(symbol, self.as_of)
+        close, previous = float(fields["close"][-1]), float(fields["close"][-2])
+        return 200, {
+            "c": round(close, 4), "d": round(close - previous, 4), "dp": round((close / previous - 1) * 100, 4),
+            "h": round(float(fields["high"][-1]), 4), "l": round(float(fields["low"][-1]), 4),
+            "o": round(float(fields["open"][-1]), 4), "pc": round(previous, 4),
+            "t": to_epoch(dates[-1], SESSION_OPEN + SESSION_MINUTES)
+        }
+
+    def finnhub_candle(self, query: Dict[str, str]) -> Tuple[int, Any]:
+        symbol = query.get("symbol", "").upper()
+        if not is_known(symbol):
+            return 200, {"s": "no_data"}
+        dates, fields = self._window(symbol, {"period1": query.get("from", "0"), "period2": query.get("to", str(2 ** 31))})
+        if not len(dates):
+            return 200, {"s": "no_data"}
+        return 200, {
+            "s": "ok", "t": [to_epoch(day) for day in dates],
+            "o": fields["open"].round(4).tolist(), "h": fields["high"].round(4).tolist(),
+            "l": fields["low"].round(4).tolist(), "c": fields["close"].round(4).tolist(),
+            "v": [int(v) for v in fields["volume"]]
+        }
+
+def make_handler(provider: FakeProvider):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Any):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if url.path == "/_stats":
+                self._send(200, {"faults": provider.faults.as_dict(), "requests": dict(provider.stats)})
+                return
+            endpoint, status, payload = provider.route(url.path, query)
+            delay, fault = provider.faults.decide()
+            if delay:
+                time.sleep(delay)
+            if fault == 429:
+                status, payload = provider.rate_limited(endpoint)
+            elif fault == 500:
+                status, payload = 500, {"error": "Internal Server Error"}
+            provider.record(endpoint, status)
+            self._send(status, payload)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/_control":
+                self._send(404, {"error": "Not Found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            provider.faults.update(json.loads(self.rfile.read(length) or b"{}"))
+            self._send(200, provider.faults.as_dict())
+
+    return Handler
+
+def start_server(provider: FakeProvider, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    在后台线程中启动服务，port 为 0 时自动分配（通过 server.server_address 获取）
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(provider))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-provider", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟行情数据源")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--symbols", type=int, default=500, help="可搜索的合成股票数（SYM0000...）")
+    parser.add_argument("--as-of", help="最新交易日 YYYY-MM-DD，默认今天；固定后多次运行数据完全相同")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="随机返回500的比例")
+    parser.add_argument("--rate-limit", type=float, default=0, help="每秒请求数上限，超出返回429；0为不限")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.seed)
+    provider = FakeProvider(faults, args.symbols, args.as_of)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(provider))
+    server.daemon_threads = True
+    print(f"模拟数据源已启动: http://{args.host}:{server.server_address[1]}  故障参数: {faults.as_dict()}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
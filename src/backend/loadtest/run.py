@@ -0,0 +1,285 @@
+"""
+离线压测：启动本地模拟数据源和完整应用（uvicorn 多进程），按场景模拟多个用户并发请求，
+输出吞吐量、各操作的延迟分位数和上游请求统计
+
+    cd src/backend
+    python -m loadtest.run --scenario dashboard --users 50 --duration 60 --workers 2
+    python -m loadtest.run --scenario analyst --latency-ms 200 --error-rate 0.05 --output report.json
+
+指定 --app-url 时直接压测已在运行的服务（不启动应用和模拟数据源，也不写入测试数据）
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from loadtest.fake_provider import FakeProvider, FaultConfig, daily_series, start_server
+from loadtest.scenarios import SCENARIOS, Context, Request, login, next_request
+
+USER_PASSWORD = "loadtest"
+SECTORS = ("Technology", "Healthcare", "Financial Services", "Energy", "Consumer Cyclical", "Industrials")
+SEED_BARS = 300
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _prepare_environment(work_dir: str, provider_url: str, cache_backend: str):
+    os.environ["DATA_DIR"] = work_dir
+    os.environ["LOGS_DIR"] = work_dir
+    os.environ["DATABASE_URL"] = f"sqlite:///{work_dir}/loadtest.db"
+    os.environ["CACHE_BACKEND"] = cache_backend
+    os.environ.setdefault("SECRET_KEY", "loadtest")
+    os.environ["MARKET_DATA_PROVIDER"] = "yahoo_http"
+    os.environ["MARKET_DATA_URL"] = provider_url
+    os.environ["UNIVERSE_SYNC_INTERVAL"] = "0"
+    os.environ["SNAPSHOT_INTERVAL"] = "0"
+    os.environ["ALERT_CHECK_INTERVAL"] = "0"
+    os.environ["CACHE_WARMUP_SYMBOLS"] = ""
+    os.environ.pop("METRICS_MULTIPROC_DIR", None)
+
+def _seed_database(symbols: List[str], n_users: int, as_of: str):
+    """
+    写入压测账号、证券列表和最近的日K线（与模拟数据源的数据一致）
+    """
+    from sqlalchemy import insert
+
+    from app.core.security import get_password_hash
+    from app.db import init_db
+    from app.db.session import SessionLocal, engine
+    from app.models.models import Stock, StockPrice, User
+
+    init_db.init_db(engine)
+    hashed = get_password_hash(USER_PASSWORD)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"username": f"loadtest{i}", "email": f"loadtest{i}@example.com", "hashed_password": hashed, "is_active": True}
+            for i in range(n_users)
+        ])
+        db.execute(insert(Stock), [
+            {"id": i + 1, "symbol": symbol, "name": symbol, "exchange": "NASDAQ", "country": "US",
+             "sector": SECTORS[i % len(SECTORS)], "market_cap": 1e9 * (i + 1), "last_updated": datetime.utcnow()}
+            for i, symbol in enumerate(symbols)
+        ])
+        rows = []
+        for i, symbol in enumerate(symbols):
+            dates, fields = daily_series(symbol, as_of)
+            days = dates.astype("datetime64[s]").tolist()
+            for j in range(max(len(dates) - SEED_BARS, 0), len(dates)):
+                rows.append({
+                    "stock_id": i + 1, "date": days[j],
+                    "open": float(fields["open"][j]), "high": float(fields["high"][j]),
+                    "low": float(fields["low"][j]), "close": float(fields["close"][j]),
+                    "adjusted_close": float(fields["close"][j]), "volume": float(fields["volume"][j])
+                })
+        db.execute(insert(StockPrice), rows)
+        db.commit()
+
+def _start_app(port: int, workers: int, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        stdout=log, stderr=subprocess.STDOUT, env=os.environ.copy()
+    )
+
+async def _wait_ready(client, process: Optional[subprocess.Popen], timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("应用进程启动失败，详见日志")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("等待应用就绪超时")
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, operation: str, status: Any, seconds: float):
+        self.latencies[operation].append(seconds)
+        self.statuses[operation][status] += 1
+
+async def _send(client, request: Request, token: Optional[str]):
+    headers = {"Authorization": f"Bearer {token}"} if request.auth and token else {}
+    return await client.request(
+        request.method, request.path, params=request.params, json=request.json, data=request.form, headers=headers
+    )
+
+async def _virtual_user(client, ctx: Context, mix: Dict[str, float], deadline: float,
+                        think_time: float, recorder: Recorder):
+    token = None
+    while time.monotonic() < deadline:
+        if token is None:
+            operation, request = "login", login(ctx)
+        else:
+            operation, request = next_request(ctx, mix)
+        started = time.perf_counter()
+        try:
+            response = await _send(client, request, token)
+            status = response.status_code
+            if operation == "login" and status == 200:
+                token = response.json()["access_token"]
+            elif status == 401:
+                token = None
+        except Exception as e:
+            status = type(e).__name__
+        recorder.record(operation, status, time.perf_counter() - started)
+        if think_time:
+            await asyncio.sleep(ctx.rng.expovariate(1 / think_time))
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Any]:
+    operations = {}
+    all_latencies = []
+    for operation, latencies in sorted(recorder.latencies.items()):
+        values = np.asarray(latencies) * 1000
+        all_latencies += latencies
+        statuses = recorder.statuses[operation]
+        operations[operation] = {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 2),
+            "errors": sum(count for status, count in statuses.items() if status != 200),
+            "statuses": {str(status): count for status, count in statuses.items()},
+            **_percentiles(values)
+        }
+    total = sum(op["requests"] for op in operations.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 2) if elapsed else 0,
+        "errors": sum(op["errors"] for op in operations.values()),
+        **_percentiles(np.asarray(all_latencies) * 1000),
+        "operations": operations
+    }
+
+def _percentiles(values: np.ndarray) -> Dict[str, float]:
+    if not len(values):
+        return {}
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2), "p90_ms": round(float(p90), 2), "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2), "max_ms": round(float(values.max()), 2)
+    }
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n场景 {report['scenario']}：{report['users']} 个用户，{report['elapsed_s']} 秒，"
+          f"共 {report['requests']} 个请求，{report['rps']} 请求/秒，错误 {report['errors']}")
+    print(f"{'操作':<12}{'请求数':>8}{'请求/秒':>10}{'错误':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  状态码")
+    rows = list(report["operations"].items()) + [("全部", report)]
+    for name, op in rows:
+        if "p50_ms" not in op:
+            continue
+        statuses = " ".join(f"{k}:{v}" for k, v in sorted(op.get("statuses", {}).items()))
+        print(f"{name:<12}{op['requests']:>8}{op['rps']:>10}{op['errors']:>7}{op['p50_ms']:>10}"
+              f"{op['p90_ms']:>10}{op['p99_ms']:>10}{op['max_ms']:>10}  {statuses}")
+    if report.get("upstream"):
+        print("上游请求: " + ", ".join(f"{k}={v}" for k, v in sorted(report["upstream"].items())))
+
+async def run_load(base_url: str, contexts: List[Context], mix: Dict[str, float], duration: float,
+                   think_time: float, process: Optional[subprocess.Popen] = None) -> Tuple[Recorder, float]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=len(contexts), max_keepalive_connections=len(contexts))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await _wait_ready(client, process)
+        recorder = Recorder()
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _virtual_user(client, ctx, mix, deadline, think_time, recorder) for ctx in contexts
+        ))
+        return recorder, time.monotonic() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线压测")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--users", type=int, default=20, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长（秒）")
+    parser.add_argument("--think-ms", type=float, default=0, help="用户两次请求之间的平均间隔")
+    parser.add_argument("--workers", type=int, default=1, help="应用的worker进程数")
+    parser.add_argument("--symbols", type=int, default=200, help="写入数据库并参与请求的股票数")
+    parser.add_argument("--cache-backend", choices=("memory", "sqlite", "redis"),
+                        help="默认单worker为 memory、多worker为 sqlite")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--as-of", default="2024-06-28", help="模拟数据源的最新交易日，固定后多次运行数据相同")
+    parser.add_argument("--latency-ms", type=float, default=50, help="模拟上游延迟")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=float, default=0, help="上游每秒请求数上限，0为不限")
+    parser.add_argument("--app-url", help="压测已在运行的服务")
+    parser.add_argument("--username", default="admin", help="与 --app-url 一起使用的账号")
+    parser.add_argument("--password", default=os.getenv("LOGIN_PASSWORD", "admin"))
+    parser.add_argument("--output", help="把报告保存为JSON")
+    args = parser.parse_args(argv)
+    if args.cache_backend is None:
+        args.cache_backend = "sqlite" if args.workers > 1 else "memory"
+    elif args.cache_backend == "memory" and args.workers > 1:
+        parser.error("--cache-backend memory 不能在多个worker间共享预热和定时任务的锁")
+
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    as_of = datetime.strptime(args.as_of, "%Y-%m-%d").date()
+    provider = process = server = None
+    if args.app_url:
+        base_url = args.app_url.rstrip("/")
+        contexts = [
+            Context(args.username, args.password, symbols, args.seed + i) for i in range(args.users)
+        ]
+    else:
+        faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.seed)
+        provider = FakeProvider(faults, args.symbols, args.as_of)
+        server = start_server(provider)
+        work_dir = tempfile.mkdtemp(prefix="loadtest-")
+        _prepare_environment(work_dir, f"http://127.0.0.1:{server.server_address[1]}", args.cache_backend)
+        print(f"写入测试数据: {args.symbols} 只股票，{args.users} 个账号（{work_dir}）")
+        _seed_database(symbols, args.users, args.as_of)
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        process = _start_app(port, args.workers, os.path.join(work_dir, "app.out"))
+        contexts = [
+            Context(f"loadtest{i}", USER_PASSWORD, symbols, args.seed + i, as_of) for i in range(args.users)
+        ]
+
+    try:
+        recorder, elapsed = asyncio.run(run_load(
+            base_url, contexts, SCENARIOS[args.scenario], args.duration, args.think_ms / 1000, process
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "scenario": args.scenario,
+        "users": args.users,
+        "workers": args.workers,
+        "faults": provider.faults.as_dict() if provider else None,
+        **summarize(recorder, elapsed),
+        "upstream": dict(provider.stats) if provider else None
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"报告已保存到 {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
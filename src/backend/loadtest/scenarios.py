@@ -0,0 +1,106 @@
+"""
+压测场景：每个场景是一组按权重随机选择的操作，模拟一类用户的请求组合
+
+每个操作根据虚拟用户的随机数生成器返回一个请求，股票按近似 Zipf 分布选择（少数热门股票占大部分请求），
+与实际看盘流量的缓存命中情况接近
+"""
+import random
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    json: Any = None
+    form: Optional[Dict[str, str]] = None
+    auth: bool = True
+
+class Context:
+    """
+    虚拟用户的状态：账号、随机数、可选的股票列表和最新交易日（技术分析的日期范围以此为准）
+    """
+    def __init__(self, username: str, password: str, symbols: List[str], seed: int,
+                 as_of: Optional[date] = None):
+        self.username = username
+        self.password = password
+        self.symbols = symbols
+        self.as_of = as_of or date.today()
+        self.rng = random.Random(seed)
+        self._weights = [1 / (rank + 1) for rank in range(len(symbols))]
+
+    def symbol(self) -> str:
+        return self.rng.choices(self.symbols, weights=self._weights)[0]
+
+INDICATOR_SETS = (["MA", "RSI"], ["MACD", "BBANDS"], ["MA", "RSI", "MACD", "BBANDS", "STOCH"])
+PERIODS = ("1mo", "6mo", "1y", "1y", "5y")
+EXPRESSIONS = (
+    None,
+    "close > ma(50) and volume > 0.5 * avg(volume, 20)",
+    "rsi(14) < 30",
+    "close > ma(20) and ma(20) > ma(50)"
+)
+
+def login(ctx: Context) -> Request:
+    return Request("POST", "/api/auth/login", form={"username": ctx.username, "password": ctx.password}, auth=False)
+
+def search(ctx: Context) -> Request:
+    symbol = ctx.symbol()
+    return Request("GET", "/api/stocks/search", params={"query": symbol[:ctx.rng.randint(3, len(symbol))]})
+
+def quote(ctx: Context) -> Request:
+    return Request("GET", f"/api/stocks/{ctx.symbol()}")
+
+def history(ctx: Context) -> Request:
+    params = {"period": ctx.rng.choice(PERIODS)}
+    if ctx.rng.random() < 0.5:
+        params["max_points"] = 200
+    return Request("GET", f"/api/stocks/{ctx.symbol()}/historical", params=params)
+
+def technical(ctx: Context) -> Request:
+    start = ctx.as_of - timedelta(days=ctx.rng.choice((90, 180, 365)))
+    return Request("POST", "/api/analysis/technical", json={
+        "symbol": ctx.symbol(),
+        "indicators": ctx.rng.choice(INDICATOR_SETS),
+        "start_date": f"{start}T00:00:00"
+    })
+
+def screen(ctx: Context) -> Request:
+    body: Dict[str, Any] = {"market": "US", "limit": 50}
+    expression = ctx.rng.choice(EXPRESSIONS)
+    if expression:
+        body["expression"] = expression
+    else:
+        body.update(rsi_min=30, rsi_max=70, min_volume=1_000_000)
+    return Request("POST", "/api/stocks/filter", json=body)
+
+def backtest(ctx: Context) -> Request:
+    return Request("POST", "/api/analysis/backtest", json={"strategy_name": "ma_cross", "symbol": ctx.symbol()})
+
+OPERATIONS: Dict[str, Callable[[Context], Request]] = {
+    "login": login,
+    "search": search,
+    "quote": quote,
+    "history": history,
+    "technical": technical,
+    "filter": screen,
+    "backtest": backtest,
+}
+
+# 场景: {操作: 权重}
+SCENARIOS: Dict[str, Dict[str, float]] = {
+    # 看盘为主：大量报价和K线，少量分析
+    "dashboard": {"quote": 40, "history": 25, "search": 15, "technical": 10, "filter": 5, "login": 3, "backtest": 2},
+    # 分析为主：技术分析、选股和回测
+    "analyst": {"technical": 30, "filter": 25, "history": 20, "backtest": 15, "quote": 10},
+    # 开盘前后集中登录
+    "login_storm": {"login": 60, "quote": 40},
+    "mixed": {"quote": 25, "history": 20, "search": 10, "technical": 15, "filter": 15, "backtest": 10, "login": 5},
+}
+
+def next_request(ctx: Context, mix: Dict[str, float]):
+    """
+    按权重选择下一个操作，返回 (操作名, 请求)
+    """
+    name = ctx.rng.choices(list(mix), weights=list(mix.values()))[0]
+    return name, OPERATIONS[name](ctx)